@@ -16,9 +16,97 @@
     @date       2/24/2022
     
 '''
-import pyb, utime
+import pyb, clock, array, micropython
 from pyb import I2C
 
+try:
+    import fastpath
+except (ImportError, SyntaxError, AttributeError, NameError):
+    # There is no native code emitter in this firmware, or this is CPython.
+    fastpath = None
+
+
+def merge_int16(buf, out):
+    '''!@brief      Merges little-endian byte pairs into signed 16-bit numbers.
+        @details    When the firmware has the viper code emitter this is
+                    replaced by fastpath.merge_int16(), which does the same
+                    thing with machine instructions.
+        @param      buf is the buffer of bytes read from the IMU, LSB first.
+        @param      out is the array('h') to put the numbers into. One number
+                    is merged for every element of out.
+    '''
+    for idx in range(len(out)):
+        value = buf[2*idx + 1] << 8 | buf[2*idx]
+        if value > 32767:
+            value -= 65536
+        out[idx] = value
+
+## mode() number for config mode, in which the sensor can be configured and
+#  puts out no data.
+CONFIG = micropython.const(0)
+
+## mode() number for NDoF mode, which fuses the accelerometer, gyroscope and
+#  magnetometer into absolute Euler angles at 100 Hz.
+NDOF = micropython.const(1)
+
+## mode() number for IMU mode, which fuses only the accelerometer and the
+#  gyroscope into Euler angles relative to the starting heading at 100 Hz.
+#  It does not need the magnetometer calibrated and is not upset by the
+#  magnetic fields of the motors.
+IMU = micropython.const(2)
+
+## mode() number for gyroscope only mode, which puts out the angular velocity
+#  at up to 523 Hz but no Euler angles.
+GYRO = micropython.const(3)
+
+## The I2C address of the BNO055 on the platform, with its ADR pin low.
+ADDR = micropython.const(0x28)
+
+## How long the sensor takes to switch from any mode to config mode [us].
+CONFIG_SWITCH = micropython.const(19_000)
+
+## How long the sensor takes to switch from config mode to any other mode
+#  [us].
+MODE_SWITCH = micropython.const(7_000)
+
+## How long before the next scheduler release the first background read
+#  starts [us]. This covers a 12-byte read at 100 kHz.
+READ_LEAD = micropython.const(2_000)
+
+## How long a background read may wait for idle time before the scheduler
+#  does it anyway [us], one frame of the tasks.
+READ_OVERDUE = micropython.const(10_000)
+
+## The time left between the end of a background read and the next release
+#  [us]. After the first read, reads start this long plus the length of the
+#  last read before the release, so the data is as fresh as possible.
+READ_MARGIN = micropython.const(250)
+
+## How much later the next read is moved when a read finds the same sample as
+#  the one before, which means it came just before the sensor had a new one
+#  [us].
+PHASE_LATE = micropython.const(500)
+
+## How much earlier the next read is moved after each read that finds a new
+#  sample once the reads are locked on, so that they keep creeping back
+#  towards the moment the sensor puts out a sample [us].
+PHASE_EARLY = micropython.const(10)
+
+## How much earlier the next read is moved after each new sample until the
+#  first old one is found, so the reads find the sensor's timing within a
+#  few frames [us].
+PHASE_ACQUIRE = micropython.const(500)
+
+## The moves add up in BNO055.rate, and 1/PHASE_RATE_SCALE of the sum is
+#  added to every move, which takes up the difference between the sensor's
+#  oscillator and the board's clock.
+PHASE_RATE_SCALE = micropython.const(64)
+
+## The plain Python version of merge_int16(), kept for comparison.
+merge_int16_py = merge_int16
+if fastpath is not None:
+    merge_int16 = fastpath.merge_int16
+
 class BNO055:
     '''!@brief      A BNO055 IMU driver class.
         @details    Objects of this class can be used to configure the BNO055 IMU.
@@ -27,36 +115,114 @@ class BNO055:
                     and angular velocity. 
                     
     '''
-    def __init__(self, i2c):
+    def __init__(self, i2c, addr=None):
         '''!@brief   Initializes the BNO055 IMU   
+            @details The IMU is put in config mode. This returns straight
+                    away rather than waiting for the switch, so the caller can
+                    get on with other work until ready() is True.
             @param   i2c The I2C controller object that is associated with the
                      IMU
+            @param   addr is the I2C address of the IMU, such as ADDR. If it
+                     is None the bus is scanned and the first device found is
+                     used, which takes longer.
     
             
         '''
         self.i2c = i2c
-        self.addr = self.i2c.scan()[0]
+        if addr is None:
+            addr = self.i2c.scan()[0]
+        self.addr = addr
         
         self.cal_coef = [0]*22
         self.calbuff = bytearray(22)
+        # Buffers for the angle and angular velocity readings, so a reading
+        # does not need new byte strings.
+        self.rawbuff = bytearray(6)
+        self.words = array.array('h', [0, 0, 0])
+        
+        # The state of a background read started with start_read_all().
+        # pending, lead, started and overdue let the scheduler run it as a
+        # background job.
+        self.pending = False
+        self.lead = READ_LEAD
+        self.started = 0
+        self.overdue = READ_OVERDUE
+        self.read_buf = None
+        self.read_done = None
+        
+        # The last sample seen by track(), whether the last reading held a
+        # new sample, the number of readings that did not, and how far the
+        # next read should be moved to line up with the sensor [us]. Once
+        # locked, rate is the running sum of the moves.
+        self.last = array.array('h', [0, 0, 0, 0, 0, 0])
+        self.new = False
+        self.stale = 0
+        self.correction = 0
+        self.locked = False
+        self.rate = 0
+        self.seen = False
         
         self.OPR_MODE = 0x3D # The register for operating mode.
         self.config_mode = 0b00000000 # The byte to send to OPR_MODE for configuation.
         self.NDoF_mode = 0b00001100 # The byte to send to OPR_MODE for NDoF.
+        self.IMU_mode = 0b00001000 # The byte to send to OPR_MODE for IMU.
+        self.gyro_mode = 0b00000011 # The byte to send to OPR_MODE for gyroscope only.
+        self.modenum = CONFIG
+        self.fusion = False # True in the modes that put out Euler angles.
         self.i2c.mem_write(self.config_mode, self.addr, self.OPR_MODE)
-        utime.sleep_ms(20)
+        # The ticks_us() time the sensor will have finished switching mode.
+        self.ready_at = clock.ticks_add(clock.ticks_us(), CONFIG_SWITCH)
         
 
         
     def mode(self, modenum):
         '''!@brief  Sets the mode for IMU at which it will be operating in.      
-            @param  modenum will be set to 0 for config mode and 1 for NDoF mode.     
+            @details In IMU and NDoF mode the Euler angle registers are updated
+                    along with the gyroscope registers, 100 times a second. In
+                    gyroscope only mode the Euler angle registers are left as
+                    they were, but the gyroscope registers are updated more
+                    often and with less delay.
+                    The switch takes CONFIG_SWITCH into config mode and
+                    MODE_SWITCH out of it. This returns straight away, and
+                    ready() tells when the switch is over.
+            @param  modenum will be set to 0 (CONFIG) for config mode, 1 (NDOF)
+                    for NDoF mode, 2 (IMU) for IMU mode or 3 (GYRO) for
+                    gyroscope only mode.     
             
         '''
-        if modenum == 0:
+        if modenum == CONFIG:
             self.i2c.mem_write(self.config_mode, self.addr, self.OPR_MODE)
-        elif modenum == 1:
+        elif modenum == NDOF:
             self.i2c.mem_write(self.NDoF_mode, self.addr, self.OPR_MODE)
+        elif modenum == IMU:
+            self.i2c.mem_write(self.IMU_mode, self.addr, self.OPR_MODE)
+        elif modenum == GYRO:
+            self.i2c.mem_write(self.gyro_mode, self.addr, self.OPR_MODE)
+        else:
+            raise ValueError("Unknown BNO055 mode")
+        if modenum == CONFIG:
+            switch = CONFIG_SWITCH
+        else:
+            switch = MODE_SWITCH
+        self.ready_at = clock.ticks_add(clock.ticks_us(), switch)
+        self.seen = False
+        self.modenum = modenum
+        self.fusion = modenum == NDOF or modenum == IMU
+
+    def ready(self):
+        '''!@brief  Checks if the sensor has finished switching mode.
+            @return True once the last mode switch is over.
+            
+        '''
+        return clock.ticks_diff(clock.ticks_us(), self.ready_at) >= 0
+
+    def wait(self):
+        '''!@brief  Waits until the sensor has finished switching mode.
+            
+        '''
+        remaining = clock.ticks_diff(self.ready_at, clock.ticks_us())
+        if remaining > 0:
+            clock.sleep_us(remaining)
 
         
     def status(self):
@@ -76,6 +242,24 @@ class BNO055:
         self.sys_stat = (self.cal_byte & 0b11000000)>>6
         return self.mag_stat, self.acc_stat, self.gyr_stat, self.sys_stat
 
+    def calibrated(self, modenum=None):
+        '''!@brief   Checks if the sensors used by a mode are calibrated.
+            @details NDoF mode needs the magnetometer, accelerometer and
+                     gyroscope, IMU mode only the accelerometer and gyroscope,
+                     and gyroscope only mode only the gyroscope.
+            @param   modenum is the mode to check, or None for the current one.
+            @return  True if every sensor the mode uses reports a status of 3.
+            
+        '''
+        if modenum is None:
+            modenum = self.modenum
+        mag, acc, gyr, sys = self.status()
+        if modenum == GYRO:
+            return gyr == 3
+        if modenum == IMU:
+            return acc == 3 and gyr == 3
+        return mag == 3 and acc == 3 and gyr == 3
+
     def read_coef(self):
         '''!@brief  Reads the calibration coefficients when the system is fully 
                     calibrated.        
@@ -102,19 +286,12 @@ class BNO055:
             @return (self.Roll, self.Pitch, self.Heading) Tuple of Euler Angles   
             
         '''
-        Euler = self.i2c.mem_read(6, self.addr, 0x1A)
-        
-        self.Heading = (Euler[1] << 8 | Euler[0])
-        if self.Heading > 32767:
-            self.Heading -= 65536
-        
-        self.Roll = (Euler[3] << 8 | Euler [2])
-        if self.Roll > 32767:
-            self.Roll -= 65536
+        self.i2c.mem_read(self.rawbuff, self.addr, 0x1A)
+        merge_int16(self.rawbuff, self.words)
         
-        self.Pitch  = (Euler[5] << 8 | Euler[4])       
-        if self.Pitch > 32767:
-            self.Pitch -= 65536
+        self.Heading = self.words[0]
+        self.Roll = self.words[1]
+        self.Pitch = self.words[2]
         
         return (self.Roll, self.Pitch, self.Heading)
         
@@ -125,29 +302,139 @@ class BNO055:
             @return (self.w_x,self.w_y,self.w_z) Tuple of angular velocity     
             
         '''
-        w = self.i2c.mem_read(6, self.addr, 0x14)
+        self.i2c.mem_read(self.rawbuff, self.addr, 0x14)
+        merge_int16(self.rawbuff, self.words)
         
-        self.w_y = (w[1] << 8 | w[0])
-        if self.w_y > 32767:
-            self.w_y -= 65536
-        self.w_y *= -1
-        
-        self.w_x = (w[3] << 8 | w[2])
-        if self.w_x > 32767:
-            self.w_x -= 65536
-        
-        self.w_z = (w[5] << 8 | w[4])
-        if self.w_z > 32767:
-            self.w_z -= 65536
+        self.w_y = -self.words[0]
+        self.w_x = self.words[1]
+        self.w_z = self.words[2]
         
         return (self.w_x,self.w_y,self.w_z)
 
+    def read_all_into(self, buf):
+        '''!@brief  Reads the angular velocity and Euler angle data in one
+                    transfer.
+            @details The gyroscope registers at 0x14 are followed straight
+                    away by the Euler angle registers at 0x1A, so one 12-byte
+                    read gets both. The bytes are read straight into an
+                    array('h'): the sensor sends each value LSB first, and the
+                    STM32 is little-endian too, so every element is already
+                    the signed register value and nothing needs decoding.
+            @param  buf is an array('h') of 6 elements. It is filled with
+                    the raw gyroscope x, y and z rates and then the raw
+                    heading, roll and pitch, all in 1/16 degree units.
+            @return The buffer that was passed in.
+            
+        '''
+        self.i2c.mem_read(buf, self.addr, 0x14)
+        return buf
+
+    def track(self, buf):
+        '''!@brief  Checks if a reading holds a new sample and works out when
+                    the next read should be.
+            @details In the fusion modes the sensor puts out a new sample
+                    every 10 ms, timed by its own oscillator, so reads made
+                    every 10 ms by the board can find the same sample twice
+                    or find one that is almost a period old. A reading that
+                    is the same as the one before came just before the next
+                    sample, so correction is set to move the next read
+                    PHASE_LATE later. A new reading may have come long after
+                    its sample, so correction is set to move the next read
+                    earlier, by PHASE_ACQUIRE until the first old reading and
+                    by PHASE_EARLY from then on. The moves are also summed in
+                    rate, and a share of the sum is added to every move, so a
+                    sensor that runs fast or slow is followed without extra
+                    old readings. Applied every frame, this locks the reads
+                    on to just after the sensor puts out each sample, with
+                    about one old reading in fifty. Only the first of several
+                    old readings in a row moves the read, since a sensor
+                    whose data does not change at all says nothing about its
+                    timing. The first reading after a mode switch is always
+                    new. Outside the fusion modes the gyroscope puts out
+                    samples faster than the frames, so every reading is new
+                    and the reads are not moved.
+            @param  buf is an array('h') of 6 elements filled by
+                    read_all_into().
+            @return True if buf holds a new sample.
+            
+        '''
+        if not self.fusion:
+            self.new = True
+            self.correction = 0
+            return True
+        last = self.last
+        fresh = buf != last or not self.seen
+        self.seen = True
+        if fresh:
+            for idx in range(6):
+                last[idx] = buf[idx]
+            if self.locked:
+                step = -PHASE_EARLY
+            else:
+                step = -PHASE_ACQUIRE
+        else:
+            self.stale += 1
+            if self.new:
+                step = PHASE_LATE
+                self.locked = True
+            else:
+                step = 0
+        self.new = fresh
+        if self.locked:
+            self.rate += step
+            step += self.rate//PHASE_RATE_SCALE
+        self.correction = step
+        return fresh
+
+    def start_read_all(self, buf, callback, overdue=READ_OVERDUE):
+        '''!@brief  Starts a read of the angular velocity and Euler angle data
+                    and returns straight away.
+            @details pyb.I2C has no transfers that finish in the background,
+                    so the read is instead done in service(). When the IMU
+                    object has been added to the scheduler with
+                    add_background(), service() is run in the idle time just
+                    before the next frame, so the transfer no longer holds up
+                    the tasks. If the tasks leave no idle time, the scheduler
+                    does the read anyway once it has waited overdue
+                    microseconds.
+            @param  buf is an array('h') of 6 elements, as for
+                    read_all_into().
+            @param  callback is the function to call with buf and the
+                    ticks_us() time of the read once the read is done. The
+                    reading has already been passed to track(), so new tells
+                    the callback whether it holds a new sample.
+            @param  overdue is how long the read may wait for idle time
+                    [us].
+            
+        '''
+        self.read_buf = buf
+        self.read_done = callback
+        self.started = clock.ticks_us()
+        self.overdue = overdue
+        self.pending = True
+    
+    def service(self):
+        '''!@brief  Does the read started by start_read_all() and passes the
+                    data to its callback.
+            
+        '''
+        if not self.pending:
+            return
+        stamp = clock.ticks_us()
+        self.i2c.mem_read(self.read_buf, self.addr, 0x14)
+        self.lead = clock.ticks_diff(clock.ticks_us(), stamp) + READ_MARGIN
+        self.pending = False
+        self.track(self.read_buf)
+        self.read_done(self.read_buf, stamp)
+
 if __name__ == '__main__':
     # Adjust the following code to write a test program.
     
     i2c = I2C(1, I2C.CONTROLLER)
-    IMU = BNO055(i2c)
-    IMU.mode(1)
+    IMU = BNO055(i2c, ADDR)
+    IMU.wait()
+    IMU.mode(NDOF)
+    IMU.wait()
     print(f'{IMU.read_coef()}')
     
     # while True:
@@ -15,7 +15,25 @@
     @date       03/10/2022
     
 '''
-import pyb
+import pyb, array, micropython
+
+try:
+    import fastpath
+except (ImportError, SyntaxError, AttributeError, NameError):
+    # There is no native code emitter in this firmware, or this is CPython.
+    fastpath = None
+
+## Cascade.update() mode: run the outer loop on the ball position, then the
+#  inner loop on the platform angle.
+RUN_OUTER = micropython.const(0)
+
+## Cascade.update() mode: keep the platform angle references from the last
+#  outer loop update and run only the inner loop.
+HOLD_OUTER = micropython.const(1)
+
+## Cascade.update() mode: run only the inner loop, holding the platform
+#  level. The references from the last outer loop update are kept.
+LEVEL = micropython.const(2)
 
 class ClosedLoop:
     '''!
@@ -28,7 +46,14 @@ class ClosedLoop:
                     used for the inner and outer control loops to easily 
                     differentiate the variables from each other.
                     
+                    Only the gains and the integrated errors are kept between
+                    calls, in __slots__, and the rest of each update is worked
+                    out in local variables.
+                    
     '''
+    __slots__ = ('maxDuty', 'minDuty', 'int_error', 'int_error_o',
+                 'Kp_i', 'KI_i', 'Kd_i', 'Kp_o', 'KI_o', 'Kd_o')
+    
     def __init__(self):
         '''!@brief      A function that initializes the controller driver.
             @details    This fucntion sets the limits for closed-loop duty cycles.
@@ -37,60 +62,59 @@ class ClosedLoop:
         self.minDuty = -40
         self.int_error = 0
         self.int_error_o = 0
-        # self.ref = 0
+        self.set_gain_inner(0, 0, 0)
+        self.set_gain_outer(0, 0, 0)
         
     def update_inner(self,eul_ang,dt,ang_vel, ref):
         '''!
             @brief      Updates the duty cycle under closed-loop control.
             @details    This function is in charge of actually using the gains
                         to assign a duty cycle to a motor to minimize error.
-            @param      omega_meas is the current velocity of the motor.
+            @param      eul_ang is the platform angle [deg].
+            @param      dt is the time since the last update [s].
+            @param      ang_vel is the platform angular velocity [deg/s].
+            @param      ref is the platform angle reference [deg].
             @return     Duty percentage of one motor is returned.
             
         '''
-        self.ang_vel = ang_vel
-        self.eul_ang = eul_ang
-        self.time_diff = dt
-        self.ref = ref
-        self.error = self.ref - self.eul_ang
-        self.deriv_error = -self.ang_vel
-        self.int_error += self.time_diff*self.error
-        self.Duty = self.Kp_i* self.error + self.KI_i*self.int_error + self.deriv_error*self.Kd_i
+        error = ref - eul_ang
+        int_error = self.int_error + dt*error
+        self.int_error = int_error
+        Duty = self.Kp_i*error + self.KI_i*int_error - ang_vel*self.Kd_i
         
-        if self.Duty > self.maxDuty:
-            self.Duty = self.maxDuty
-        elif self.Duty < self.minDuty:
-            self.Duty = self.minDuty
-            
-        return self.Duty
+        if Duty > self.maxDuty:
+            return self.maxDuty
+        elif Duty < self.minDuty:
+            return self.minDuty
+        return Duty
     
     def update_outer(self,eul_ang,dt,ang_vel, ref, contact):
         '''!
             @brief      Updates the duty cycle under closed-loop control.
             @details    This function is in charge of actually using the gains
                         to assign a duty cycle to a motor to minimize error.
-            @param      omega_meas is the current velocity of the motor.
-            @return     Duty percentage of one motor is returned.
+            @param      eul_ang is the ball position [mm].
+            @param      dt is the time since the last update [s].
+            @param      ang_vel is the ball velocity [mm/s].
+            @param      ref is the ball position reference [mm].
+            @param      contact is True if the ball is on the platform. The
+                        integrated error is cleared when it is not.
+            @return     The platform angle reference is returned [deg].
             
         '''
         if contact == False:
             self.int_error_o = 0
             
-        self.ang_vel_o = ang_vel
-        self.eul_ang_o = eul_ang
-        self.time_diff_o = dt
-        self.ref_o = ref
-        self.error_o = self.ref_o - self.eul_ang_o
-        self.deriv_error_o = -self.ang_vel_o
-        self.int_error_o += self.time_diff_o*self.error_o
-        self.Duty_o = self.Kp_o* self.error_o + self.KI_o*self.int_error_o + self.deriv_error_o*self.Kd_o
+        error = ref - eul_ang
+        int_error = self.int_error_o + dt*error
+        self.int_error_o = int_error
+        Duty = self.Kp_o*error + self.KI_o*int_error - ang_vel*self.Kd_o
         
-        if self.Duty_o > 10:
-            self.Duty_o = 10
-        elif self.Duty_o < -10:
-            self.Duty_o = -10
-            
-        return self.Duty_o
+        if Duty > 10:
+            return 10
+        elif Duty < -10:
+            return -10
+        return Duty
         
     def set_gain_inner(self,Kp,KI,Kd):
         '''!@brief      Sets the gain and velocity reference values.
@@ -118,4 +142,143 @@ class ClosedLoop:
         self.KI_o = KI
         self.Kd_o = Kd
 
-    
\ No newline at end of file
+
+class Cascade:
+    '''!
+        @brief      The cascaded ball position and platform angle controller
+                    for both axes of the platform.
+        @details    One call to update() runs the outer and inner loops for
+                    both motors, reading the measurements from arrays and
+                    leaving the duty cycles in the duty array, so a frame of
+                    the controller makes no new objects apart from the float
+                    results. Index 0 of the state arrays belongs to motor 1,
+                    which moves the ball along x by tilting the platform about
+                    y, and index 1 belongs to motor 2, which moves the ball
+                    along y by tilting the platform about x. Motor 2 tilts the
+                    platform the other way from motor 1, so its outer loop
+                    output is negated. The limits are the same as ClosedLoop:
+                    10 degrees from the outer loop and 40% duty from the inner.
+                    
+    '''
+    __slots__ = ('Kp_i', 'KI_i', 'Kd_i', 'Kp_o', 'KI_o', 'Kd_o',
+                 'pos_ref', 'int_error', 'int_error_o', 'theta_ref', 'duty')
+    
+    def __init__(self):
+        '''!@brief      Creates the controller with zero gains and state.
+        '''
+        ## The ball position reference for each motor [mm].
+        self.pos_ref = array.array('f', [0, 0])
+        ## The integrated platform angle error for each motor [deg*s].
+        self.int_error = array.array('f', [0, 0])
+        ## The integrated ball position error for each motor [mm*s].
+        self.int_error_o = array.array('f', [0, 0])
+        ## The platform angle reference from the outer loop for each motor [deg].
+        self.theta_ref = array.array('f', [0, 0])
+        ## The duty cycle of each motor from the last update [%].
+        self.duty = array.array('f', [0, 0])
+        self.set_gain_inner(0, 0, 0)
+        self.set_gain_outer(0, 0, 0)
+    
+    def set_gain_inner(self, Kp, KI, Kd):
+        '''!@brief      Sets the gains of the platform angle loops.
+            @param      Kp is the proportional gain [%/deg].
+            @param      KI is the integral gain [%/(deg*s)].
+            @param      Kd is the derivative gain [%/(deg/s)].
+        '''
+        self.Kp_i = Kp
+        self.KI_i = KI
+        self.Kd_i = Kd
+    
+    def set_gain_outer(self, Kp, KI, Kd):
+        '''!@brief      Sets the gains of the ball position loops.
+            @param      Kp is the proportional gain [deg/mm].
+            @param      KI is the integral gain [deg/(mm*s)].
+            @param      Kd is the derivative gain [deg/(mm/s)].
+        '''
+        self.Kp_o = Kp
+        self.KI_o = KI
+        self.Kd_o = Kd
+    
+    def update(self, pos, vel, eul_ang, ang_vel, dt, mode):
+        '''!@brief      Updates both axes of the cascade.
+            @param      pos is an array of the ball x and y positions [mm].
+            @param      vel is an array of the ball x and y velocities [mm/s].
+            @param      eul_ang is an array of the platform angles about x and
+                        y [deg].
+            @param      ang_vel is an array of the platform angular
+                        velocities about x and y [deg/s].
+            @param      dt is the time since the last update [s].
+            @param      mode is RUN_OUTER, HOLD_OUTER or LEVEL.
+            @return     The duty array, holding the duty cycle of motor 1 and
+                        motor 2 [%].
+        '''
+        theta_ref = self.theta_ref
+        if mode == RUN_OUTER:
+            Kp = self.Kp_o
+            KI = self.KI_o
+            Kd = self.Kd_o
+            int_error = self.int_error_o
+            
+            error = self.pos_ref[0] - pos[0]
+            int_error[0] += dt*error
+            ref = Kp*error + KI*int_error[0] - Kd*vel[0]
+            if ref > 10:
+                ref = 10
+            elif ref < -10:
+                ref = -10
+            theta_ref[0] = ref
+            
+            error = self.pos_ref[1] - pos[1]
+            int_error[1] += dt*error
+            ref = -(Kp*error + KI*int_error[1] - Kd*vel[1])
+            if ref > 10:
+                ref = 10
+            elif ref < -10:
+                ref = -10
+            theta_ref[1] = ref
+        
+        if mode == LEVEL:
+            ref_1 = 0
+            ref_2 = 0
+        else:
+            ref_1 = theta_ref[0]
+            ref_2 = theta_ref[1]
+        
+        Kp = self.Kp_i
+        KI = self.KI_i
+        Kd = self.Kd_i
+        int_error = self.int_error
+        duty = self.duty
+        
+        error = ref_1 - eul_ang[1]
+        int_error[0] += dt*error
+        Duty = Kp*error + KI*int_error[0] - Kd*ang_vel[1]
+        if Duty > 40:
+            Duty = 40
+        elif Duty < -40:
+            Duty = -40
+        duty[0] = Duty
+        
+        error = ref_2 - eul_ang[0]
+        int_error[1] += dt*error
+        Duty = Kp*error + KI*int_error[1] - Kd*ang_vel[0]
+        if Duty > 40:
+            Duty = 40
+        elif Duty < -40:
+            Duty = -40
+        duty[1] = Duty
+        
+        return duty
+
+
+## The plain Python versions of the methods that fastpath.py replaces, kept
+#  for comparison.
+ClosedLoop.update_inner_py = ClosedLoop.update_inner
+ClosedLoop.update_outer_py = ClosedLoop.update_outer
+Cascade.update_py = Cascade.update
+if fastpath is not None:
+    # The native copies have the modes built in as constants.
+    assert fastpath._RUN_OUTER == RUN_OUTER and fastpath._LEVEL == LEVEL
+    ClosedLoop.update_inner = fastpath.closedloop_update_inner
+    ClosedLoop.update_outer = fastpath.closedloop_update_outer
+    Cascade.update = fastpath.cascade_update
@@ -0,0 +1,115 @@
+'''!
+    @file       attitude.py
+
+    @brief      A complementary filter for the angles of the platform.
+
+    @details    The Euler angles fused by the BNO055 come out at 100 Hz, in
+                steps of 1/16 degree, and lag the platform by the delay of the
+                fusion inside the sensor. The raw angular velocity has much
+                less delay, and in gyroscope only mode comes out at up to
+                523 Hz, but integrating it alone drifts. The complementary
+                filter in this file integrates the angular velocity every
+                reading and pulls the result slowly towards a reference angle,
+                so the fast changes come from the gyroscope and the long term
+                level comes from the reference.
+
+                With the IMU in NDoF or IMU mode the reference is the fused
+                Euler angle. Gyroscope only mode has no angle to use, so the
+                reference is level, which the controller holds the platform
+                at on average, with a much longer time constant.
+
+
+    @author     Jake Lesher
+    @author     Daniel Xu
+    @date       10/16/2026
+'''
+
+import array
+
+## The time constant of the pull towards the fused Euler angles [s].
+FUSION_TAU = 0.5
+
+## The time constant of the pull towards level when there is no fused angle
+#  [s].
+LEVEL_TAU = 5.0
+
+
+class Complementary:
+    '''!@brief      A complementary filter for the platform angles about x and y.
+        @details    Every update moves the estimate on by the angular velocity
+                    times the time step, and then a fraction dt/(tau + dt) of
+                    the way to the reference angle. Changes faster than 1/tau
+                    come from the angular velocity and slower ones from the
+                    reference. The estimate is kept in an array('f') so an
+                    update makes no new objects.
+    '''
+    __slots__ = ('tau', 'angle', 'ready')
+
+    def __init__(self, tau=FUSION_TAU):
+        '''!@brief      Creates a filter with no estimate yet.
+            @param      tau is the time constant of the pull towards the
+                        reference [s].
+        '''
+        self.tau = tau
+        self.angle = array.array('f', [0, 0])
+        self.ready = False
+
+    def update(self, ref, rate, dt):
+        '''!@brief      Moves the estimate on by one reading.
+            @details    The first update takes the reference as the estimate.
+            @param      ref is a sequence of the reference angles about x and
+                        y [deg].
+            @param      rate is a sequence of the angular velocities about x
+                        and y [deg/s].
+            @param      dt is the time since the last update [s].
+            @return     The angle array, holding the estimated angles about x
+                        and y [deg].
+        '''
+        angle = self.angle
+        if not self.ready:
+            angle[0] = ref[0]
+            angle[1] = ref[1]
+            self.ready = True
+            return angle
+        k = dt/(self.tau + dt)
+        est = angle[0] + rate[0]*dt
+        angle[0] = est + k*(ref[0] - est)
+        est = angle[1] + rate[1]*dt
+        angle[1] = est + k*(ref[1] - est)
+        return angle
+
+    def reset(self):
+        '''!@brief      Drops the estimate, so the next update starts again
+                        from its reference.
+        '''
+        self.ready = False
+
+
+if __name__ == '__main__':
+    # A platform tilting back and forth, seen by a reference angle that lags
+    # 30 ms behind and by an angular velocity with a small offset. The filter
+    # should follow the true angle more closely than the lagging reference
+    # and should not drift with the offset.
+    import math
+    filt = Complementary()
+    dt = 0.01
+    lag = 3
+    history = [0.0]*lag
+    ref_err = 0.0
+    est_err = 0.0
+    steps = 1_000
+    for n in range(steps):
+        t = n*dt
+        theta = 5*math.sin(2*math.pi*t)
+        omega = 10*math.pi*math.cos(2*math.pi*t) + 0.5
+        history.append(theta)
+        ref = history.pop(0)
+        est = filt.update((ref, ref), (omega, omega), dt)
+        if n >= steps//2:
+            ref_err += (ref - theta)**2
+            est_err += (est[0] - theta)**2
+    ref_rms = math.sqrt(ref_err/(steps - steps//2))
+    est_rms = math.sqrt(est_err/(steps - steps//2))
+    print(f'RMS error of the lagging reference: {ref_rms:.3f} deg')
+    print(f'RMS error of the filtered estimate: {est_rms:.3f} deg')
+    assert est_rms < ref_rms
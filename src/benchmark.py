@@ -0,0 +1,614 @@
+'''!
+    @file       benchmark.py
+
+    @brief      Times the plain Python and natively compiled versions of the
+                per-frame routines.
+
+    @details    Every routine that fastpath.py replaces is called many times in
+                its plain Python version and in the version the drivers are
+                using, and the time per call and the speedup are printed.
+                Then the IMU is read every frame for a second, first inside
+                its task and then as a background job of the scheduler, to
+                show how long each way holds up the task that runs after it,
+                and as a background job again with a task that leaves no idle
+                time, so the read only runs once it is overdue.
+                On the host the IMU emulator is then given an oscillator that
+                runs slightly fast, to show how old each sample is when it is
+                used with and without the frames locked on to the sensor.
+                On the host this part runs on a clock.VirtualClock, so the
+                times are the bus times the HAL models without the noise of
+                the host's sleep calls. On
+                firmware without the native code emitters the drivers use the
+                plain versions, and on the host the copies in fastpath.py run
+                as plain Python, so either way both columns time the same
+                code. fastpath.py checks that the two give the same results. The touch panel scan is also timed as it was when
+                it made new Pin and ADC objects every scan, against the scan
+                that makes them once, and then in its contact first modes
+                with and without the ball on the panel, and the velocity of
+                the ball from the touch panel Kalman filter is compared with
+                a finite difference of the readings. The spacing of the panel
+                scans is compared with the scans taken in the task and from
+                a timer interrupt, with a task of varying length running
+                before the panel task. The affine and quadratic touch panel
+                calibrations are compared on an emulated panel whose readings
+                bend near the edges, and the affine map and the grid of a
+                PanelMap are timed against working out each calibration
+                directly. Run it on the board, or on the host from the src
+                directory with:
+
+                    python -m hal benchmark.py
+
+
+    @author     Jake Lesher
+    @author     Daniel Xu
+    @date       10/16/2026
+'''
+
+import array, clock, pyb, sys
+import BNO055, touchpanel, panelmap, ClosedLoop, fixedpoint, scheduler, shares
+
+## The number of calls to time for each routine.
+CALLS = 2_000
+
+# The benchmark is always timed on the hardware clock, even while the
+# routines being timed run on a virtual one.
+_timer = clock.HardwareClock()
+
+
+class SteppingClock(clock.VirtualClock):
+    '''!@brief      A virtual clock that moves on 10 ms every time the
+                    microsecond counter is read.
+        @details    TouchPanel.Filter() moves its estimate on by the time
+                    since its last call, so back-to-back calls need a clock
+                    that moves on between them to do the same work as on the
+                    board.
+    '''
+    def ticks_us(self):
+        '''!@brief      Moves the clock on and returns the microsecond counter.
+            @return     The virtual time [us].
+        '''
+        self.advance(10_000)
+        return super().ticks_us()
+
+
+def time_calls(fun, *args):
+    '''!@brief      Finds the average time of one call of a function.
+        @param      fun is the function to call.
+        @param      args are the arguments to call it with.
+        @return     The average time per call [us].
+    '''
+    start = _timer.ticks_us()
+    for _ in range(CALLS):
+        fun(*args)
+    return clock.ticks_diff(_timer.ticks_us(), start)/CALLS
+
+
+def compare(name, plain, fast, *args):
+    '''!@brief      Times a plain routine against the one the drivers use.
+        @param      name is the name to print for the routine.
+        @param      plain is the plain Python version.
+        @param      fast is the version the drivers use.
+        @param      args are the arguments to call both versions with.
+    '''
+    plain_us = time_calls(plain, *args)
+    fast_us = time_calls(fast, *args)
+    print(f'{name:<24}{plain_us:>10.2f}{fast_us:>10.2f}{plain_us/fast_us:>9.2f}x')
+
+
+def scan_per_call(TP):
+    '''!@brief      The touch panel scan as it was before the pins and ADC
+                    channels were created once, kept to time against.
+        @details    Every phase builds new Pin and ADC objects for the pins it
+                    uses, in the order X, Z, Y.
+        @param      TP is the TouchPanel object to scan.
+        @return     A tuple of xpos, ypos, contact and time_span, as from
+                    TouchPanel.Scan().
+    '''
+    Pin = pyb.Pin
+    ADC = pyb.ADC
+    start_time = clock.ticks_us()
+    Pin(TP.Pinxm, mode=Pin.OUT_PP, value=0)
+    Pin(TP.Pinxp, mode=Pin.OUT_PP, value=1)
+    Pin(TP.Pinyp, mode=Pin.IN)
+    xpos = ADC(TP.Pinym).read()
+    Pin(TP.Pinyp, mode=Pin.OUT_PP, value=1)
+    ADC(TP.Pinxp)
+    contact = ADC(TP.Pinym).read() < touchpanel.CONTACT_THRESHOLD
+    Pin(TP.Pinxp, mode=Pin.IN)
+    Pin(TP.Pinym, mode=Pin.OUT_PP, value=0)
+    ypos = ADC(TP.Pinxm).read()
+    # Put the pins back the way TP expects to find them.
+    for pin in TP.pins:
+        pin.init(Pin.ANALOG)
+    TP.pin_state[:] = bytes((touchpanel.FLOAT,)*4)
+    return (xpos, ypos, contact, clock.ticks_diff(clock.ticks_us(), start_time))
+
+
+def scan_time(scan, TP):
+    '''!@brief      Finds the average time_span of a touch panel scan.
+        @param      scan is the scan function to call with TP.
+        @param      TP is the TouchPanel object to scan.
+        @return     The average time_span [us].
+    '''
+    total = 0
+    for _ in range(CALLS):
+        total += scan(TP)[3]
+    return total/CALLS
+
+
+def burst_tradeoff(samples, reduce, scans=500):
+    '''!@brief      Scans the panel with burst readings and finds the scan time
+                    and the spread of the x readings.
+        @details    The ball is left in one place, so any spread in the
+                    readings is noise.
+        @param      samples is the number of ADC samples in each reading.
+        @param      reduce is touchpanel.MEDIAN or touchpanel.TRIMMED_MEAN.
+        @param      scans is the number of scans to make.
+        @return     A tuple of the mean time_span [us] and the standard
+                    deviation of the x readings [ADC counts].
+    '''
+    TP = touchpanel.TouchPanel(samples=samples, reduce=reduce)
+    total = 0
+    sum_x = 0
+    sum_x2 = 0
+    for _ in range(scans):
+        xpos, ypos, contact, time_span = TP.Scan()
+        total += time_span
+        sum_x += xpos
+        sum_x2 += xpos*xpos
+    mean_x = sum_x/scans
+    return total/scans, max(sum_x2/scans - mean_x*mean_x, 0)**0.5
+
+
+def quadratic_convert(coef, X, Y, VX, VY):
+    '''!@brief      Converts a reading and a velocity straight from the
+                    polynomials of a calibration, the work the grid of a
+                    PanelMap saves.
+        @param      coef is the array of the panelmap.COEFFS coefficients.
+        @param      X is the x reading [ADC units].
+        @param      Y is the y reading [ADC units].
+        @param      VX is the x velocity [ADC units/s].
+        @param      VY is the y velocity [ADC units/s].
+        @return     A tuple of the x and y positions [mm] and velocities
+                    [mm/s].
+    '''
+    x, y = panelmap.evaluate(coef, X, Y)
+    u = (X - 2048)/2048
+    v = (Y - 2048)/2048
+    du = (VX*(coef[1] + 2*coef[3]*u + coef[4]*v) + VY*(coef[2] + coef[4]*u + 2*coef[5]*v))/2048
+    dv = (VX*(coef[7] + 2*coef[9]*u + coef[10]*v) + VY*(coef[8] + coef[10]*u + 2*coef[11]*v))/2048
+    return (x, y, du, dv)
+
+
+def calibration_error(order, bow):
+    '''!@brief      Calibrates the emulated touch panel and finds the error of
+                    the calibrated positions.
+        @details    The ball is put on each calibration point of the order in
+                    turn and read once, the calibration is fitted to the taps,
+                    and then the ball is moved over the calibrated area of the
+                    panel in 4 mm steps, converting each reading through the
+                    map of the calibration.
+        @param      order is panelmap.AFFINE or panelmap.QUADRATIC.
+        @param      bow is the bend of the emulated panel, see
+                    hal.panel.ResistivePanel.
+        @return     A tuple of the RMS and the largest error [mm].
+    '''
+    from hal import board
+    panel = board.touch_panel
+    panel.bow = bow
+    TP = touchpanel.TouchPanel(order=order)
+    try:
+        for name, x, y in TP.cal_points:
+            panel.touch(x, y)
+            TP.cal_adc.append((TP.xScan(), TP.yScan()))
+        Map = panelmap.make_map(TP.Fit())
+        total = 0
+        worst = 0
+        count = 0
+        for x in range(-80, 81, 4):
+            for y in range(-40, 41, 4):
+                panel.touch(x, y)
+                Map.convert(TP.xScan(), TP.yScan(), 0, 0)
+                error = (Map.x - x)**2 + (Map.y - y)**2
+                total += error
+                worst = max(worst, error)
+                count += 1
+    finally:
+        panel.bow = 0
+        panel.release()
+    return (total/count)**0.5, worst**0.5
+
+
+def velocity_error(noise, scans=2_000):
+    '''!@brief      Finds how well the touch panel filter estimates the ball
+                    velocity.
+        @details    The ball swings back and forth along x with an amplitude
+                    of 1000 ADC counts and a period of 2 s, read every 10 ms
+                    with Gaussian noise. The velocity of TouchPanel.Filter()
+                    is compared with the finite difference of the readings,
+                    which is how the controller used to work the velocity out.
+                    It runs on a virtual clock.
+        @param      noise is the standard deviation of the reading noise
+                    [ADC counts].
+        @param      scans is the number of readings.
+        @return     A tuple of the RMS velocity errors of the finite
+                    difference and of the filter [ADC counts/s].
+    '''
+    import math, random
+    rng = random.Random(3)
+    vclock = clock.VirtualClock()
+    clock.set_source(vclock)
+    try:
+        TP = touchpanel.TouchPanel()
+        last = None
+        diff_err = 0
+        filter_err = 0
+        count = 0
+        for n in range(scans):
+            t = n*0.01
+            x = 2048 + 1000*math.sin(math.pi*t)
+            vx = 1000*math.pi*math.cos(math.pi*t)
+            reading = x + rng.gauss(0, noise)
+            TP.Filter((reading, 2048, True))
+            # The first second lets the filter settle.
+            if n >= 100:
+                diff_err += ((reading - last)/0.01 - vx)**2
+                filter_err += (TP.vx_hat - vx)**2
+                count += 1
+            last = reading
+            vclock.advance(10_000)
+    finally:
+        clock.set_source(clock.HardwareClock())
+    return (diff_err/count)**0.5, (filter_err/count)**0.5
+
+
+def panel_sampling(background, frames=200):
+    '''!@brief      Scans the touch panel every frame after a task that takes
+                    a random time, and finds how evenly the scans are spaced.
+        @details    The load task busy-waits for up to 4 ms each frame, like
+                    a long I2C transfer or a burst of printing. The scans are
+                    either taken by the panel task itself, after the load,
+                    or by the timer interrupt of TouchPanel.start_sampling(),
+                    in which case the panel task only drains the queue.
+        @param      background is True to scan from the timer interrupt, or
+                    False to scan inside the task.
+        @param      frames is the number of 10 ms frames to run.
+        @return     A tuple of the standard deviation and the largest error
+                    of the time between scans from 10 ms [us].
+    '''
+    import random
+    rng = random.Random(5)
+    TP = touchpanel.TouchPanel()
+    stamps = []
+    
+    def load_task():
+        while True:
+            start = clock.ticks_us()
+            busy = rng.randint(0, 4_000)
+            while clock.ticks_diff(clock.ticks_us(), start) < busy:
+                pass
+            yield None
+    
+    def panel_task():
+        while True:
+            if background:
+                count = TP.queue.get_into(TP.drain)
+                for idx in range(0, count, 2):
+                    stamps.append(TP.drain[idx])
+            else:
+                stamps.append(clock.ticks_us())
+                TP.Scan()
+            yield None
+    
+    task_list = scheduler.Scheduler()
+    task_list.append(scheduler.Task(load_task(), 'load', 3, 10_000))
+    panel = scheduler.Task(panel_task(), 'panel', 3, 10_000)
+    task_list.append(panel)
+    if background:
+        TP.start_sampling()
+    try:
+        while panel.runs < frames:
+            task_list.run_once()
+    finally:
+        if background:
+            TP.sample_timer.deinit()
+    errors = [clock.ticks_diff(stamps[idx], stamps[idx - 1]) - 10_000
+              for idx in range(1, len(stamps))]
+    mean = sum(errors)/len(errors)
+    spread = (sum((e - mean)**2 for e in errors)/len(errors))**0.5
+    return spread, max(abs(e) for e in errors)
+
+
+def imu_frames(background, frames=100, busy=False):
+    '''!@brief      Reads the IMU every frame, like taskIMU, with a consumer
+                    task running after it.
+        @param      background is True to read the IMU as a background job,
+                    or False to read it inside the task.
+        @param      frames is the number of 10 ms frames to run.
+        @param      busy is True to add a low priority task that takes up
+                    the rest of every frame, so a background read never gets
+                    any idle time and only runs once it is overdue.
+        @return     A tuple of the mean run time of the IMU task, the mean
+                    release jitter of the consumer and the mean age of the
+                    data when the consumer reads it [us].
+    '''
+    IMU = BNO055.BNO055(pyb.I2C(1, pyb.I2C.CONTROLLER))
+    IMU.mode(1)
+    raw = array.array('h', [0, 0, 0, 0, 0, 0])
+    Data = shares.RecordShare(('x', 'y', 'z'))
+    ages = []
+    
+    def publish(raw, stamp):
+        Data.write((raw[4], raw[5], raw[3]), stamp)
+    
+    def imu_task():
+        while True:
+            if background:
+                if not IMU.pending:
+                    IMU.start_read_all(raw, publish)
+            else:
+                stamp = clock.ticks_us()
+                IMU.read_all_into(raw)
+                publish(raw, stamp)
+            yield None
+    
+    def consumer_task():
+        while True:
+            ages.append(Data.age())
+            yield None
+    
+    def busy_task():
+        while True:
+            clock.sleep_us(9_900)
+            yield None
+    
+    task_list = scheduler.Scheduler()
+    imu = scheduler.Task(imu_task(), 'imu', 3, 10_000, profile=True, writes=(Data,))
+    consumer = scheduler.Task(consumer_task(), 'consumer', 3, 10_000, profile=True, reads=(Data,))
+    task_list.append(imu)
+    task_list.append(consumer)
+    if busy:
+        task_list.append(scheduler.Task(busy_task(), 'busy', 1, 10_000))
+    if background:
+        task_list.add_background(IMU)
+    while consumer.runs < frames:
+        task_list.run_once()
+    # The first frame has no data yet when the IMU is read in the background.
+    return (imu.profile.run_time.mean(), consumer.profile.jitter.mean(),
+            sum(ages[1:])/(len(ages) - 1))
+
+
+def imu_cadence(phase_lock, frames=500):
+    '''!@brief      Reads the emulated IMU every frame in the background and
+                    finds how old the samples are when they are used.
+        @details    This needs the IMU emulator of the HAL, which knows when
+                    it made each sample. Its oscillator runs 0.2% fast, so
+                    without the phase lock the time from a sample to the
+                    frame that reads it sweeps through the whole period.
+        @param      phase_lock is True to move the frames after every read as
+                    taskIMU does.
+        @param      frames is the number of 10 ms frames to run.
+        @return     A tuple of the fraction of frames that got a new sample
+                    and the mean age of the sample used by each frame [us].
+    '''
+    from hal import board, bno055
+    old_imu = board.imu
+    emulator = bno055.BNO055Emulator(rate_error=0.002, phase=3_000)
+    board.attach_i2c(1, bno055.BNO055_ADDR, emulator)
+    try:
+        IMU = BNO055.BNO055(pyb.I2C(1, pyb.I2C.CONTROLLER))
+        IMU.mode(1)
+        raw = array.array('h', [0, 0, 0, 0, 0, 0])
+        Data = shares.RecordShare(('x', 'y', 'z'))
+        task_list = scheduler.Scheduler()
+        sample = [0]
+        counts = [0, 0]
+        ages = []
+        
+        def publish(raw, stamp):
+            if phase_lock:
+                task_list.request_shift(IMU.correction)
+            if IMU.new:
+                sample[0] = emulator.sample_stamp
+                Data.write((raw[0], raw[1], raw[2]), stamp)
+        
+        def imu_task():
+            while True:
+                if not IMU.pending:
+                    IMU.start_read_all(raw, publish)
+                yield None
+        
+        def consumer_task():
+            seq = Data.seq
+            while True:
+                # Every sample differs from the one before, as a real sensor's
+                # noise would make it.
+                emulator.set_gyro(counts[0] % 100, 0, 0)
+                counts[0] += 1
+                if Data.seq != seq:
+                    seq = Data.seq
+                    counts[1] += 1
+                if counts[1]:
+                    ages.append(clock.ticks_diff(clock.ticks_us(), sample[0]))
+                yield None
+        
+        imu = scheduler.Task(imu_task(), 'imu', 3, 10_000, writes=(Data,))
+        consumer = scheduler.Task(consumer_task(), 'consumer', 3, 10_000, reads=(Data,))
+        task_list.append(imu)
+        task_list.append(consumer)
+        task_list.add_background(IMU)
+        while consumer.runs < frames:
+            task_list.run_once()
+        # The first frames settle the lock and are left out.
+        settled = ages[frames//5:]
+        return counts[1]/counts[0], sum(settled)/len(settled)
+    finally:
+        board.attach_i2c(1, bno055.BNO055_ADDR, old_imu)
+
+
+if __name__ == '__main__':
+    if touchpanel.fastpath is None:
+        print('The native code emitters are not available, so both columns '
+              'time the plain Python versions.')
+    elif sys.platform != 'pyboard':
+        print('On the host the copies in fastpath.py are not compiled, so both '
+              'columns time plain Python.')
+    print(f'{"routine":<24}{"plain us":>10}{"used us":>10}{"speedup":>10}')
+
+    raw = bytearray((0x10, 0xFF, 0x20, 0x01, 0xF0, 0x7F))
+    words = array.array('h', [0, 0, 0])
+    compare('merge_int16', BNO055.merge_int16_py, BNO055.merge_int16, raw, words)
+
+    # The touch panel routines run on a virtual clock so the filter always
+    # sees 10 ms between readings. Read_Panel() also includes the ADC scan.
+    TP = touchpanel.TouchPanel()
+    beta = (176/4095, 0, 0, 100/4095, -88, -50)
+    Map = panelmap.make_map(panelmap.from_beta(beta))
+    clock.set_source(SteppingClock())
+    try:
+        compare('TouchPanel.Filter', touchpanel.TouchPanel.Filter_py,
+                touchpanel.TouchPanel.Filter, TP, (2000, 1800, True))
+        compare('TouchPanel.Read_Panel', touchpanel.TouchPanel.Read_Panel_py,
+                touchpanel.TouchPanel.Read_Panel, TP, Map)
+    finally:
+        clock.set_source(clock.HardwareClock())
+    compare('AffineMap.convert', panelmap.AffineMap.convert_py,
+            panelmap.AffineMap.convert, Map, 1000.5, 3000.25, 50.0, -20.0)
+    Grid = panelmap.PanelMap(Map.coef)
+    compare('PanelMap.convert', panelmap.PanelMap.convert_py,
+            panelmap.PanelMap.convert, Grid, 1000.5, 3000.25, 50.0, -20.0)
+
+    before_us = scan_time(scan_per_call, TP)
+    after_us = scan_time(touchpanel.TouchPanel.Scan, TP)
+    print(f'{"TouchPanel.Scan time_span":<24}{before_us:>10.2f}{after_us:>10.2f}'
+          f'{before_us/after_us:>9.2f}x   (objects per scan / made once)')
+
+    # The scan modes, with the ball on the emulated panel and then off it.
+    if sys.platform != 'pyboard':
+        from hal import board
+        print(f'{"scan mode":<24}{"contact us":>10}{"none us":>10}')
+        for name, contact_first, alternate in (('X-Z-Y', False, False),
+                                               ('contact first', True, False),
+                                               ('contact first, alt.', True, True)):
+            TP_mode = touchpanel.TouchPanel(contact_first, alternate)
+            board.touch_panel.touch(20, -10)
+            contact_us = scan_time(touchpanel.TouchPanel.Scan, TP_mode)
+            board.touch_panel.release()
+            none_us = scan_time(touchpanel.TouchPanel.Scan, TP_mode)
+            print(f'{name:<24}{contact_us:>10.2f}{none_us:>10.2f}')
+
+    # Burst readings. On the host the emulated panel is given 20 counts of
+    # noise and the scans run on a virtual clock, so the times are only the
+    # sampling times the bursts would take on the board.
+    print()
+    print(f'{"burst reading":<24}{"time_span us":>13}{"x std counts":>14}')
+    if sys.platform != 'pyboard':
+        board.touch_panel.noise = 20
+        board.touch_panel.touch(20, -10)
+        clock.set_source(clock.VirtualClock())
+    try:
+        for samples, reduce in ((1, touchpanel.MEDIAN), (3, touchpanel.MEDIAN),
+                                (5, touchpanel.MEDIAN), (9, touchpanel.MEDIAN),
+                                (8, touchpanel.TRIMMED_MEAN), (16, touchpanel.TRIMMED_MEAN)):
+            time_span, spread = burst_tradeoff(samples, reduce)
+            name = f'{samples} x {"median" if reduce == touchpanel.MEDIAN else "trimmed mean"}'
+            print(f'{name:<24}{time_span:>13.1f}{spread:>14.2f}')
+    finally:
+        if sys.platform != 'pyboard':
+            clock.set_source(clock.HardwareClock())
+            board.touch_panel.noise = 0
+            board.touch_panel.release()
+    print()
+
+    # The spacing of the touch panel scans with a task of varying length
+    # before the panel task.
+    print(f'{"panel scans":<24}{"interval std us":>16}{"worst error us":>16}')
+    for background in (False, True):
+        spread, worst = panel_sampling(background)
+        print(f'{"timer interrupt" if background else "in task":<24}{spread:>16.0f}{worst:>16.0f}')
+    print()
+
+    # The accuracy of the touch panel calibrations on a panel that bends
+    # its readings by 3 % near the edges, and the time to convert one
+    # reading and velocity to mm.
+    if sys.platform != 'pyboard':
+        print(f'{"panel calibration":<24}{"RMS mm":>10}{"worst mm":>10}')
+        for name, order in (('affine, 5 taps', panelmap.AFFINE),
+                            ('quadratic, 9 taps', panelmap.QUADRATIC)):
+            rms, worst = calibration_error(order, 0.03)
+            print(f'{name:<24}{rms:>10.2f}{worst:>10.2f}')
+        print()
+    coef = panelmap.fit([(X, Y) for X in (300, 2048, 3800) for Y in (300, 2048, 3800)],
+                        [(x, y) for x in (-80, 0, 80) for y in (-40, 0, 40)],
+                        panelmap.QUADRATIC)
+    Affine = panelmap.AffineMap(panelmap.from_beta(beta))
+    Map = panelmap.PanelMap(coef)
+    print(f'{"conversion per sample":<24}{"us":>10}')
+    for name, fun, args in (('AffineMap, direct', panelmap.AffineMap.convert, (Affine, 1000.5, 3000.25, 50.0, -20.0)),
+                            ('quadratic, direct', quadratic_convert, (coef, 1000.5, 3000.25, 50.0, -20.0)),
+                            ('PanelMap grid', panelmap.PanelMap.convert, (Map, 1000.5, 3000.25, 50.0, -20.0))):
+        print(f'{name:<24}{time_calls(fun, *args):>10.2f}')
+    print()
+
+    # The ball velocity from the Kalman filter, against the finite difference
+    # of the readings it replaces.
+    print(f'{"ball velocity RMS error":<24}{"difference":>11}{"Kalman":>10}   (ADC counts/s)')
+    for noise in (2, 8, 20):
+        diff_rms, filter_rms = velocity_error(noise)
+        print(f'{f"{noise} counts of noise":<24}{diff_rms:>11.0f}{filter_rms:>10.0f}')
+    print()
+
+    CL = ClosedLoop.ClosedLoop()
+    CL.set_gain_outer(0.16, 0.01, 0.02)
+    CL.set_gain_inner(11, 0, 0.2)
+    compare('ClosedLoop.update_inner', ClosedLoop.ClosedLoop.update_inner_py,
+            ClosedLoop.ClosedLoop.update_inner, CL, 1.5, 0.01, -20.0, 0.5)
+    compare('ClosedLoop.update_outer', ClosedLoop.ClosedLoop.update_outer_py,
+            ClosedLoop.ClosedLoop.update_outer, CL, 12.0, 0.01, 80.0, 0, True)
+
+    Control = ClosedLoop.Cascade()
+    Control.set_gain_outer(0.16, 0.01, 0.02)
+    Control.set_gain_inner(11, 0, 0.2)
+    pos = array.array('f', [12, -7])
+    vel = array.array('f', [80, -30])
+    eul_ang = array.array('f', [1.5, -0.5])
+    ang_vel = array.array('f', [-20, 10])
+    compare('Cascade.update', ClosedLoop.Cascade.update_py, ClosedLoop.Cascade.update,
+            Control, pos, vel, eul_ang, ang_vel, 0.01, ClosedLoop.RUN_OUTER)
+
+    # The fixed-point cascade from fixedpoint.py, against the float one, as
+    # taskController runs it with fixed=True. On the host ints are objects
+    # like floats, so only the board shows what the fixed-point path saves.
+    ControlQ = fixedpoint.CascadeQ()
+    ControlQ.set_gain_outer(0.16, 0.01, 0.02)
+    ControlQ.set_gain_inner(11, 0, 0.2)
+    pos_q = array.array('l', [fixedpoint.to_fixed(x) for x in pos])
+    vel_q = array.array('l', [fixedpoint.to_fixed(x) for x in vel])
+    eul_ang_q = array.array('l', [fixedpoint.to_fixed(x) for x in eul_ang])
+    ang_vel_q = array.array('l', [fixedpoint.to_fixed(x) for x in ang_vel])
+    float_us = time_calls(ClosedLoop.Cascade.update, Control, pos, vel, eul_ang,
+                          ang_vel, 0.01, ClosedLoop.RUN_OUTER)
+    fixed_us = time_calls(ControlQ.update_us, pos_q, vel_q, eul_ang_q, ang_vel_q,
+                          10_000, ClosedLoop.RUN_OUTER)
+    print(f'{"Cascade float vs fixed":<24}{float_us:>10.2f}{fixed_us:>10.2f}{float_us/fixed_us:>9.2f}x')
+
+    print()
+    if sys.platform != 'pyboard':
+        clock.set_source(clock.VirtualClock())
+        print('IMU reads use the bus times modelled by the HAL on a virtual clock.')
+    print(f'{"IMU read":<24}{"IMU task us":>12}{"next task late us":>19}{"data age us":>13}')
+    try:
+        for name, background, busy in (('in task', False, False),
+                                       ('background', True, False),
+                                       ('background, no idle', True, True)):
+            run_time, jitter, age = imu_frames(background, busy=busy)
+            print(f'{name:<24}{run_time:>12.0f}{jitter:>19.0f}{age:>13.0f}')
+        
+        if sys.platform != 'pyboard':
+            print()
+            print(f'{"IMU frames":<24}{"new samples %":>14}{"sample age us":>15}')
+            for phase_lock in (False, True):
+                new, age = imu_cadence(phase_lock)
+                print(f'{"phase locked" if phase_lock else "free running":<24}{100*new:>14.1f}{age:>15.0f}')
+    finally:
+        clock.set_source(clock.HardwareClock())
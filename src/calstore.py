@@ -0,0 +1,244 @@
+'''!
+    @file       calstore.py
+
+    @brief      One binary file holding the calibration of the IMU and the
+                touch panel.
+
+    @details    The 22-byte calibration profile of the BNO055 and the twelve
+                coefficients of the touch panel calibration (see panelmap.py)
+                are kept together in calibration.bin, laid out as:
+
+                - 4 bytes: the marker b'BBCS',
+                - 1 byte: the version of the layout, VERSION,
+                - 1 byte: flags, HAS_IMU and HAS_PANEL, saying which parts
+                  hold a calibration,
+                - 22 bytes: the BNO055 calibration profile,
+                - 48 bytes: the twelve panel coefficients as little-endian
+                  floats,
+                - 2 bytes: the CRC-16/CCITT of all the bytes before it.
+
+                The whole file is read with one readinto() into a buffer made
+                when the store is created, and checked before anything in it
+                is used. If there is no good file, the text files written by
+                earlier versions, IMU_cal_coeffs.txt and TP_cal_coeffs.txt,
+                are read instead and copied into a new binary file.
+
+                taskIMU and taskPanel share the module level store object, so
+                the file is only read once at start up.
+
+
+    @author     Jake Lesher
+    @author     Daniel Xu
+    @date       10/16/2026
+'''
+
+import array, struct, micropython
+import panelmap
+
+## The name of the calibration file.
+FILENAME = "calibration.bin"
+
+## The names of the text files written by earlier versions.
+LEGACY_IMU = "IMU_cal_coeffs.txt"
+LEGACY_PANEL = "TP_cal_coeffs.txt"
+
+## The marker at the start of the file.
+MAGIC = b'BBCS'
+
+## The version of the layout of the file.
+VERSION = micropython.const(1)
+
+## Flag set when the file holds a BNO055 calibration profile.
+HAS_IMU = micropython.const(0x01)
+
+## Flag set when the file holds the touch panel coefficients.
+HAS_PANEL = micropython.const(0x02)
+
+## The number of bytes in the BNO055 calibration profile.
+IMU_LEN = micropython.const(22)
+
+# Where each part starts in the file, and the length of the file.
+_FLAGS = micropython.const(5)
+_IMU = micropython.const(6)
+_PANEL = micropython.const(28)
+_CRC = micropython.const(76)
+SIZE = micropython.const(78)
+
+
+def crc16(buf, length):
+    '''!@brief      Works out the CRC-16/CCITT of the start of a buffer.
+        @details    This is the CRC with polynomial 0x1021 and a starting
+                    value of 0xFFFF, worked out a bit at a time. It only runs
+                    when the file is loaded or saved, so a lookup table is not
+                    worth its memory.
+        @param      buf is the buffer holding the bytes.
+        @param      length is the number of bytes at the start of buf to use.
+        @return     The 16-bit CRC.
+    '''
+    crc = 0xFFFF
+    for idx in range(length):
+        crc ^= buf[idx] << 8
+        for _ in range(8):
+            if crc & 0x8000:
+                crc = ((crc << 1) ^ 0x1021) & 0xFFFF
+            else:
+                crc = (crc << 1) & 0xFFFF
+    return crc
+
+
+class CalStore:
+    '''!@brief      The calibration of the IMU and the touch panel.
+        @details    After load(), has_imu() and has_panel() tell which parts
+                    are calibrated, imu_profile is a view of the 22-byte
+                    BNO055 profile that can be written straight to the sensor,
+                    and panel_coef is an array('f') of the twelve touch panel
+                    coefficients that panelmap.make_map() makes a map from.
+    '''
+    def __init__(self, filename=FILENAME):
+        '''!@brief      Creates an empty store.
+            @param      filename is the name of the calibration file.
+        '''
+        self.filename = filename
+        self.buf = bytearray(SIZE)
+        self.imu_profile = memoryview(self.buf)[_IMU:_IMU + IMU_LEN]
+        self.panel_coef = array.array('f', panelmap.COEFFS*[0])
+        self.flags = 0
+        self.loaded = False
+
+    def has_imu(self):
+        '''!@brief      Checks if the store holds a BNO055 calibration profile.
+            @return     True if it does.
+        '''
+        return bool(self.flags & HAS_IMU)
+
+    def has_panel(self):
+        '''!@brief      Checks if the store holds the touch panel coefficients.
+            @return     True if it does.
+        '''
+        return bool(self.flags & HAS_PANEL)
+
+    def load(self):
+        '''!@brief      Loads the calibration, once.
+            @details    The binary file is tried first. If it is missing, cut
+                        short or fails its checks, the legacy text files are
+                        read, and anything found in them is saved to a new
+                        binary file. Calling load() again does nothing, so
+                        every task that needs the calibration can call it.
+        '''
+        if self.loaded:
+            return
+        self.loaded = True
+        if self._read():
+            return
+        self.flags = 0
+        self._read_legacy()
+        if self.flags:
+            self.save()
+
+    def _read(self):
+        '''!@brief      Reads and checks the binary file.
+            @return     True if the file was read and is good.
+        '''
+        buf = self.buf
+        try:
+            with open(self.filename, 'rb') as f:
+                count = f.readinto(buf)
+        except OSError:
+            return False
+        if count != SIZE or buf[0:4] != MAGIC or buf[4] != VERSION:
+            return False
+        if crc16(buf, _CRC) != buf[_CRC] | buf[_CRC + 1] << 8:
+            return False
+        self.flags = buf[_FLAGS]
+        coef = self.panel_coef
+        for idx in range(panelmap.COEFFS):
+            coef[idx] = struct.unpack_from('<f', buf, _PANEL + 4*idx)[0]
+        return True
+
+    def _read_legacy(self):
+        '''!@brief      Reads the text files written by earlier versions.
+            @details    The IMU file is one line of 22 comma separated hex
+                        bytes and the touch panel file one line of 6 comma
+                        separated floats. A file that is missing or cannot be
+                        parsed is skipped.
+        '''
+        try:
+            with open(LEGACY_IMU, 'r') as f:
+                cal_coeffs = f.readline().strip().split(',')
+            if len(cal_coeffs) == IMU_LEN:
+                profile = self.imu_profile
+                for idx in range(IMU_LEN):
+                    profile[idx] = int(cal_coeffs[idx], 16)
+                self.flags |= HAS_IMU
+        except (OSError, ValueError):
+            pass
+        try:
+            with open(LEGACY_PANEL, 'r') as f:
+                cal_coeffs = f.readline().strip().split(',')
+            if len(cal_coeffs) == 6:
+                panelmap.from_beta([float(c) for c in cal_coeffs], self.panel_coef)
+                self.flags |= HAS_PANEL
+        except (OSError, ValueError):
+            pass
+
+    def set_imu(self, profile):
+        '''!@brief      Stores a new BNO055 calibration profile and saves it.
+            @param      profile is the 22-byte profile read from the sensor.
+        '''
+        self.imu_profile[:] = profile
+        self.flags |= HAS_IMU
+        self.save()
+
+    def set_panel(self, coef):
+        '''!@brief      Stores new touch panel coefficients and saves them.
+            @param      coef is a sequence of the twelve coefficients from
+                        panelmap.fit().
+        '''
+        for idx in range(panelmap.COEFFS):
+            self.panel_coef[idx] = coef[idx]
+        self.flags |= HAS_PANEL
+        self.save()
+
+    def save(self):
+        '''!@brief      Writes the store to the binary file in one write.
+        '''
+        buf = self.buf
+        buf[0:4] = MAGIC
+        buf[4] = VERSION
+        buf[_FLAGS] = self.flags
+        for idx in range(panelmap.COEFFS):
+            struct.pack_into('<f', buf, _PANEL + 4*idx, self.panel_coef[idx])
+        crc = crc16(buf, _CRC)
+        buf[_CRC] = crc & 0xFF
+        buf[_CRC + 1] = crc >> 8
+        with open(self.filename, 'wb') as f:
+            f.write(buf)
+
+
+## The store that taskIMU and taskPanel share.
+store = CalStore()
+
+
+if __name__ == '__main__':
+    # Saves a store, loads it back into a new one, and checks that a file
+    # with a changed byte is turned away.
+    coef = (0.5, -0.25, 0.125, 2.0, -80.0, 60.5, 1.0, 3.0, -2.0, 0.0, 0.75, 8.0)
+    test = CalStore('calibration_test.bin')
+    test.loaded = True
+    test.set_imu(bytes(range(IMU_LEN)))
+    test.set_panel(coef)
+
+    check = CalStore('calibration_test.bin')
+    assert check._read()
+    assert check.has_imu() and check.has_panel()
+    assert bytes(check.imu_profile) == bytes(range(IMU_LEN))
+    assert tuple(check.panel_coef) == coef
+
+    with open('calibration_test.bin', 'r+b') as f:
+        f.seek(_PANEL)
+        f.write(b'\xff')
+    assert not CalStore('calibration_test.bin')._read()
+
+    import os
+    os.remove('calibration_test.bin')
+    print('The calibration store checks passed.')
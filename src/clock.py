@@ -0,0 +1,131 @@
+'''!
+    @file       clock.py
+
+    @brief      The time source used by every task and driver.
+
+    @details    Tasks and drivers call clock.ticks_us(), clock.ticks_ms(),
+                clock.sleep_ms() and so on instead of the time module, and the
+                scheduler calls clock.idle() when nothing is due. By default
+                these map straight onto the hardware tick counters. Calling
+                set_source() with a VirtualClock switches every user over to a
+                clock that only moves when it is told to, so a simulation or a
+                replay of logged data can step through frames instantly
+                instead of waiting on wall time.
+
+                The functions are looked up on this module at each call, so
+                always call them as clock.ticks_us() rather than importing
+                them by name.
+
+
+    @author     Jake Lesher
+    @author     Daniel Xu
+    @date       10/16/2026
+'''
+
+import time, pyb, micropython
+
+## Idle periods longer than this many microseconds are spent asleep in
+#  pyb.wfi(). The SysTick interrupt wakes the core every millisecond, so
+#  shorter waits are spun out to keep the release jitter low.
+IDLE_THRESHOLD = micropython.const(1_000)
+
+# The ticks values wrap around after 2**30 ticks on the STM32 port of
+# MicroPython, so virtual time is masked to the same range.
+_TICKS_MAX = micropython.const((1 << 30) - 1)
+
+
+class HardwareClock:
+    '''!@brief      The clock based on the hardware tick counters.
+    '''
+    ticks_us = staticmethod(time.ticks_us)
+    ticks_ms = staticmethod(time.ticks_ms)
+    sleep_ms = staticmethod(time.sleep_ms)
+    sleep_us = staticmethod(time.sleep_us)
+
+    @staticmethod
+    def idle(us):
+        '''!@brief      Waits while nothing is due.
+            @details    The core is put to sleep until the next interrupt if
+                        the wait is long enough, otherwise this returns
+                        straight away and the caller checks again.
+            @param      us is the time until something is due [us].
+        '''
+        if us > IDLE_THRESHOLD:
+            pyb.wfi()
+
+
+class VirtualClock:
+    '''!@brief      A clock that only moves when it is advanced.
+        @details    Sleeping and idling advance the clock by the requested
+                    time instead of waiting, so code that runs on this clock
+                    takes no wall time to wait for anything. The ticks values
+                    wrap around the same way as the hardware counters.
+    '''
+    def __init__(self, start_us=0):
+        '''!@brief      Creates a virtual clock.
+            @param      start_us is the starting time [us].
+        '''
+        self.now_us = start_us
+
+    def advance(self, us):
+        '''!@brief      Moves the clock forward.
+            @param      us is the time to move forward by [us].
+        '''
+        if us > 0:
+            self.now_us += us
+
+    def ticks_us(self):
+        '''!@brief      Returns the microsecond counter.
+            @return     The virtual time [us], wrapped like the hardware.
+        '''
+        return self.now_us & _TICKS_MAX
+
+    def ticks_ms(self):
+        '''!@brief      Returns the millisecond counter.
+            @return     The virtual time [ms], wrapped like the hardware.
+        '''
+        return (self.now_us//1_000) & _TICKS_MAX
+
+    def sleep_ms(self, ms):
+        '''!@brief      Moves the clock forward by a number of milliseconds.
+            @param      ms is the time to sleep [ms].
+        '''
+        self.advance(ms*1_000)
+
+    def sleep_us(self, us):
+        '''!@brief      Moves the clock forward by a number of microseconds.
+            @param      us is the time to sleep [us].
+        '''
+        self.advance(us)
+
+    def idle(self, us):
+        '''!@brief      Moves the clock forward to when something is due.
+            @param      us is the time until something is due [us].
+        '''
+        self.advance(us)
+
+
+## Offsets a ticks value, as time.ticks_add(). Both clocks wrap at the same
+#  period, so the hardware version works for either.
+ticks_add = time.ticks_add
+
+## Finds the signed difference between two ticks values, as time.ticks_diff().
+ticks_diff = time.ticks_diff
+
+
+def set_source(source):
+    '''!@brief      Switches every user of the clock to a new time source.
+        @param      source is a HardwareClock or VirtualClock object.
+    '''
+    global ticks_us, ticks_ms, sleep_ms, sleep_us, idle, current
+    current = source
+    ticks_us = source.ticks_us
+    ticks_ms = source.ticks_ms
+    sleep_ms = source.sleep_ms
+    sleep_us = source.sleep_us
+    idle = source.idle
+
+
+## The time source that is currently in use.
+current = None
+set_source(HardwareClock())
@@ -0,0 +1,428 @@
+'''!
+    @file       fastpath.py
+
+    @brief      Natively compiled versions of the routines that run every frame.
+
+    @details    MicroPython can compile a function to machine code instead of
+                bytecode with the @micropython.native decorator, or to machine
+                code that works directly on machine integers and pointers with
+                @micropython.viper. The functions in this file are copies of
+                the per-frame routines of the drivers with one of those
+                decorators added:
+
+                - merge_int16() merges the bytes of the BNO055 readings,
+                - touchpanel_filter() and touchpanel_read_panel() are
+                  TouchPanel.Filter() and TouchPanel.Read_Panel(),
+                - affinemap_convert() and panelmap_convert() are
+                  AffineMap.convert() and PanelMap.convert() in panelmap.py,
+                - closedloop_update_inner(), closedloop_update_outer() and
+                  cascade_update() are the update methods in ClosedLoop.py.
+
+                BNO055.py, touchpanel.py, panelmap.py and ClosedLoop.py
+                import this file and use these versions in place of their
+                own. If the firmware was built without the native code
+                emitters, importing this file fails and the drivers quietly
+                keep their plain Python versions. The plain versions are kept
+                with a _py suffix either way, and benchmark.py times one
+                against the other. Under the HAL the decorators do nothing,
+                so the copies run as plain Python on the host.
+
+                Each copy must be kept the same as the plain version it
+                replaces. Running this file feeds each copy and its plain
+                version the same recorded inputs and checks that they give
+                the same results, on the board or on the host with:
+
+                    python -m hal fastpath.py
+
+
+    @author     Jake Lesher
+    @author     Daniel Xu
+    @date       10/16/2026
+'''
+
+import micropython, clock
+
+# The Cascade.update() modes, the same as in ClosedLoop.py. They are copied
+# rather than imported because ClosedLoop.py imports this file, and are
+# constants so the native code is built with them. ClosedLoop.py checks that
+# they match before it swaps in the copies.
+_RUN_OUTER = micropython.const(0)
+_LEVEL = micropython.const(2)
+
+# The grid of a PanelMap, the same as in panelmap.py, which checks that they
+# match before it swaps in the copies.
+_GRID_SHIFT = micropython.const(8)
+_GRID_N = micropython.const(17)
+_INV_STEP = 1/(1 << _GRID_SHIFT)
+
+
+@micropython.viper
+def merge_int16(buf, out):
+    '''!@brief      Merges little-endian byte pairs into signed 16-bit numbers.
+        @details    Storing the merged 16 bits through a ptr16 into an
+                    array('h') gives the sign without any extra work.
+        @param      buf is the buffer of bytes read from the IMU, LSB first.
+        @param      out is the array('h') to put the numbers into.
+    '''
+    src = ptr8(buf)
+    dst = ptr16(out)
+    n = int(len(out))
+    idx = 0
+    while idx < n:
+        dst[idx] = src[2*idx] | (src[2*idx + 1] << 8)
+        idx += 1
+
+
+@micropython.native
+def touchpanel_filter(self, ADC_Data, stamp=None):
+    '''!@brief      TouchPanel.Filter() compiled to machine code.
+        @param      ADC_Data is a tuple containing xpos, ypos (ADC units), and
+                    contact (boolean).
+        @param      stamp is the ticks_us() time of the readings, or None to
+                    use the current time.
+        @return     A tuple of the filtered xpos, ypos and contact.
+    '''
+    now = clock.ticks_us() if stamp is None else stamp
+    dt = clock.ticks_diff(now, self.filter_time)/1_000_000
+    self.filter_time = now
+    contact = ADC_Data[2]
+
+    if contact and self.new_x:
+        if self.x_seen:
+            x_pred = self.x_hat + dt*self.vx_hat
+            resid = ADC_Data[0] - x_pred
+            self.x_hat = x_pred + self.gain_pos*resid
+            self.vx_hat = self.vx_hat + self.gain_vel*resid
+        else:
+            self.x_hat = ADC_Data[0]
+            self.vx_hat = 0
+            self.x_seen = True
+    elif contact:
+        self.x_hat = self.x_hat + dt*self.vx_hat
+    else:
+        self.x_seen = False
+
+    if contact and self.new_y:
+        if self.y_seen:
+            y_pred = self.y_hat + dt*self.vy_hat
+            resid = ADC_Data[1] - y_pred
+            self.y_hat = y_pred + self.gain_pos*resid
+            self.vy_hat = self.vy_hat + self.gain_vel*resid
+        else:
+            self.y_hat = ADC_Data[1]
+            self.vy_hat = 0
+            self.y_seen = True
+    elif contact:
+        self.y_hat = self.y_hat + dt*self.vy_hat
+    else:
+        self.y_seen = False
+
+    return (self.x_hat, self.y_hat, contact)
+
+
+@micropython.native
+def touchpanel_read_panel(self, Map):
+    '''!@brief      TouchPanel.Read_Panel() compiled to machine code.
+        @param      Map is the panelmap.AffineMap or panelmap.PanelMap of
+                    the calibration, or a Beta tuple.
+        @return     A tuple of the calibrated xpos, ypos, contact,
+                    time_span, vx and vy.
+    '''
+    start_time = clock.ticks_us()
+
+    if isinstance(Map, tuple):
+        Map = self._beta_map(Map)
+    ADC_Data = self.Filter(self.Scan())
+    Map.convert(ADC_Data[0], ADC_Data[1], self.vx_hat, self.vy_hat)
+    self.x_cal = round(Map.x, 1)
+    self.y_cal = round(Map.y, 1)
+    self.vx_cal = Map.vx
+    self.vy_cal = Map.vy
+
+    end_time = clock.ticks_us()
+    time_span = clock.ticks_diff(end_time, start_time)
+    return (self.x_cal, self.y_cal, ADC_Data[2], time_span, self.vx_cal, self.vy_cal)
+
+
+@micropython.native
+def affinemap_convert(self, X, Y, VX, VY):
+    '''!@brief      AffineMap.convert() compiled to machine code.
+        @param      X is the x reading [ADC units].
+        @param      Y is the y reading [ADC units].
+        @param      VX is the x velocity [ADC units/s].
+        @param      VY is the y velocity [ADC units/s].
+    '''
+    Beta = self.beta
+    self.x = Beta[0]*X + Beta[1]*Y + Beta[4]
+    self.y = Beta[3]*Y + Beta[2]*X + Beta[5]
+    self.vx = Beta[0]*VX + Beta[1]*VY
+    self.vy = Beta[3]*VY + Beta[2]*VX
+
+
+@micropython.native
+def panelmap_convert(self, X, Y, VX, VY):
+    '''!@brief      PanelMap.convert() compiled to machine code.
+        @param      X is the x reading [ADC units].
+        @param      Y is the y reading [ADC units].
+        @param      VX is the x velocity [ADC units/s].
+        @param      VY is the y velocity [ADC units/s].
+    '''
+    col = int(X) >> _GRID_SHIFT
+    if col < 0:
+        col = 0
+    elif col > _GRID_N - 2:
+        col = _GRID_N - 2
+    row = int(Y) >> _GRID_SHIFT
+    if row < 0:
+        row = 0
+    elif row > _GRID_N - 2:
+        row = _GRID_N - 2
+    fx = (X - (col << _GRID_SHIFT))*_INV_STEP
+    fy = (Y - (row << _GRID_SHIFT))*_INV_STEP
+    grid = self.grid
+    k = 2*(row*_GRID_N + col)
+
+    # The four nodes of the cell, how far the cell is from a
+    # parallelogram, and the slopes of the cell along x and y at the
+    # reading, per cell.
+    x00 = grid[k]
+    x10 = grid[k + 2]
+    x01 = grid[k + 2*_GRID_N]
+    x11 = grid[k + 2*_GRID_N + 2]
+    x_twist = x11 - x01 - x10 + x00
+    dx_col = x10 - x00 + fy*x_twist
+    dx_row = x01 - x00 + fx*x_twist
+    self.x = x00 + fx*dx_col + fy*(x01 - x00)
+    self.vx = (dx_col*VX + dx_row*VY)*_INV_STEP
+
+    y00 = grid[k + 1]
+    y10 = grid[k + 3]
+    y01 = grid[k + 2*_GRID_N + 1]
+    y11 = grid[k + 2*_GRID_N + 3]
+    y_twist = y11 - y01 - y10 + y00
+    dy_col = y10 - y00 + fy*y_twist
+    dy_row = y01 - y00 + fx*y_twist
+    self.y = y00 + fx*dy_col + fy*(y01 - y00)
+    self.vy = (dy_col*VX + dy_row*VY)*_INV_STEP
+
+
+@micropython.native
+def closedloop_update_inner(self, eul_ang, dt, ang_vel, ref):
+    '''!@brief      ClosedLoop.update_inner() compiled to machine code.
+        @param      eul_ang is the platform angle [deg].
+        @param      dt is the time since the last update [s].
+        @param      ang_vel is the platform angular velocity [deg/s].
+        @param      ref is the platform angle reference [deg].
+        @return     The duty cycle of the motor [%].
+    '''
+    error = ref - eul_ang
+    int_error = self.int_error + dt*error
+    self.int_error = int_error
+    Duty = self.Kp_i*error + self.KI_i*int_error - ang_vel*self.Kd_i
+
+    if Duty > self.maxDuty:
+        return self.maxDuty
+    elif Duty < self.minDuty:
+        return self.minDuty
+    return Duty
+
+
+@micropython.native
+def closedloop_update_outer(self, eul_ang, dt, ang_vel, ref, contact):
+    '''!@brief      ClosedLoop.update_outer() compiled to machine code.
+        @param      eul_ang is the ball position [mm].
+        @param      dt is the time since the last update [s].
+        @param      ang_vel is the ball velocity [mm/s].
+        @param      ref is the ball position reference [mm].
+        @param      contact is True if the ball is on the platform.
+        @return     The platform angle reference [deg].
+    '''
+    if contact == False:
+        self.int_error_o = 0
+
+    error = ref - eul_ang
+    int_error = self.int_error_o + dt*error
+    self.int_error_o = int_error
+    Duty = self.Kp_o*error + self.KI_o*int_error - ang_vel*self.Kd_o
+
+    if Duty > 10:
+        return 10
+    elif Duty < -10:
+        return -10
+    return Duty
+
+
+@micropython.native
+def cascade_update(self, pos, vel, eul_ang, ang_vel, dt, mode):
+    '''!@brief      ClosedLoop.Cascade.update() compiled to machine code.
+        @param      pos is an array of the ball x and y positions [mm].
+        @param      vel is an array of the ball x and y velocities [mm/s].
+        @param      eul_ang is an array of the platform angles about x and y
+                    [deg].
+        @param      ang_vel is an array of the platform angular velocities
+                    about x and y [deg/s].
+        @param      dt is the time since the last update [s].
+        @param      mode is RUN_OUTER, HOLD_OUTER or LEVEL.
+        @return     The duty array, holding the duty cycle of motor 1 and
+                    motor 2 [%].
+    '''
+    theta_ref = self.theta_ref
+    if mode == _RUN_OUTER:
+        Kp = self.Kp_o
+        KI = self.KI_o
+        Kd = self.Kd_o
+        int_error = self.int_error_o
+
+        error = self.pos_ref[0] - pos[0]
+        int_error[0] += dt*error
+        ref = Kp*error + KI*int_error[0] - Kd*vel[0]
+        if ref > 10:
+            ref = 10
+        elif ref < -10:
+            ref = -10
+        theta_ref[0] = ref
+
+        error = self.pos_ref[1] - pos[1]
+        int_error[1] += dt*error
+        ref = -(Kp*error + KI*int_error[1] - Kd*vel[1])
+        if ref > 10:
+            ref = 10
+        elif ref < -10:
+            ref = -10
+        theta_ref[1] = ref
+
+    if mode == _LEVEL:
+        ref_1 = 0
+        ref_2 = 0
+    else:
+        ref_1 = theta_ref[0]
+        ref_2 = theta_ref[1]
+
+    Kp = self.Kp_i
+    KI = self.KI_i
+    Kd = self.Kd_i
+    int_error = self.int_error
+    duty = self.duty
+
+    error = ref_1 - eul_ang[1]
+    int_error[0] += dt*error
+    Duty = Kp*error + KI*int_error[0] - Kd*ang_vel[1]
+    if Duty > 40:
+        Duty = 40
+    elif Duty < -40:
+        Duty = -40
+    duty[0] = Duty
+
+    error = ref_2 - eul_ang[0]
+    int_error[1] += dt*error
+    Duty = Kp*error + KI*int_error[1] - Kd*ang_vel[0]
+    if Duty > 40:
+        Duty = 40
+    elif Duty < -40:
+        Duty = -40
+    duty[1] = Duty
+
+    return duty
+
+
+if __name__ == '__main__':
+    import array, random
+    import BNO055, touchpanel, panelmap, ClosedLoop
+
+    if touchpanel.fastpath is None:
+        print('The drivers are not using the copies in this file.')
+    rng = random.Random(7)
+
+    raw = bytearray(rng.getrandbits(8) for _ in range(12))
+    plain = array.array('h', 6*[0])
+    fast = array.array('h', 6*[0])
+    BNO055.merge_int16_py(raw, plain)
+    BNO055.merge_int16(raw, fast)
+    assert plain == fast, 'merge_int16'
+
+    # The touch panel routines are fed recorded scans with their flags and
+    # times, and both panels are read at the same virtual time.
+    scans = []
+    for idx in range(200):
+        contact = idx % 50 < 40
+        scans.append((rng.randint(200, 3900), rng.randint(200, 3900), contact,
+                      idx % 3 != 1, idx % 3 != 2, 10_000*idx + rng.randint(0, 2_000)))
+    virtual = clock.VirtualClock()
+    clock.set_source(virtual)
+    try:
+        panels = (touchpanel.TouchPanel(), touchpanel.TouchPanel())
+        for xpos, ypos, contact, new_x, new_y, stamp in scans:
+            results = []
+            for TP, Filter in zip(panels, (touchpanel.TouchPanel.Filter_py,
+                                           touchpanel.TouchPanel.Filter)):
+                TP.new_x = new_x
+                TP.new_y = new_y
+                results.append((Filter(TP, (xpos, ypos, contact), stamp),
+                                TP.vx_hat, TP.vy_hat))
+            assert results[0] == results[1], 'touchpanel_filter'
+
+        taps = [(X, Y) for X in (300, 2048, 3800) for Y in (300, 2048, 3800)]
+        mm = [(x + 0.001*x*y, y + 0.002*x*x) for x in (-80, 0, 80) for y in (-40, 0, 40)]
+        maps = (panelmap.AffineMap(panelmap.fit(taps, mm, panelmap.AFFINE)),
+                panelmap.PanelMap(panelmap.fit(taps, mm, panelmap.QUADRATIC)))
+        for Map in maps:
+            panels = (touchpanel.TouchPanel(), touchpanel.TouchPanel())
+            for TP in panels:
+                TP.scans = iter(scans)
+                TP.Scan = lambda TP=TP: next(TP.scans)[:3] + (0,)
+            for _ in scans:
+                results = [Read_Panel(TP, Map) for TP, Read_Panel in
+                           zip(panels, (touchpanel.TouchPanel.Read_Panel_py,
+                                        touchpanel.TouchPanel.Read_Panel))]
+                assert results[0] == results[1], 'touchpanel_read_panel'
+                virtual.advance(10_000)
+    finally:
+        clock.set_source(clock.HardwareClock())
+
+    for Map in maps:
+        cls = type(Map)
+        for _ in range(200):
+            X = rng.uniform(-100, 4200)
+            Y = rng.uniform(-100, 4200)
+            VX = rng.uniform(-3000, 3000)
+            VY = rng.uniform(-3000, 3000)
+            cls.convert_py(Map, X, Y, VX, VY)
+            plain = (Map.x, Map.y, Map.vx, Map.vy)
+            cls.convert(Map, X, Y, VX, VY)
+            assert plain == (Map.x, Map.y, Map.vx, Map.vy), cls.__name__ + '.convert'
+
+    # The controllers are run side by side on the same inputs.
+    loops = (ClosedLoop.ClosedLoop(), ClosedLoop.ClosedLoop())
+    cascades = (ClosedLoop.Cascade(), ClosedLoop.Cascade())
+    for Control in loops + cascades:
+        Control.set_gain_outer(0.16, 0.01, 0.02)
+        Control.set_gain_inner(11, 0.5, 0.2)
+    for idx in range(200):
+        angle = rng.uniform(-5, 5)
+        rate = rng.uniform(-50, 50)
+        ref = rng.uniform(-10, 10)
+        pos = rng.uniform(-90, 90)
+        vel = rng.uniform(-300, 300)
+        contact = idx % 40 < 30
+        results = [(update_inner(CL, angle, 0.01, rate, ref),
+                    update_outer(CL, pos, 0.01, vel, 0, contact),
+                    CL.int_error, CL.int_error_o)
+                   for CL, update_inner, update_outer in
+                   zip(loops, (ClosedLoop.ClosedLoop.update_inner_py,
+                               ClosedLoop.ClosedLoop.update_inner),
+                       (ClosedLoop.ClosedLoop.update_outer_py,
+                        ClosedLoop.ClosedLoop.update_outer))]
+        assert results[0] == results[1], 'closedloop_update_inner/outer'
+
+        pos = array.array('f', [rng.uniform(-90, 90), rng.uniform(-50, 50)])
+        vel = array.array('f', [rng.uniform(-300, 300), rng.uniform(-300, 300)])
+        eul_ang = array.array('f', [rng.uniform(-5, 5), rng.uniform(-5, 5)])
+        ang_vel = array.array('f', [rng.uniform(-50, 50), rng.uniform(-50, 50)])
+        mode = idx % 3
+        results = [(tuple(update(Control, pos, vel, eul_ang, ang_vel, 0.01, mode)),
+                    tuple(Control.int_error), tuple(Control.int_error_o),
+                    tuple(Control.theta_ref))
+                   for Control, update in zip(cascades, (ClosedLoop.Cascade.update_py,
+                                                         ClosedLoop.Cascade.update))]
+        assert results[0] == results[1], 'cascade_update'
+    print('Every copy gives the same results as its plain version.')
@@ -0,0 +1,430 @@
+'''!
+    @file       fixedpoint.py
+
+    @brief      Integer versions of the cascaded PID controller and the touch
+                panel Kalman filter.
+
+    @details    On MicroPython every float that comes out of an arithmetic
+                operation is a new object on the heap, so the float versions
+                in ClosedLoop.py and touchpanel.py allocate several times per
+                call. The classes in this file do the same arithmetic on
+                fixed-point integers instead. A signal x is stored as the
+                integer round(x*2**FRAC) and a gain k as round(k*2**GAIN_FRAC).
+
+                Integers are only free of allocation while they fit in a
+                MicroPython small int, which is 31 bits on the STM32. Two
+                Q16.16 numbers multiply out to 64 bits, so every product here
+                is arranged to stay under 2**30 instead: signals use 8
+                fractional bits and gains 12, and integrated errors are shifted
+                down before they are multiplied by a gain. With the default
+                widths the inputs can be up to about 2000 mm, 2000 mm/s, 500
+                deg/s and 4095 ADC counts before a product grows past a small
+                int. It still gives the right answer past that, just with an
+                allocation. The widths can be changed at the top of the file.
+
+                taskController and taskPanel use these classes when they are
+                made with fixed=True. The shares stay in floats, so the
+                readings are turned into fixed point as they come in and the
+                results back into floats as they go out, and those
+                conversions still allocate. Only CascadeQ.update_us() and
+                FilterQ.Filter() themselves are free of allocation.
+
+                Running this file checks both classes against the float
+                versions on random data, and on the board also checks that
+                those two methods allocate nothing:
+
+                    python -m hal fixedpoint.py
+
+
+    @author     Jake Lesher
+    @author     Daniel Xu
+    @date       10/16/2026
+'''
+
+import array, micropython, clock
+import ClosedLoop, kalman
+
+## The number of fractional bits of every signal, such as positions, angles,
+#  velocities and duty cycles.
+FRAC = micropython.const(8)
+
+## The number of fractional bits of every gain and filter coefficient.
+GAIN_FRAC = micropython.const(12)
+
+## The number of fractional bits of the integrated errors and of time steps
+#  in seconds.
+INT_FRAC = micropython.const(16)
+
+## The number of fractional bits of the velocity gain of the touch panel
+#  filter, which is too large a number for GAIN_FRAC.
+VEL_FRAC = micropython.const(8)
+
+# The saturation limits of the cascade as fixed-point signals.
+_MAX_REF = micropython.const(10 << FRAC)
+_MAX_DUTY = micropython.const(40 << FRAC)
+
+# 2**INT_FRAC/1_000_000 with 16 fractional bits, to turn a time step in
+# microseconds into seconds with INT_FRAC fractional bits.
+_US_TO_S = micropython.const(4295)
+
+
+def to_fixed(value, frac=FRAC):
+    '''!@brief      Converts a number to fixed point.
+        @param      value is the number to convert.
+        @param      frac is the number of fractional bits.
+        @return     The fixed-point integer nearest to the value.
+    '''
+    return int(round(value*(1 << frac)))
+
+
+def to_float(value, frac=FRAC):
+    '''!@brief      Converts a fixed-point integer back to a float.
+        @param      value is the fixed-point integer.
+        @param      frac is the number of fractional bits.
+        @return     The number the integer stands for.
+    '''
+    return value/(1 << frac)
+
+
+class CascadeQ:
+    '''!@brief      A fixed-point version of ClosedLoop.Cascade.
+        @details    The methods take the same arguments as Cascade, in the
+                    same units, but the arrays hold fixed-point signals with
+                    FRAC fractional bits. The time step is given in seconds,
+                    as to Cascade, and turned into fixed point once per call.
+                    The limits are the same: 10 degrees from the outer loop
+                    and 40% duty from the inner loop.
+
+    '''
+    __slots__ = ('Kp_i', 'KI_i', 'Kd_i', 'Kp_o', 'KI_o', 'Kd_o',
+                 'pos_ref', 'int_error', 'int_error_o', 'theta_ref', 'duty')
+
+    def __init__(self):
+        '''!@brief      Creates the controller with zero gains and state.
+        '''
+        ## The ball position reference for each motor [mm].
+        self.pos_ref = array.array('l', [0, 0])
+        ## The integrated platform angle error for each motor, with INT_FRAC
+        #  fractional bits [deg*s].
+        self.int_error = array.array('l', [0, 0])
+        ## The integrated ball position error for each motor, with INT_FRAC
+        #  fractional bits [mm*s].
+        self.int_error_o = array.array('l', [0, 0])
+        ## The platform angle reference from the outer loop for each motor [deg].
+        self.theta_ref = array.array('l', [0, 0])
+        ## The duty cycle of each motor from the last update [%].
+        self.duty = array.array('l', [0, 0])
+        self.set_gain_inner(0, 0, 0)
+        self.set_gain_outer(0, 0, 0)
+
+    def set_gain_inner(self, Kp, KI, Kd):
+        '''!@brief      Sets the gains of the platform angle loops.
+            @param      Kp is the proportional gain [%/deg].
+            @param      KI is the integral gain [%/(deg*s)].
+            @param      Kd is the derivative gain [%/(deg/s)].
+        '''
+        self.Kp_i = to_fixed(Kp, GAIN_FRAC)
+        self.KI_i = to_fixed(KI, GAIN_FRAC)
+        self.Kd_i = to_fixed(Kd, GAIN_FRAC)
+
+    def set_gain_outer(self, Kp, KI, Kd):
+        '''!@brief      Sets the gains of the ball position loops.
+            @param      Kp is the proportional gain [deg/mm].
+            @param      KI is the integral gain [deg/(mm*s)].
+            @param      Kd is the derivative gain [deg/(mm/s)].
+        '''
+        self.Kp_o = to_fixed(Kp, GAIN_FRAC)
+        self.KI_o = to_fixed(KI, GAIN_FRAC)
+        self.Kd_o = to_fixed(Kd, GAIN_FRAC)
+
+    def update(self, pos, vel, eul_ang, ang_vel, dt, mode):
+        '''!@brief      Updates both axes of the cascade.
+            @param      pos is an array of the ball x and y positions [mm].
+            @param      vel is an array of the ball x and y velocities [mm/s].
+            @param      eul_ang is an array of the platform angles about x and
+                        y [deg].
+            @param      ang_vel is an array of the platform angular
+                        velocities about x and y [deg/s].
+            @param      dt is the time since the last update [s].
+            @param      mode is ClosedLoop.RUN_OUTER, HOLD_OUTER or LEVEL.
+            @return     The duty array, holding the duty cycle of motor 1 and
+                        motor 2 [%].
+        '''
+        return self.update_us(pos, vel, eul_ang, ang_vel, int(dt*1_000_000), mode)
+
+    def update_us(self, pos, vel, eul_ang, ang_vel, dt_us, mode):
+        '''!@brief      Updates both axes of the cascade with the time step in
+                        microseconds.
+            @details    This is update() with the time step as the integer
+                        ticks_diff() gives, so no float is made on the way
+                        in. taskController uses it.
+            @param      pos is an array of the ball x and y positions [mm].
+            @param      vel is an array of the ball x and y velocities [mm/s].
+            @param      eul_ang is an array of the platform angles about x and
+                        y [deg].
+            @param      ang_vel is an array of the platform angular
+                        velocities about x and y [deg/s].
+            @param      dt_us is the time since the last update [us].
+            @param      mode is ClosedLoop.RUN_OUTER, HOLD_OUTER or LEVEL.
+            @return     The duty array, holding the duty cycle of motor 1 and
+                        motor 2 [%].
+        '''
+        # The time step in seconds with INT_FRAC fractional bits.
+        dt = (dt_us*_US_TO_S) >> 16
+        theta_ref = self.theta_ref
+        if mode == ClosedLoop.RUN_OUTER:
+            Kp = self.Kp_o
+            KI = self.KI_o
+            Kd = self.Kd_o
+            int_error = self.int_error_o
+
+            error = self.pos_ref[0] - pos[0]
+            int_error[0] += (error*dt) >> FRAC
+            ref = (Kp*error + KI*(int_error[0] >> (INT_FRAC - FRAC))
+                   - Kd*vel[0]) >> GAIN_FRAC
+            if ref > _MAX_REF:
+                ref = _MAX_REF
+            elif ref < -_MAX_REF:
+                ref = -_MAX_REF
+            theta_ref[0] = ref
+
+            error = self.pos_ref[1] - pos[1]
+            int_error[1] += (error*dt) >> FRAC
+            ref = -((Kp*error + KI*(int_error[1] >> (INT_FRAC - FRAC))
+                     - Kd*vel[1]) >> GAIN_FRAC)
+            if ref > _MAX_REF:
+                ref = _MAX_REF
+            elif ref < -_MAX_REF:
+                ref = -_MAX_REF
+            theta_ref[1] = ref
+
+        if mode == ClosedLoop.LEVEL:
+            ref_1 = 0
+            ref_2 = 0
+        else:
+            ref_1 = theta_ref[0]
+            ref_2 = theta_ref[1]
+
+        Kp = self.Kp_i
+        KI = self.KI_i
+        Kd = self.Kd_i
+        int_error = self.int_error
+        duty = self.duty
+
+        error = ref_1 - eul_ang[1]
+        int_error[0] += (error*dt) >> FRAC
+        Duty = (Kp*error + KI*(int_error[0] >> (INT_FRAC - FRAC))
+                - Kd*ang_vel[1]) >> GAIN_FRAC
+        if Duty > _MAX_DUTY:
+            Duty = _MAX_DUTY
+        elif Duty < -_MAX_DUTY:
+            Duty = -_MAX_DUTY
+        duty[0] = Duty
+
+        error = ref_2 - eul_ang[0]
+        int_error[1] += (error*dt) >> FRAC
+        Duty = (Kp*error + KI*(int_error[1] >> (INT_FRAC - FRAC))
+                - Kd*ang_vel[0]) >> GAIN_FRAC
+        if Duty > _MAX_DUTY:
+            Duty = _MAX_DUTY
+        elif Duty < -_MAX_DUTY:
+            Duty = -_MAX_DUTY
+        duty[1] = Duty
+
+        return duty
+
+
+class FilterQ:
+    '''!@brief      A fixed-point version of the Kalman filter in
+                    TouchPanel.Filter().
+        @details    Filter() takes the same arguments as TouchPanel.Filter()
+                    and follows the same steps, including the new_x and
+                    new_y flags that say which axes the last scan read. It
+                    takes the raw ADC counts, which are already integers, and
+                    keeps its position and velocity estimates with FRAC
+                    fractional bits. The time step between the ticks_us()
+                    times is turned into seconds with INT_FRAC fractional
+                    bits. The gains are picked with kalman.gains() as in
+                    TouchPanel.set_period(), the position gain with
+                    GAIN_FRAC fractional bits and the velocity gain with
+                    VEL_FRAC. The result is returned in an array that is
+                    made once, rather than in a new tuple.
+
+    '''
+    __slots__ = ('new_x', 'new_y', 'x_hat', 'y_hat', 'vx_hat', 'vy_hat',
+                 'x_seen', 'y_seen', 'filter_time', 'out', 'gain_pos', 'gain_vel')
+
+    def __init__(self, axis_period=kalman.PERIOD):
+        '''!@brief      Creates the filter with no estimate yet.
+            @param      axis_period is the time between readings of each
+                        axis [us], as in TouchPanel.axis_period.
+        '''
+        gains = kalman.gains(axis_period)
+        self.gain_pos = to_fixed(gains[0], GAIN_FRAC)
+        self.gain_vel = to_fixed(gains[1], VEL_FRAC)
+        ## Whether the last scan read each axis, as in TouchPanel.
+        self.new_x = True
+        self.new_y = True
+        self.x_hat = 0
+        self.y_hat = 0
+        self.vx_hat = 0
+        self.vy_hat = 0
+        self.x_seen = False
+        self.y_seen = False
+        self.filter_time = clock.ticks_us()
+        ## The filtered x and y and the contact flag from the last call.
+        self.out = array.array('l', [0, 0, 0])
+
+    def Filter(self, ADC_Data, stamp=None):
+        '''!@brief      Filters one set of touch panel readings.
+            @param      ADC_Data is a tuple containing xpos, ypos (ADC units),
+                        and contact (boolean).
+            @param      stamp is the ticks_us() time of the readings, or None
+                        to use the current time.
+            @return     The out array, holding the filtered xpos and ypos as
+                        fixed-point ADC units, and contact as 1 or 0. The
+                        velocities are left in
+                        vx_hat and vy_hat as fixed-point ADC units/s.
+        '''
+        now = clock.ticks_us() if stamp is None else stamp
+        dt = (clock.ticks_diff(now, self.filter_time)*_US_TO_S) >> 16
+        self.filter_time = now
+        contact = ADC_Data[2]
+        
+        # The velocity is shifted down to whole ADC units/s before it is
+        # multiplied by the time step, and the residual by four bits before
+        # it is multiplied by a gain, which keeps the products inside a small
+        # int across the full ADC range.
+        if contact and self.new_x:
+            if self.x_seen:
+                x_pred = self.x_hat + (((self.vx_hat >> FRAC)*dt) >> (INT_FRAC - FRAC))
+                resid = ((ADC_Data[0] << FRAC) - x_pred) >> 4
+                self.x_hat = x_pred + ((self.gain_pos*resid) >> (GAIN_FRAC - 4))
+                self.vx_hat += (self.gain_vel*resid) >> (VEL_FRAC - 4)
+            else:
+                self.x_hat = ADC_Data[0] << FRAC
+                self.vx_hat = 0
+                self.x_seen = True
+        elif contact:
+            self.x_hat += ((self.vx_hat >> FRAC)*dt) >> (INT_FRAC - FRAC)
+        else:
+            self.x_seen = False
+        
+        if contact and self.new_y:
+            if self.y_seen:
+                y_pred = self.y_hat + (((self.vy_hat >> FRAC)*dt) >> (INT_FRAC - FRAC))
+                resid = ((ADC_Data[1] << FRAC) - y_pred) >> 4
+                self.y_hat = y_pred + ((self.gain_pos*resid) >> (GAIN_FRAC - 4))
+                self.vy_hat += (self.gain_vel*resid) >> (VEL_FRAC - 4)
+            else:
+                self.y_hat = ADC_Data[1] << FRAC
+                self.vy_hat = 0
+                self.y_seen = True
+        elif contact:
+            self.y_hat += ((self.vy_hat >> FRAC)*dt) >> (INT_FRAC - FRAC)
+        else:
+            self.y_seen = False
+
+        out = self.out
+        out[0] = self.x_hat
+        out[1] = self.y_hat
+        out[2] = contact
+        return out
+
+
+if __name__ == '__main__':
+    # Check both classes against the float versions on random data. The
+    # tolerances allow for the rounding of the gains to GAIN_FRAC bits and of
+    # the signals to FRAC bits.
+    import random, touchpanel
+    rng = random.Random(12)
+
+    cascade = ClosedLoop.Cascade()
+    cascade_q = CascadeQ()
+    for c in (cascade, cascade_q):
+        c.set_gain_outer(0.16, 0.01, 0.02)
+        c.set_gain_inner(11, 0, 0.2)
+    pos = array.array('f', [0, 0])
+    vel = array.array('f', [0, 0])
+    eul_ang = array.array('f', [0, 0])
+    ang_vel = array.array('f', [0, 0])
+    pos_q = array.array('l', [0, 0])
+    vel_q = array.array('l', [0, 0])
+    eul_ang_q = array.array('l', [0, 0])
+    ang_vel_q = array.array('l', [0, 0])
+    modes = (ClosedLoop.RUN_OUTER, ClosedLoop.RUN_OUTER, ClosedLoop.HOLD_OUTER, ClosedLoop.LEVEL)
+    worst = 0
+    for step in range(5_000):
+        for idx in range(2):
+            pos[idx] = rng.uniform(-80, 80)
+            vel[idx] = rng.uniform(-300, 300)
+            eul_ang[idx] = rng.uniform(-8, 8)
+            ang_vel[idx] = rng.uniform(-100, 100)
+            pos_q[idx] = to_fixed(pos[idx])
+            vel_q[idx] = to_fixed(vel[idx])
+            eul_ang_q[idx] = to_fixed(eul_ang[idx])
+            ang_vel_q[idx] = to_fixed(ang_vel[idx])
+        dt_us = rng.randint(9_000, 11_000)
+        mode = modes[rng.randint(0, 3)]
+        duty = cascade.update(pos, vel, eul_ang, ang_vel, dt_us/1_000_000, mode)
+        duty_q = cascade_q.update(pos_q, vel_q, eul_ang_q, ang_vel_q, dt_us/1_000_000, mode)
+        for idx in range(2):
+            worst = max(worst, abs(duty[idx] - to_float(duty_q[idx])))
+    print(f'Cascade: largest duty difference {worst:.3f} %')
+    assert worst < 0.5, 'fixed-point cascade does not match the float version'
+
+    vclock = clock.VirtualClock(1_000)
+    clock.set_source(vclock)
+    TP = touchpanel.TouchPanel()
+    filter_q = FilterQ()
+    x = 2000
+    y = 2000
+    worst = 0
+    worst_vel = 0
+    # The readings come with jittered stamps, every tenth one without
+    # contact, and every third one reading only one axis, as an alternating
+    # scan does.
+    stamp = 1_000
+    for step in range(5_000):
+        x = min(max(x + rng.randint(-20, 20), 0), 4095)
+        y = min(max(y + rng.randint(-20, 20), 0), 4095)
+        reading = (x + rng.randint(-8, 8), y + rng.randint(-8, 8), step % 10 != 9)
+        stamp += rng.randint(9_000, 11_000)
+        for f in (TP, filter_q):
+            f.new_x = step % 3 != 1
+            f.new_y = step % 3 != 2
+        filtered = TP.Filter(reading, stamp)
+        filtered_q = filter_q.Filter(reading, stamp)
+        for idx in range(2):
+            worst = max(worst, abs(filtered[idx] - to_float(filtered_q[idx])))
+        worst_vel = max(worst_vel, abs(TP.vx_hat - to_float(filter_q.vx_hat)),
+                        abs(TP.vy_hat - to_float(filter_q.vy_hat)))
+    clock.set_source(clock.HardwareClock())
+    print(f'Filter: largest position difference {worst:.3f} ADC counts')
+    print(f'Filter: largest velocity difference {worst_vel:.3f} ADC counts/s')
+    assert worst < 1, 'fixed-point filter does not match the float version'
+    assert worst_vel < 10, 'fixed-point filter does not match the float version'
+
+    # The heap is only measured on the board. On the host every int is an
+    # object, so there is nothing to compare with.
+    import sys
+    if sys.platform == 'pyboard':
+        import gc
+        stamp = clock.ticks_us()
+        reading = (2000, 1800, True)
+        # The first call after the virtual clock takes a long time step,
+        # which is left out.
+        filter_q.Filter(reading, stamp)
+        gc.collect()
+        gc.disable()
+        before = gc.mem_alloc()
+        for step in range(100):
+            cascade_q.update_us(pos_q, vel_q, eul_ang_q, ang_vel_q, 10_000, ClosedLoop.RUN_OUTER)
+            stamp = clock.ticks_add(stamp, 10_000)
+            filter_q.Filter(reading, stamp)
+        used = gc.mem_alloc() - before
+        gc.enable()
+        print(f'update_us() and Filter(): {used} bytes allocated in 100 calls')
+        assert used == 0, 'the fixed-point path allocates'
+    else:
+        print('Allocations can only be measured on the board.')
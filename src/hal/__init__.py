@@ -0,0 +1,48 @@
+'''!
+    @file       __init__.py
+
+    @brief      A hardware abstraction layer for running the project on CPython.
+
+    @details    The tasks and drivers import pyb, micropython, utime, ulab and
+                the ticks functions from time, none of which exist on a
+                desktop Python. install() puts host stand-ins for all of them
+                in place, so that main.py and every task run unmodified. The
+                stand-ins talk to the emulated BNO055 and touch panel in
+                hal.board instead of hardware. Run the project on the host
+                from the src directory with:
+
+                    python -m hal main.py
+
+
+    @author     Jake Lesher
+    @author     Daniel Xu
+    @date       10/16/2026
+'''
+
+import sys, time
+
+## The functions added to the time module, as MicroPython provides them.
+TIME_FUNCTIONS = ('ticks_us', 'ticks_ms', 'ticks_cpu', 'ticks_add',
+                  'ticks_diff', 'sleep_ms', 'sleep_us')
+
+
+def install():
+    '''!@brief      Installs the host stand-ins for the MicroPython modules.
+        @details    This must be called before any of the project modules are
+                    imported, because they import the ticks functions by name.
+                    The ulab stand-in needs numpy, and is left out if numpy is
+                    not installed.
+    '''
+    from hal import clock, micropython, pyb, utime
+    sys.modules['micropython'] = micropython
+    sys.modules['pyb'] = pyb
+    sys.modules['utime'] = utime
+    micropython.install_pointers()
+    for name in TIME_FUNCTIONS:
+        setattr(time, name, getattr(clock, name))
+    try:
+        from hal import ulab
+    except ImportError:
+        return
+    sys.modules['ulab'] = ulab
+    sys.modules['ulab.numpy'] = ulab.numpy
@@ -0,0 +1,23 @@
+'''!
+    @file       __main__.py
+
+    @brief      Runs a project script on the host with the stand-ins installed.
+
+    @details    Usage: python -m hal [script] [args...]. The script defaults
+                to main.py, and its directory is put on the module search
+                path so that it can import the tasks and drivers next to it.
+
+
+    @author     Jake Lesher
+    @author     Daniel Xu
+    @date       10/16/2026
+'''
+
+import os, runpy, sys
+import hal
+
+hal.install()
+script = sys.argv[1] if len(sys.argv) > 1 else 'main.py'
+sys.argv = sys.argv[1:] or [script]
+sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+runpy.run_path(script, run_name='__main__')
@@ -0,0 +1,189 @@
+'''!
+    @file       bno055.py
+
+    @brief      A register-level emulator of the BNO055 IMU.
+
+    @details    The emulator holds the BNO055 register map and answers the
+                I2C register reads and writes made by BNO055.py through the
+                host I2C class. The orientation and angular velocity of the
+                platform are set with set_euler() and set_gyro(), and are
+                encoded into the data registers in the same units and byte
+                order as the real sensor. As on the real sensor, the data
+                registers only update in a mode that produces them, and the
+                calibration registers can only be written in config mode.
+                The data registers also only change at the output rate of the
+                sensor, timed by its own oscillator, so two reads inside one
+                output period return the same sample.
+
+
+    @author     Jake Lesher
+    @author     Daniel Xu
+    @date       10/16/2026
+'''
+
+import struct
+from hal import clock
+
+## The I2C address of the BNO055 with its ADR pin low.
+BNO055_ADDR = 0x28
+
+CHIP_ID = 0x00
+PAGE_ID = 0x07
+GYR_DATA = 0x14
+EUL_DATA = 0x1A
+CALIB_STAT = 0x35
+SYS_STATUS = 0x39
+OPR_MODE = 0x3D
+CALIB_DATA = 0x55
+CALIB_LEN = 22
+
+CONFIG_MODE = 0x00
+GYRONLY_MODE = 0x03
+IMU_MODE = 0x08
+NDOF_MODE = 0x0C
+
+## The operating modes in which the gyroscope data registers update.
+GYRO_MODES = (0x03, 0x05, 0x06, 0x07, 0x08, 0x0B, 0x0C)
+
+## The operating modes in which the Euler angle registers update.
+FUSION_MODES = (0x08, 0x09, 0x0A, 0x0B, 0x0C)
+
+## The number of register counts per degree and per degree per second.
+LSB_PER_DEG = 16
+
+## The time between the samples of the fusion modes, which is 100 Hz [us].
+FUSION_PERIOD = 10_000
+
+## The time between gyroscope samples outside the fusion modes, which is its
+#  fastest output rate of 523 Hz [us].
+GYRO_PERIOD = 1_912
+
+
+class BNO055Emulator:
+    '''!@brief      An emulated BNO055 on the I2C bus.
+    '''
+    def __init__(self, calib_stat=0x3F, rate_error=0.0, phase=0):
+        '''!@brief      Creates an emulated IMU in config mode.
+            @param      calib_stat is the value of the CALIB_STAT register.
+                        The default reports a calibrated gyroscope,
+                        accelerometer and magnetometer.
+            @param      rate_error is how much faster the oscillator of the
+                        sensor runs than the clock of the board, as a fraction.
+            @param      phase is the time from the first read to the first
+                        new sample [us].
+        '''
+        self.registers = bytearray(0x80)
+        self.registers[CHIP_ID:CHIP_ID + 4] = b'\xa0\xfb\x32\x0f'
+        self.registers[CALIB_STAT] = calib_stat
+        self.registers[SYS_STATUS] = 0x01
+        self.heading = 0
+        self.roll = 0
+        self.pitch = 0
+        self.gyro = (0, 0, 0)
+        self.reads = 0
+        self.writes = 0
+        self.rate_error = rate_error
+        self.phase = phase
+        # The time since the first read [us], the number of the last sample
+        # put into the registers, and the ticks_us() time it was made.
+        self.time_us = 0
+        self._last_ticks = None
+        self._sample = None
+        self.sample_stamp = None
+
+    @property
+    def mode(self):
+        '''!@brief      The current operating mode.
+        '''
+        return self.registers[OPR_MODE] & 0x0F
+
+    def set_euler(self, heading, roll, pitch):
+        '''!@brief      Sets the orientation the sensor will report.
+            @param      heading is the heading angle [deg].
+            @param      roll is the roll angle [deg].
+            @param      pitch is the pitch angle [deg].
+        '''
+        self.heading = heading
+        self.roll = roll
+        self.pitch = pitch
+
+    def set_gyro(self, x, y, z):
+        '''!@brief      Sets the angular velocity the sensor will report.
+            @param      x is the angular velocity about x [deg/s].
+            @param      y is the angular velocity about y [deg/s].
+            @param      z is the angular velocity about z [deg/s].
+        '''
+        self.gyro = (x, y, z)
+
+    def _pack(self, reg, a, b, c):
+        '''!@brief      Writes three signed 16-bit values into the registers.
+            @param      reg is the first register to write.
+            @param      a, b and c are the values in degrees or deg/s.
+        '''
+        vals = []
+        for v in (a, b, c):
+            v = int(round(v*LSB_PER_DEG))
+            vals.append(min(max(v, -32768), 32767))
+        struct.pack_into('<hhh', self.registers, reg, *vals)
+
+    def _update(self):
+        '''!@brief      Refreshes the data registers for the current mode.
+            @details    The registers only take new values once a new sample
+                        is due. The time comes from the firmware clock module
+                        when it is loaded, the same as the I2C transfer times.
+        '''
+        try:
+            import clock as source
+        except ImportError:
+            source = clock
+        now = source.ticks_us()
+        if self._last_ticks is not None:
+            self.time_us += source.ticks_diff(now, self._last_ticks)
+        self._last_ticks = now
+
+        mode = self.mode
+        if mode in FUSION_MODES:
+            period = FUSION_PERIOD/(1 + self.rate_error)
+        elif mode in GYRO_MODES:
+            period = GYRO_PERIOD/(1 + self.rate_error)
+        else:
+            return
+        sample = (self.time_us - self.phase)//period
+        if sample == self._sample:
+            return
+        self._sample = sample
+        self.sample_stamp = source.ticks_add(
+            now, -int(self.time_us - self.phase - sample*period))
+        if mode in GYRO_MODES:
+            self._pack(GYR_DATA, *self.gyro)
+        if mode in FUSION_MODES:
+            self._pack(EUL_DATA, self.heading % 360, self.roll, self.pitch)
+
+    def read(self, reg, nbytes):
+        '''!@brief      Reads a block of registers.
+            @param      reg is the first register to read.
+            @param      nbytes is the number of registers to read.
+            @return     A bytes object with the register values.
+        '''
+        self.reads += 1
+        self._update()
+        return bytes(self.registers[reg:reg + nbytes])
+
+    def write(self, reg, data):
+        '''!@brief      Writes a block of registers.
+            @details    Writes to the calibration registers are ignored unless
+                        the sensor is in config mode.
+            @param      reg is the first register to write.
+            @param      data is a bytes object with the new values.
+        '''
+        self.writes += 1
+        for offset, value in enumerate(data):
+            addr = reg + offset
+            if addr >= len(self.registers):
+                break
+            if CALIB_DATA <= addr < CALIB_DATA + CALIB_LEN and self.mode != CONFIG_MODE:
+                continue
+            self.registers[addr] = value
+            if addr == OPR_MODE:
+                # A new mode starts sampling afresh.
+                self._sample = None
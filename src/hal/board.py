@@ -0,0 +1,89 @@
+'''!
+    @file       board.py
+
+    @brief      The emulated peripherals wired to the host stand-in pyb module.
+
+    @details    This module plays the part of the circuit board. It keeps
+                track of which emulated device is on each I2C address and which
+                analog pins belong to which device, and it holds the timer
+                channels that the motor PWM is written to. By default it is
+                wired like the ball balancer: a BNO055 on I2C bus 1 and the
+                resistive touch panel on pins A0, A1, A6 and A7.
+
+
+    @author     Jake Lesher
+    @author     Daniel Xu
+    @date       10/16/2026
+'''
+
+from hal import bno055, panel
+
+## The I2C devices on each bus, keyed on bus number and then on address.
+i2c_buses = {}
+
+## The emulated devices that produce the ADC readings, keyed on pin name.
+adc_sources = {}
+
+## The reading returned by an analog pin with nothing wired to it.
+ADC_FLOATING = 4095
+
+## The PWM timer channels that have been created, keyed on the timer number
+#  and channel number.
+timers = {}
+
+
+def attach_i2c(bus, addr, device):
+    '''!@brief      Puts an emulated device on an I2C bus.
+        @param      bus is the I2C bus number.
+        @param      addr is the 7-bit address of the device.
+        @param      device is an object with read(reg, n) and write(reg, data).
+    '''
+    i2c_buses.setdefault(bus, {})[addr] = device
+
+
+def i2c_device(bus, addr):
+    '''!@brief      Finds the device at an I2C address.
+        @param      bus is the I2C bus number.
+        @param      addr is the 7-bit address of the device.
+        @return     The emulated device, or None if there is none.
+    '''
+    return i2c_buses.get(bus, {}).get(addr)
+
+
+def i2c_scan(bus):
+    '''!@brief      Lists the devices on an I2C bus.
+        @param      bus is the I2C bus number.
+        @return     A sorted list of the device addresses.
+    '''
+    return sorted(i2c_buses.get(bus, {}))
+
+
+def attach_adc(pin_names, device):
+    '''!@brief      Wires an emulated device to some analog pins.
+        @param      pin_names is an iterable of pin names, such as ('A0',).
+        @param      device is an object with read_adc(pin, pins).
+    '''
+    for name in pin_names:
+        adc_sources[name] = device
+
+
+def read_adc(pin, pins):
+    '''!@brief      Produces the ADC reading for a pin.
+        @param      pin is the Pin object being read.
+        @param      pins is a dictionary of every Pin object by name.
+        @return     A 12-bit ADC reading.
+    '''
+    device = adc_sources.get(pin.name)
+    if device is None:
+        return ADC_FLOATING
+    return device.read_adc(pin, pins)
+
+
+## The emulated BNO055 IMU on the platform.
+imu = bno055.BNO055Emulator()
+
+## The emulated resistive touch panel on the platform.
+touch_panel = panel.ResistivePanel()
+
+attach_i2c(1, bno055.BNO055_ADDR, imu)
+attach_adc(touch_panel.pin_names(), touch_panel)
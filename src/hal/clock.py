@@ -0,0 +1,110 @@
+'''!
+    @file       clock.py
+
+    @brief      Host versions of the MicroPython ticks functions.
+
+    @details    MicroPython's ticks_ms() and ticks_us() count up and wrap
+                around after TICKS_PERIOD ticks, and must only be compared
+                with ticks_diff(). These functions behave the same way on
+                CPython, using time.perf_counter_ns() as the time base, so
+                wrap-around bugs show up off the board as well.
+
+
+    @author     Jake Lesher
+    @author     Daniel Xu
+    @date       10/16/2026
+'''
+
+import time
+
+## The number of ticks after which the ticks functions wrap around. This is
+#  the value used by the STM32 port of MicroPython.
+TICKS_PERIOD = 1 << 30
+
+_TICKS_MAX = TICKS_PERIOD - 1
+_TICKS_HALFPERIOD = TICKS_PERIOD >> 1
+
+## How long before a timer callback is due a sleep stops sleeping and spins
+#  instead [us].
+SPIN_US = 200
+
+## A function that ticks_us() calls with the time it returns, or None. hal.pyb
+#  sets it to run the timer callbacks that are due, in place of the timer
+#  interrupts of the board. It returns the time until the next callback is
+#  due [us], which the sleep functions use to wake up for it.
+interrupt = None
+
+
+def ticks_us():
+    '''!@brief      Returns the microsecond counter.
+        @details    If interrupt is set it is called first, so a timer
+                    callback that is due runs before the caller sees the time.
+        @return     The number of microseconds elapsed, modulo TICKS_PERIOD.
+    '''
+    now = (time.perf_counter_ns()//1_000) & _TICKS_MAX
+    if interrupt is not None:
+        interrupt(now)
+    return now
+
+
+def ticks_ms():
+    '''!@brief      Returns the millisecond counter.
+        @return     The number of milliseconds elapsed, modulo TICKS_PERIOD.
+    '''
+    return (time.perf_counter_ns()//1_000_000) & _TICKS_MAX
+
+
+def ticks_cpu():
+    '''!@brief      Returns the highest resolution counter available.
+        @return     The counter value, which is in microseconds on the host.
+    '''
+    return ticks_us()
+
+
+def ticks_add(ticks, delta):
+    '''!@brief      Offsets a ticks value by a number of ticks.
+        @param      ticks is a value from one of the ticks functions.
+        @param      delta is the offset to add, which may be negative.
+        @return     The wrapped sum of ticks and delta.
+    '''
+    return (ticks + delta) & _TICKS_MAX
+
+
+def ticks_diff(ticks1, ticks2):
+    '''!@brief      Finds the signed difference between two ticks values.
+        @param      ticks1 is the later ticks value.
+        @param      ticks2 is the earlier ticks value.
+        @return     ticks1 - ticks2, taking wrap-around into account.
+    '''
+    diff = (ticks1 - ticks2) & _TICKS_MAX
+    if diff >= _TICKS_HALFPERIOD:
+        diff -= TICKS_PERIOD
+    return diff
+
+
+def sleep_ms(ms):
+    '''!@brief      Sleeps for a number of milliseconds.
+        @param      ms is the time to sleep [ms].
+    '''
+    sleep_us(ms*1_000)
+
+
+def sleep_us(us):
+    '''!@brief      Sleeps for a number of microseconds.
+        @details    While a timer callback is set, the sleep is cut into
+                    pieces that end when each callback is due, so the
+                    callbacks run on time as interrupts would. The host
+                    oversleeps a little, so each piece ends SPIN_US early and
+                    the rest is spun out.
+        @param      us is the time to sleep [us].
+    '''
+    if interrupt is None:
+        time.sleep(us/1_000_000)
+        return
+    end = ticks_add(ticks_us(), us)
+    while True:
+        now = (time.perf_counter_ns()//1_000) & _TICKS_MAX
+        left = ticks_diff(end, now)
+        if left <= 0:
+            break
+        time.sleep(max(min(left, interrupt(now)) - SPIN_US, 0)/1_000_000)
@@ -0,0 +1,127 @@
+'''!
+    @file       micropython.py
+
+    @brief      Host stand-in for the micropython module.
+
+    @details    const() simply returns its argument. CPython has no native
+                or viper code emitters, so the native and viper decorators
+                return the function unchanged, and ptr8(), ptr16() and
+                ptr32(), the pointer types of viper code, are emulated with
+                memoryviews. This way fastpath.py imports on the host and the
+                drivers run its copies of their routines, as they do on the
+                board, and fastpath.py can check each copy against the plain
+                version it replaces.
+
+
+    @author     Jake Lesher
+    @author     Daniel Xu
+    @date       10/16/2026
+'''
+
+
+import builtins
+
+
+def const(value):
+    '''!@brief      Declares a constant.
+        @param      value is the value of the constant.
+        @return     The same value.
+    '''
+    return value
+
+
+def alloc_emergency_exception_buf(size):
+    '''!@brief      Reserves memory for exceptions raised in interrupts.
+        @param      size is the number of bytes to reserve.
+    '''
+    pass
+
+
+def schedule(func, arg):
+    '''!@brief      Runs a function that an interrupt handler deferred.
+        @details    There are no hard interrupts on the host, so the function
+                    is called straight away.
+        @param      func is the function to run.
+        @param      arg is the argument to pass to func.
+    '''
+    func(arg)
+
+
+def mem_info(verbose=False):
+    '''!@brief      Prints memory usage, which is not tracked on the host.
+        @param      verbose is ignored.
+    '''
+    print('mem_info is not available on the host')
+
+
+def native(fun):
+    '''!@brief      Stands in for the native code emitter.
+        @param      fun is the function to compile.
+        @return     The same function, which runs as plain Python.
+    '''
+    return fun
+
+
+def viper(fun):
+    '''!@brief      Stands in for the viper code emitter.
+        @details    The pointer types viper code uses are put in the builtins
+                    by install_pointers().
+        @param      fun is the function to compile.
+        @return     The same function, which runs as plain Python.
+    '''
+    return fun
+
+
+class _Pointer:
+    '''!@brief      A viper pointer into a buffer.
+        @details    Like a viper pointer, a store keeps only the low bits of
+                    the value that fit in the item, and a load gives the item
+                    as an unsigned integer.
+    '''
+    def __init__(self, buf, code, bits):
+        '''!@brief      Points at the start of a buffer.
+            @param      buf is any object with the buffer protocol.
+            @param      code is the unsigned array type code of the items.
+            @param      bits is the size of the items [bits].
+        '''
+        self.view = memoryview(buf).cast('B').cast(code)
+        self.mask = (1 << bits) - 1
+
+    def __getitem__(self, idx):
+        return self.view[idx]
+
+    def __setitem__(self, idx, value):
+        self.view[idx] = value & self.mask
+
+
+def ptr8(buf):
+    '''!@brief      A viper pointer to the bytes of a buffer.
+        @param      buf is the buffer.
+        @return     The pointer.
+    '''
+    return _Pointer(buf, 'B', 8)
+
+
+def ptr16(buf):
+    '''!@brief      A viper pointer to the 16-bit items of a buffer.
+        @param      buf is the buffer.
+        @return     The pointer.
+    '''
+    return _Pointer(buf, 'H', 16)
+
+
+def ptr32(buf):
+    '''!@brief      A viper pointer to the 32-bit items of a buffer.
+        @param      buf is the buffer.
+        @return     The pointer.
+    '''
+    return _Pointer(buf, 'I', 32)
+
+
+def install_pointers():
+    '''!@brief      Puts ptr8(), ptr16() and ptr32() in the builtins, where
+                    viper code finds them on the board.
+    '''
+    builtins.ptr8 = ptr8
+    builtins.ptr16 = ptr16
+    builtins.ptr32 = ptr32
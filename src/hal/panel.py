@@ -0,0 +1,182 @@
+'''!
+    @file       panel.py
+
+    @brief      An electrical model of the 4-wire resistive touch panel.
+
+    @details    The panel is two resistive layers, one with its electrodes on
+                the x-axis ends (xm and xp) and one with its electrodes on the
+                y-axis ends (ym and yp). When the ball presses on the panel the
+                layers touch at the ball position through a contact
+                resistance. The model works out the voltage on each layer from
+                whichever pins are currently driven, so the xScan(), yScan(),
+                zScan() and Scan() methods of touchpanel.TouchPanel all see
+                the same readings they would on the real panel.
+
+
+    @author     Jake Lesher
+    @author     Daniel Xu
+    @date       10/16/2026
+'''
+
+import random
+
+## The full-scale reading of the 12-bit ADC.
+ADC_MAX = 4095
+
+
+class ResistivePanel:
+    '''!@brief      A resistive touch panel with a ball on it.
+        @details    The ball position is set in millimeters from the center of
+                    the panel, which is 176 mm by 100 mm.
+    '''
+    def __init__(self, xm='A1', xp='A7', ym='A0', yp='A6', width=176,
+                 length=100, r_x=600, r_y=350, r_contact=400, noise=0, seed=0,
+                 bow=0):
+        '''!@brief      Creates a touch panel with no ball on it.
+            @param      xm is the name of the pin on the x-minus electrode.
+            @param      xp is the name of the pin on the x-plus electrode.
+            @param      ym is the name of the pin on the y-minus electrode.
+            @param      yp is the name of the pin on the y-plus electrode.
+            @param      width is the size of the panel along x [mm].
+            @param      length is the size of the panel along y [mm].
+            @param      r_x is the end-to-end resistance of the x layer [ohm].
+            @param      r_y is the end-to-end resistance of the y layer [ohm].
+            @param      r_contact is the resistance between the layers where
+                        the ball presses them together [ohm].
+            @param      noise is the standard deviation of the noise added to
+                        readings of a layer through the ball [ADC counts].
+            @param      seed is the seed of the noise.
+            @param      bow is how far the readings bend away from a straight
+                        line near the edges of the panel, as a fraction of
+                        the layer. Uneven layers bend x along y and y along
+                        x. 0 gives an ideal panel.
+        '''
+        self.xm = xm
+        self.xp = xp
+        self.ym = ym
+        self.yp = yp
+        self.width = width
+        self.length = length
+        self.r_x = r_x
+        self.r_y = r_y
+        self.r_contact = r_contact
+        self.noise = noise
+        self.rng = random.Random(seed)
+        self.bow = bow
+        self.contact = False
+        self.x = 0
+        self.y = 0
+
+    def pin_names(self):
+        '''!@brief      Lists the pins wired to the panel.
+            @return     A tuple of pin names.
+        '''
+        return (self.xm, self.xp, self.ym, self.yp)
+
+    def touch(self, x, y):
+        '''!@brief      Puts the ball on the panel.
+            @param      x is the x-position of the ball [mm].
+            @param      y is the y-position of the ball [mm].
+        '''
+        self.x = x
+        self.y = y
+        self.contact = True
+
+    def release(self):
+        '''!@brief      Takes the ball off the panel.
+        '''
+        self.contact = False
+
+    def _fraction(self, pos, size):
+        '''!@brief      Finds how far along a layer a position is.
+            @param      pos is the position from the center [mm].
+            @param      size is the size of the layer [mm].
+            @return     The fraction from the minus to the plus electrode,
+                        kept slightly inside the ends of the layer.
+        '''
+        frac = pos/size + 0.5
+        return min(max(frac, 1e-3), 1 - 1e-3)
+
+    def voltages(self, pins):
+        '''!@brief      Solves for the voltage of each layer at the ball.
+            @details    Each driven electrode connects the layer to its level
+                        through the part of the layer between the electrode
+                        and the ball. With the ball down, the two layers are
+                        joined by the contact resistance. This gives two
+                        linear equations in the two layer voltages.
+            @param      pins is a dictionary of every Pin object by name.
+            @return     A tuple of the x layer and y layer voltages as a
+                        fraction of the supply, where None means the layer is
+                        floating.
+        '''
+        fx = self._fraction(self.x, self.width)
+        fy = self._fraction(self.y, self.length)
+        if self.bow:
+            ux = 2*fx - 1
+            uy = 2*fy - 1
+            fx = min(max(fx + self.bow*ux*uy, 1e-3), 1 - 1e-3)
+            fy = min(max(fy + self.bow*(ux*ux - 1), 1e-3), 1 - 1e-3)
+
+        def drive(name):
+            pin = pins.get(name)
+            return None if pin is None else pin.driven()
+
+        # Conductance to each driven electrode and the current it injects.
+        gx = ix = gy = iy = 0
+        level = drive(self.xm)
+        if level is not None:
+            g = 1/(fx*self.r_x)
+            gx += g
+            ix += g*level
+        level = drive(self.xp)
+        if level is not None:
+            g = 1/((1 - fx)*self.r_x)
+            gx += g
+            ix += g*level
+        level = drive(self.ym)
+        if level is not None:
+            g = 1/(fy*self.r_y)
+            gy += g
+            iy += g*level
+        level = drive(self.yp)
+        if level is not None:
+            g = 1/((1 - fy)*self.r_y)
+            gy += g
+            iy += g*level
+
+        if not self.contact:
+            v_x = ix/gx if gx else None
+            v_y = iy/gy if gy else None
+            return v_x, v_y
+
+        gc = 1/self.r_contact
+        det = (gx + gc)*(gy + gc) - gc*gc
+        if det == 0:
+            return None, None
+        v_x = (ix*(gy + gc) + gc*iy)/det
+        v_y = ((gx + gc)*iy + gc*ix)/det
+        return v_x, v_y
+
+    def read_adc(self, pin, pins):
+        '''!@brief      Produces the ADC reading of one of the panel pins.
+            @details    A driven pin reads its own level. An undriven pin reads
+                        the voltage of its layer at the ball, because no
+                        current flows through the rest of the layer. A layer
+                        that is not connected to anything reads full scale.
+            @param      pin is the Pin object being read.
+                        While the ball is down, that reading has noise added
+                        if noise was given.
+            @param      pins is a dictionary of every Pin object by name.
+            @return     A 12-bit ADC reading.
+        '''
+        level = pin.driven()
+        if level is not None:
+            return ADC_MAX*level
+        v_x, v_y = self.voltages(pins)
+        v = v_x if pin.name in (self.xm, self.xp) else v_y
+        if v is None:
+            return ADC_MAX
+        reading = v*ADC_MAX
+        if self.noise and self.contact:
+            reading += self.rng.gauss(0, self.noise)
+        return min(max(int(round(reading)), 0), ADC_MAX)
@@ -0,0 +1,123 @@
+'''!
+    @file       plant.py
+
+    @brief      A physics model of the ball balancing platform.
+
+    @details    The platform tilts about two axes, each driven by one motor
+                through a linkage. Each axis is modeled as a DC motor whose
+                tilt rate follows the duty cycle with a first-order lag:
+
+                    theta'' = (K_v*duty - theta')/tau
+
+                The ball is a solid sphere rolling without slipping, so its
+                acceleration along an axis is 5/7 g sin(theta). The axes and
+                signs follow the shares: Data[0] and Velocity[0] are the tilt
+                that Duty2 drives and that moves the ball in y, and Data[1]
+                and Velocity[1] are the tilt that Duty1 drives and that moves
+                the ball in x. The default parameters are rough estimates for
+                our platform, not measured values.
+
+
+    @author     Jake Lesher
+    @author     Daniel Xu
+    @date       10/16/2026
+'''
+
+import math
+
+## Gravitational acceleration [mm/s^2].
+GRAVITY = 9810
+
+## The ball acceleration per unit sine of the tilt for a rolling solid
+#  sphere [mm/s^2].
+BALL_GAIN = 5/7*GRAVITY
+
+
+class BallPlatePlant:
+    '''!@brief      The state and dynamics of the platform and the ball.
+    '''
+    def __init__(self, k_v=3.5, tau=0.04, max_tilt=15, half_width=88,
+                 half_length=50):
+        '''!@brief      Creates a level platform with the ball at the center.
+            @param      k_v is the steady tilt rate per percent duty
+                        [deg/s/%].
+            @param      tau is the time constant of the motor and linkage [s].
+            @param      max_tilt is the tilt at which the platform hits its
+                        stops [deg].
+            @param      half_width is half the size of the panel in x [mm].
+            @param      half_length is half the size of the panel in y [mm].
+        '''
+        self.k_v = k_v
+        self.tau = tau
+        self.max_tilt = max_tilt
+        self.half_width = half_width
+        self.half_length = half_length
+        self.duty1 = 0
+        self.duty2 = 0
+        self.reset()
+
+    def reset(self, x=0, y=0, v_x=0, v_y=0, theta_x=0, theta_y=0):
+        '''!@brief      Puts the platform and the ball in a given state.
+            @param      x is the x-position of the ball [mm].
+            @param      y is the y-position of the ball [mm].
+            @param      v_x is the x-velocity of the ball [mm/s].
+            @param      v_y is the y-velocity of the ball [mm/s].
+            @param      theta_x is the tilt driven by Duty2 [deg].
+            @param      theta_y is the tilt driven by Duty1 [deg].
+        '''
+        self.x = x
+        self.y = y
+        self.v_x = v_x
+        self.v_y = v_y
+        self.theta_x = theta_x
+        self.theta_y = theta_y
+        self.omega_x = 0
+        self.omega_y = 0
+        self.on_plate = True
+
+    def set_duty(self, duty1, duty2):
+        '''!@brief      Sets the motor duty cycles as taskController requests.
+            @param      duty1 is the duty cycle of motor 1 [%].
+            @param      duty2 is the duty cycle of motor 2 [%].
+        '''
+        self.duty1 = duty1
+        self.duty2 = duty2
+
+    def _tilt(self, theta, omega, duty, dt):
+        '''!@brief      Steps one tilt axis forward in time.
+            @param      theta is the tilt [deg].
+            @param      omega is the tilt rate [deg/s].
+            @param      duty is the duty cycle of the motor [%].
+            @param      dt is the time step [s].
+            @return     A tuple of the new tilt and tilt rate.
+        '''
+        omega += (self.k_v*duty - omega)/self.tau*dt
+        theta += omega*dt
+        if theta > self.max_tilt:
+            theta = self.max_tilt
+            omega = min(omega, 0)
+        elif theta < -self.max_tilt:
+            theta = -self.max_tilt
+            omega = max(omega, 0)
+        return theta, omega
+
+    def step(self, dt, max_step=0.002):
+        '''!@brief      Moves the simulation forward in time.
+            @details    The time is split into steps no longer than max_step
+                        and integrated with the semi-implicit Euler method.
+                        Once the ball rolls off an edge it stays off.
+            @param      dt is the time to move forward by [s].
+            @param      max_step is the longest integration step [s].
+        '''
+        n = max(1, int(math.ceil(dt/max_step)))
+        h = dt/n
+        for _ in range(n):
+            self.theta_x, self.omega_x = self._tilt(self.theta_x, self.omega_x, self.duty2, h)
+            self.theta_y, self.omega_y = self._tilt(self.theta_y, self.omega_y, self.duty1, h)
+            if self.on_plate:
+                self.v_x += BALL_GAIN*math.sin(math.radians(self.theta_y))*h
+                self.v_y -= BALL_GAIN*math.sin(math.radians(self.theta_x))*h
+                self.x += self.v_x*h
+                self.y += self.v_y*h
+                if abs(self.x) > self.half_width or abs(self.y) > self.half_length:
+                    self.on_plate = False
@@ -0,0 +1,580 @@
+'''!
+    @file       pyb.py
+
+    @brief      Host stand-ins for the parts of the pyb module the project uses.
+
+    @details    The classes here keep the same constructors and methods as
+                their pyb counterparts, but instead of touching hardware they
+                talk to the emulated peripherals in hal.board. Pins remember
+                their mode and level, ADC readings come from whichever
+                emulated device is wired to the pin, I2C transfers go to the
+                emulated devices attached to the bus, timer callbacks stand
+                in for the timer interrupts, and USB_VCP reads the
+                characters typed on standard input.
+
+
+    @author     Jake Lesher
+    @author     Daniel Xu
+    @date       10/16/2026
+'''
+
+import errno, os, select, sys
+from hal import board, clock
+
+
+class _PinNamespace:
+    '''!@brief      The Pin.cpu and Pin.board namespaces.
+        @details    Pins are created the first time they are looked up, so any
+                    pin name is accepted.
+    '''
+    def __getattr__(self, name):
+        '''!@brief      Looks up a pin by name.
+            @param      name is the name of the pin, such as A0.
+            @return     The Pin object with that name.
+        '''
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return Pin._lookup(name)
+
+
+def _wait(us):
+    '''!@brief      Takes as long as a hardware operation on the board would.
+        @details    The time goes through the firmware clock module when it is
+                    loaded, so that the operation also takes time on a
+                    clock.VirtualClock.
+        @param      us is the length of the operation [us].
+    '''
+    try:
+        import clock as source
+    except ImportError:
+        source = clock
+    source.sleep_us(us)
+
+
+class Pin:
+    '''!@brief      A host stand-in for pyb.Pin.
+        @details    There is one Pin object per pin name, as on the board, so a
+                    pin that is reconfigured through Pin(), Pin.init() or ADC()
+                    always has a single current mode and level.
+    '''
+    IN = 0
+    OUT_PP = 1
+    OUT_OD = 17
+    AF_PP = 2
+    AF_OD = 18
+    ANALOG = 3
+    OUT = OUT_PP
+    OPEN_DRAIN = OUT_OD
+    ALT = AF_PP
+    ALT_OPEN_DRAIN = AF_OD
+    PULL_NONE = 0
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_RISING = 1
+    IRQ_FALLING = 2
+
+    cpu = _PinNamespace()
+    board = _PinNamespace()
+
+    ## Every pin created so far, keyed on the pin name.
+    _registry = {}
+
+    @classmethod
+    def _lookup(cls, name):
+        '''!@brief      Finds the Pin object for a name, creating it if needed.
+            @param      name is the name of the pin.
+            @return     The Pin object.
+        '''
+        pin = cls._registry.get(name)
+        if pin is None:
+            pin = object.__new__(cls)
+            pin.name = name
+            pin.mode = cls.IN
+            pin.pull = cls.PULL_NONE
+            pin._value = 0
+            cls._registry[name] = pin
+        return pin
+
+    def __new__(cls, id, *args, **kwargs):
+        '''!@brief      Returns the single Pin object for a pin.
+            @param      id is a Pin object or the name of a pin.
+        '''
+        if isinstance(id, Pin):
+            return id
+        return cls._lookup(str(id))
+
+    def __init__(self, id, mode=-1, pull=-1, *, value=None, alt=-1, af=-1):
+        '''!@brief      Configures the pin if a mode or value is given.
+            @param      id is a Pin object or the name of a pin.
+            @param      mode is the pin mode, such as Pin.OUT_PP.
+            @param      pull is the pull resistor setting.
+            @param      value is the output level to set.
+        '''
+        if mode != -1 or value is not None:
+            self.init(mode, pull, value=value)
+
+    def init(self, mode=-1, pull=-1, *, value=None, alt=-1, af=-1):
+        '''!@brief      Reconfigures the pin.
+            @param      mode is the pin mode, such as Pin.OUT_PP.
+            @param      pull is the pull resistor setting.
+            @param      value is the output level to set.
+        '''
+        if mode != -1:
+            self.mode = mode
+        if pull != -1:
+            self.pull = pull
+        if value is not None:
+            self._value = 1 if value else 0
+
+    def value(self, value=None):
+        '''!@brief      Reads or sets the level of the pin.
+            @param      value is the level to set, or None to read the pin.
+            @return     The level of the pin when reading.
+        '''
+        if value is None:
+            return self._value
+        self._value = 1 if value else 0
+
+    def high(self):
+        '''!@brief      Sets the pin high.
+        '''
+        self._value = 1
+
+    def low(self):
+        '''!@brief      Sets the pin low.
+        '''
+        self._value = 0
+
+    on = high
+    off = low
+
+    def driven(self):
+        '''!@brief      Checks if the pin is driving its net.
+            @return     The level being driven, or None if the pin is an input.
+        '''
+        if self.mode in (Pin.OUT_PP, Pin.OUT_OD):
+            return self._value
+        return None
+
+    def __repr__(self):
+        '''!@brief      Creates a description of the pin.
+            @return     A string with the name of the pin.
+        '''
+        return f'Pin(Pin.cpu.{self.name})'
+
+
+class ADC:
+    '''!@brief      A host stand-in for pyb.ADC.
+        @details    Creating an ADC puts the pin in analog mode. Readings come
+                    from the emulated device that hal.board has wired to the
+                    pin.
+    '''
+    def __init__(self, pin):
+        '''!@brief      Sets up a pin for analog input.
+            @param      pin is a Pin object or the name of a pin.
+        '''
+        self.pin = Pin(pin)
+        self.pin.init(Pin.ANALOG)
+
+    def read(self):
+        '''!@brief      Reads the analog value on the pin.
+            @return     A 12-bit ADC reading.
+        '''
+        return board.read_adc(self.pin, Pin._registry)
+
+    def read_timed(self, buf, timer):
+        '''!@brief      Reads the pin once for every element of a buffer, at the
+                        rate of a timer.
+            @details    This blocks for as long as the readings would take on
+                        the board.
+            @param      buf is the buffer to fill, such as an array('H').
+            @param      timer is the Timer whose frequency sets the rate.
+        '''
+        _wait(int(len(buf)*1_000_000/timer.freq()))
+        for idx in range(len(buf)):
+            buf[idx] = board.read_adc(self.pin, Pin._registry)
+
+
+class TimerChannel:
+    '''!@brief      One channel of a host Timer.
+        @details    The channel only remembers the pulse width it was given, so
+                    that emulated loads such as the motors can read it.
+    '''
+    def __init__(self, timer, channel, mode, pin=None):
+        '''!@brief      Creates a timer channel.
+            @param      timer is the Timer the channel belongs to.
+            @param      channel is the channel number.
+            @param      mode is the channel mode, such as Timer.PWM.
+            @param      pin is the pin driven by the channel.
+        '''
+        self.timer = timer
+        self.channel_num = channel
+        self.mode = mode
+        self.pin = pin
+        self.percent = 0
+
+    def pulse_width_percent(self, value=None):
+        '''!@brief      Reads or sets the PWM duty cycle.
+            @param      value is the duty cycle to set [%], or None to read it.
+            @return     The duty cycle [%] when reading.
+        '''
+        if value is None:
+            return self.percent
+        self.percent = min(max(value, 0), 100)
+
+
+# The timers with a callback set, keyed on the timer number, and whether a
+# callback is running.
+_callback_timers = {}
+_in_callback = False
+
+
+def _run_timers(now):
+    '''!@brief      Runs the timer callbacks that are due.
+        @details    This is called by every read of the host microsecond
+                    counter, and stands in for the timer interrupts. A
+                    callback that came due more than once since the last
+                    read runs once, as an interrupt that is still pending
+                    does on the board, and callbacks do not interrupt each
+                    other.
+        @param      now is the time of the read [us].
+        @return     The time until the next callback is due [us].
+    '''
+    global _in_callback
+    if not _in_callback:
+        _in_callback = True
+        try:
+            for timer in tuple(_callback_timers.values()):
+                if clock.ticks_diff(now, timer._due) >= 0:
+                    period = round(1_000_000/timer._freq)
+                    while clock.ticks_diff(now, timer._due) >= 0:
+                        timer._due = clock.ticks_add(timer._due, period)
+                    timer._callback(timer)
+        finally:
+            _in_callback = False
+    wait = 1_000_000
+    for timer in _callback_timers.values():
+        wait = min(wait, clock.ticks_diff(timer._due, now))
+    return max(wait, 0)
+
+
+class Timer:
+    '''!@brief      A host stand-in for pyb.Timer.
+        @details    A callback set on the timer runs the first time the host
+                    microsecond counter is read at or after each period of
+                    the timer, from inside that read. It runs on the host's
+                    own time, so it only runs while the firmware uses
+                    clock.HardwareClock.
+    '''
+    PWM = 0
+    PWM_INVERTED = 1
+    OC_TIMING = 2
+    OC_ACTIVE = 3
+    OC_INACTIVE = 4
+    OC_TOGGLE = 5
+    IC = 6
+    ENC_A = 7
+    ENC_B = 8
+    ENC_AB = 9
+    UP = 0
+    DOWN = 1
+    CENTER = 2
+
+    def __init__(self, id, *, freq=None, prescaler=None, period=None, callback=None,
+                 **kwargs):
+        '''!@brief      Creates a timer.
+            @param      id is the timer number.
+            @param      freq is the frequency of the timer [Hz].
+            @param      callback is the function to call every period of the
+                        timer, or None.
+        '''
+        self.id = id
+        self._freq = freq
+        self.channels = {}
+        self._callback = None
+        self._due = 0
+        if callback is not None:
+            self.callback(callback)
+
+    def callback(self, fun):
+        '''!@brief      Sets the function called every period of the timer.
+            @param      fun is the function, which is passed the timer, or
+                        None to stop calling it.
+        '''
+        self._callback = fun
+        _callback_timers.pop(self.id, None)
+        if fun is not None:
+            self._due = clock.ticks_add(clock.ticks_us(), round(1_000_000/self._freq))
+            _callback_timers[self.id] = self
+        clock.interrupt = _run_timers if _callback_timers else None
+
+    def deinit(self):
+        '''!@brief      Stops the timer and its callback.
+        '''
+        self.callback(None)
+
+    def freq(self, value=None):
+        '''!@brief      Reads or sets the frequency of the timer.
+            @param      value is the frequency to set [Hz], or None to read it.
+            @return     The frequency of the timer [Hz] when reading.
+        '''
+        if value is None:
+            return self._freq
+        self._freq = value
+
+    def channel(self, channel, mode=None, pin=None, **kwargs):
+        '''!@brief      Creates or looks up a channel of the timer.
+            @param      channel is the channel number.
+            @param      mode is the channel mode, such as Timer.PWM.
+            @param      pin is the pin driven by the channel.
+            @return     The TimerChannel object.
+        '''
+        if mode is None:
+            return self.channels.get(channel)
+        ch = TimerChannel(self, channel, mode, pin)
+        self.channels[channel] = ch
+        board.timers[(self.id, channel)] = ch
+        return ch
+
+
+class I2C:
+    '''!@brief      A host stand-in for pyb.I2C.
+        @details    Transfers go to the emulated devices that hal.board has
+                    attached to the bus. Addressing a device that is not
+                    attached raises OSError with EIO, as on the board. Each
+                    transfer blocks for as long as it would take on the real
+                    bus at the set baudrate.
+    '''
+    CONTROLLER = 0
+    PERIPHERAL = 1
+    MASTER = CONTROLLER
+    SLAVE = PERIPHERAL
+
+    def __init__(self, bus, mode=None, baudrate=400_000, **kwargs):
+        '''!@brief      Creates an I2C bus object.
+            @param      bus is the I2C bus number.
+            @param      mode is I2C.CONTROLLER or I2C.PERIPHERAL.
+            @param      baudrate is the bus clock frequency [Hz].
+        '''
+        self.bus = bus
+        self.mode = mode
+        self.baudrate = baudrate
+
+    def init(self, mode, baudrate=None, **kwargs):
+        '''!@brief      Reconfigures the bus.
+            @param      mode is I2C.CONTROLLER or I2C.PERIPHERAL.
+            @param      baudrate is the bus clock frequency [Hz], or None to
+                        keep the current one.
+        '''
+        self.mode = mode
+        if baudrate is not None:
+            self.baudrate = baudrate
+
+    def transfer_time(self, nbytes, read=True):
+        '''!@brief      Works out how long a register transfer takes on the bus.
+            @details    Every byte on the bus is 8 data bits and an
+                        acknowledge bit. A register read sends the device
+                        address, the register number and the device address
+                        again before the data, and a register write sends the
+                        device address and the register number.
+            @param      nbytes is the number of data bytes.
+            @param      read is True for a read and False for a write.
+            @return     The time the transfer takes [us].
+        '''
+        overhead = 3 if read else 2
+        return (nbytes + overhead)*9*1_000_000//self.baudrate
+
+    def _wait(self, us):
+        '''!@brief      Takes as long as a transfer on the board would.
+            @param      us is the length of the transfer [us].
+        '''
+        _wait(us)
+
+    def _device(self, addr):
+        '''!@brief      Finds the emulated device at an address.
+            @param      addr is the 7-bit device address.
+            @return     The emulated device.
+        '''
+        device = board.i2c_device(self.bus, addr)
+        if device is None:
+            raise OSError(errno.EIO)
+        return device
+
+    def scan(self):
+        '''!@brief      Lists the devices on the bus.
+            @return     A list of the addresses that respond.
+        '''
+        return board.i2c_scan(self.bus)
+
+    def is_ready(self, addr):
+        '''!@brief      Checks if a device responds.
+            @param      addr is the 7-bit device address.
+            @return     True if there is a device at the address.
+        '''
+        return board.i2c_device(self.bus, addr) is not None
+
+    def mem_read(self, data, addr, memaddr, *, timeout=5000, addr_size=8):
+        '''!@brief      Reads device registers.
+            @param      data is the number of bytes to read, or a buffer to
+                        fill, such as a bytearray or an array.
+            @param      addr is the 7-bit device address.
+            @param      memaddr is the first register to read.
+            @return     A bytes object, or the buffer that was filled.
+        '''
+        device = self._device(addr)
+        if isinstance(data, int):
+            self._wait(self.transfer_time(data))
+            return bytes(device.read(memaddr, data))
+        # Like MicroPython, fill any writable buffer byte by byte, so an
+        # array('h') receives the register bytes in memory order.
+        view = memoryview(data).cast('B')
+        self._wait(self.transfer_time(len(view)))
+        view[:] = device.read(memaddr, len(view))
+        return data
+
+    def mem_write(self, data, addr, memaddr, *, timeout=5000, addr_size=8):
+        '''!@brief      Writes device registers.
+            @param      data is an integer byte or a buffer to write.
+            @param      addr is the 7-bit device address.
+            @param      memaddr is the first register to write.
+        '''
+        device = self._device(addr)
+        if isinstance(data, int):
+            data = bytes((data & 0xFF,))
+        data = bytes(data)
+        self._wait(self.transfer_time(len(data), read=False))
+        device.write(memaddr, data)
+
+
+class USB_VCP:
+    '''!@brief      A host stand-in for pyb.USB_VCP.
+        @details    Characters come from the input buffer, which feed() adds
+                    to, and from standard input when it has data waiting.
+    '''
+    _input = bytearray()
+
+    def __init__(self, id=0):
+        '''!@brief      Creates the virtual COM port.
+            @param      id is the USB port number.
+        '''
+        self.id = id
+
+    @classmethod
+    def feed(cls, data):
+        '''!@brief      Queues characters as if they had been typed.
+            @param      data is a bytes or str object to queue.
+        '''
+        if isinstance(data, str):
+            data = data.encode()
+        cls._input.extend(data)
+
+    def _poll_stdin(self):
+        '''!@brief      Moves any characters waiting on stdin into the buffer.
+        '''
+        try:
+            fd = sys.stdin.fileno()
+            while select.select((fd,), (), (), 0)[0]:
+                chunk = os.read(fd, 64)
+                if not chunk:
+                    break
+                USB_VCP._input.extend(chunk)
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    def any(self):
+        '''!@brief      Checks if characters are waiting to be read.
+            @return     True if there is at least one character waiting.
+        '''
+        if not USB_VCP._input:
+            self._poll_stdin()
+        return len(USB_VCP._input) > 0
+
+    def read(self, nbytes=None):
+        '''!@brief      Reads waiting characters.
+            @param      nbytes is the most characters to read, or None for all.
+            @return     A bytes object with the characters read.
+        '''
+        self.any()
+        buf = USB_VCP._input
+        if nbytes is None:
+            nbytes = len(buf)
+        data = bytes(buf[:nbytes])
+        del buf[:nbytes]
+        return data
+
+    def write(self, data):
+        '''!@brief      Writes characters to standard output.
+            @param      data is a bytes or str object to write.
+            @return     The number of bytes written.
+        '''
+        if isinstance(data, str):
+            data = data.encode()
+        sys.stdout.buffer.write(data)
+        sys.stdout.flush()
+        return len(data)
+
+
+def millis():
+    '''!@brief      Returns the millisecond counter.
+        @return     The number of milliseconds elapsed, wrapped as ticks_ms().
+    '''
+    return clock.ticks_ms()
+
+
+def micros():
+    '''!@brief      Returns the microsecond counter.
+        @return     The number of microseconds elapsed, wrapped as ticks_us().
+    '''
+    return clock.ticks_us()
+
+
+def elapsed_millis(start):
+    '''!@brief      Finds the milliseconds elapsed since a millis() value.
+        @param      start is the earlier millis() value.
+        @return     The elapsed time [ms].
+    '''
+    return clock.ticks_diff(clock.ticks_ms(), start)
+
+
+def elapsed_micros(start):
+    '''!@brief      Finds the microseconds elapsed since a micros() value.
+        @param      start is the earlier micros() value.
+        @return     The elapsed time [us].
+    '''
+    return clock.ticks_diff(clock.ticks_us(), start)
+
+
+def delay(ms):
+    '''!@brief      Waits for a number of milliseconds.
+        @param      ms is the time to wait [ms].
+    '''
+    clock.sleep_ms(ms)
+
+
+def udelay(us):
+    '''!@brief      Waits for a number of microseconds.
+        @param      us is the time to wait [us].
+    '''
+    clock.sleep_us(us)
+
+
+def wfi():
+    '''!@brief      Waits for the next interrupt.
+        @details    On the board the SysTick interrupt wakes the core every
+                    millisecond, so this sleeps for one millisecond.
+    '''
+    clock.sleep_us(1_000)
+
+
+def disable_irq():
+    '''!@brief      Disables interrupts, which does nothing on the host.
+        @return     The previous interrupt state.
+    '''
+    return True
+
+
+def enable_irq(state=True):
+    '''!@brief      Restores interrupts, which does nothing on the host.
+        @param      state is the interrupt state returned by disable_irq().
+    '''
+    pass
@@ -0,0 +1,246 @@
+'''!
+    @file       sim.py
+
+    @brief      Runs taskController in closed loop with the platform model.
+
+    @details    The sensor and motor tasks are replaced by tasks that read
+                and write the plant in hal.plant. They publish the same
+                shares as taskIMU and taskPanel (Data, Velocity, Position and
+                Contact) and take Duty1 and Duty2 from taskController. The IMU
+                readings are quantized to 1/16 degree like the BNO055, and the
+                touch panel readings are noisy ADC counts that go through the
+                same Kalman filter and calibration as on the board.
+
+                Everything runs on a clock.VirtualClock, so the scheduler
+                jumps straight from one frame to the next and a 10 second
+                balancing run takes a small fraction of a second.
+                Run a batch of randomized balancing runs from the src
+                directory with:
+
+                    python -m hal.sim [number of runs] [fixed]
+
+                With fixed, the controller and the panel filter run on the
+                fixed-point classes in fixedpoint.py.
+
+
+    @author     Jake Lesher
+    @author     Daniel Xu
+    @date       10/16/2026
+'''
+
+import hal
+hal.install()
+
+import math, random, sys, time
+from hal import plant
+import shares, scheduler, taskController, touchpanel, panelmap, fixedpoint, clock
+
+## The task period used for every task in the simulation [us].
+PERIOD = 10_000
+
+## The touch panel calibration matching the model: 176 mm by 100 mm across
+#  the full ADC range, as the six Beta coefficients of an affine calibration,
+#  see panelmap.from_beta().
+BETA = (176/4095, 0, 0, 100/4095, -88, -50)
+
+
+def simIMUFcn(taskName, period, model, Data, Velocity, rng, noise):
+    '''!@brief      Publishes the platform tilt like taskIMU.
+        @param      taskName is the name of the task.
+        @param      period is the period of the task [us].
+        @param      model is the BallPlatePlant being simulated.
+        @param      Data is the share of Euler angles [deg].
+        @param      Velocity is the share of angular velocities [deg/s].
+        @param      rng is the random.Random object for the noise.
+        @param      noise is the standard deviation of the angle noise [deg].
+    '''
+    while True:
+        theta_x = round((model.theta_x + rng.gauss(0, noise))*16)/16
+        theta_y = round((model.theta_y + rng.gauss(0, noise))*16)/16
+        Data.write((theta_x, theta_y, 0))
+        Velocity.write((round(model.omega_x*16)/16, round(model.omega_y*16)/16, 0))
+        yield None
+
+
+def simPanelFcn(taskName, period, model, Position, Contact, rng, noise, fixed=False):
+    '''!@brief      Publishes the ball position and velocity like taskPanel.
+        @details    The ADC counts are filtered and calibrated the same way
+                    as in TouchPanel.Read_Panel(), through the map of the
+                    calibration. With the ball off the panel
+                    both channels read full scale and nothing new is
+                    published, as in taskPanel.
+        @param      taskName is the name of the task.
+        @param      period is the period of the task [us].
+        @param      model is the BallPlatePlant being simulated.
+        @param      Position is the share of the ball position [mm] and
+                    velocity [mm/s].
+        @param      Contact is the share telling if the ball is on the panel.
+        @param      rng is the random.Random object for the noise.
+        @param      noise is the standard deviation of the ADC noise [counts].
+        @param      fixed is True to filter with fixedpoint.FilterQ, as
+                    taskPanel does when made with fixed=True.
+    '''
+    TP = fixedpoint.FilterQ() if fixed else touchpanel.TouchPanel()
+    Map = panelmap.make_map(panelmap.from_beta(BETA))
+    Position.write((0, 0, 0, 0))
+    while True:
+        contact = model.on_plate
+        if contact:
+            adc_x = (model.x/(2*model.half_width) + 0.5)*4095 + rng.gauss(0, noise)
+            adc_y = (model.y/(2*model.half_length) + 0.5)*4095 + rng.gauss(0, noise)
+            adc_x = min(max(int(adc_x), 0), 4095)
+            adc_y = min(max(int(adc_y), 0), 4095)
+        else:
+            adc_x = adc_y = 4095
+        ADC_Data = TP.Filter((adc_x, adc_y, contact))
+        if fixed:
+            Map.convert(fixedpoint.to_float(ADC_Data[0]), fixedpoint.to_float(ADC_Data[1]),
+                        fixedpoint.to_float(TP.vx_hat), fixedpoint.to_float(TP.vy_hat))
+        else:
+            Map.convert(ADC_Data[0], ADC_Data[1], TP.vx_hat, TP.vy_hat)
+        Contact.write(contact)
+        if contact:
+            Position.set('x', round(Map.x, 1))
+            Position.set('y', round(Map.y, 1))
+            Position.set('vx', Map.vx)
+            Position.set('vy', Map.vy)
+            Position.commit()
+        yield None
+
+
+def simMotorFcn(taskName, period, model, Duty1, Duty2):
+    '''!@brief      Applies the duty cycles to the model like taskMotor.
+        @param      taskName is the name of the task.
+        @param      period is the period of the task [us].
+        @param      model is the BallPlatePlant being simulated.
+        @param      Duty1 is the share of the duty cycle of motor 1 [%].
+        @param      Duty2 is the share of the duty cycle of motor 2 [%].
+    '''
+    Duty1.write(float(0))
+    Duty2.write(float(0))
+    while True:
+        model.set_duty(Duty1.read(), Duty2.read())
+        yield None
+
+
+class SimResult:
+    '''!@brief      The outcome of one simulated balancing run.
+    '''
+    def __init__(self, balanced, duration, rms_error, final_pos):
+        '''!@brief      Stores the outcome of a run.
+            @param      balanced is True if the ball stayed on the platform.
+            @param      duration is the simulated time the ball stayed on the
+                        platform [s].
+            @param      rms_error is the RMS distance of the ball from the
+                        center [mm].
+            @param      final_pos is the final ball position [mm].
+        '''
+        self.balanced = balanced
+        self.duration = duration
+        self.rms_error = rms_error
+        self.final_pos = final_pos
+
+    def __repr__(self):
+        '''!@brief      Creates a one-line summary of the run.
+            @return     A string describing the run.
+        '''
+        return (f'balanced {self.balanced}, {self.duration:.2f} s on plate, '
+                f'RMS error {self.rms_error:.1f} mm, final position '
+                f'({self.final_pos[0]:.1f}, {self.final_pos[1]:.1f}) mm')
+
+
+def simulate(x0=20, y0=-10, duration=10, gains=None, model=None, seed=None,
+             adc_noise=8, imu_noise=0.05, fixed=False):
+    '''!@brief      Runs one closed-loop balancing run on virtual time.
+        @param      x0 is the starting x-position of the ball [mm].
+        @param      y0 is the starting y-position of the ball [mm].
+        @param      duration is the simulated length of the run [s].
+        @param      gains is a tuple of (Kp, Ki, Kd), each an (outer, inner)
+                    tuple as taskUser writes them, or None to use the
+                    defaults in taskController.
+        @param      model is the BallPlatePlant to use, or None for a new one.
+        @param      seed is the seed for the sensor noise.
+        @param      adc_noise is the touch panel noise [ADC counts].
+        @param      imu_noise is the IMU angle noise [deg].
+        @param      fixed is True to run the controller and the panel filter
+                    in fixed point.
+        @return     A SimResult describing the run.
+    '''
+    if model is None:
+        model = plant.BallPlatePlant()
+    model.reset(x0, y0)
+    rng = random.Random(seed)
+
+    Data = shares.RecordShare(('x', 'y', 'z'))
+    Velocity = shares.RecordShare(('x', 'y', 'z'))
+    Duty1 = shares.Share()
+    Duty2 = shares.Share()
+    clFlag = shares.Share(True)
+    Kp = shares.StampedShare()
+    Ki = shares.StampedShare()
+    Kd = shares.StampedShare()
+    Position = shares.RecordShare(('x', 'y', 'vx', 'vy'))
+    Contact = shares.Share()
+
+    vclock = clock.VirtualClock()
+    clock.set_source(vclock)
+    try:
+        task_list = scheduler.Scheduler()
+        task_list.append(scheduler.Task(simIMUFcn('simIMU', PERIOD, model, Data, Velocity, rng, imu_noise),
+                                        'simIMU', 3, PERIOD, writes=(Data, Velocity)))
+        task_list.append(scheduler.Task(simPanelFcn('simPanel', PERIOD, model, Position, Contact, rng, adc_noise, fixed),
+                                        'simPanel', 3, PERIOD, writes=(Position, Contact)))
+        task_list.append(scheduler.Task(simMotorFcn('simMotor', PERIOD, model, Duty1, Duty2),
+                                        'simMotor', 3, PERIOD, reads=(Duty1, Duty2)))
+        task_list.append(scheduler.Task(taskController.taskControllerFcn('taskController', PERIOD, clFlag, Velocity, Duty1, Kp, Ki, Kd, Data, Duty2, Position, Contact, fixed),
+                                        'taskController', 3, PERIOD,
+                                        reads=(clFlag, Velocity, Data, Position, Contact, Kp, Ki, Kd),
+                                        writes=(Duty1, Duty2)))
+
+        # The first frame runs the initialization of every task, including
+        # the default gains that taskController writes. When a frame is
+        # done, run_once() idles the virtual clock up to the next frame.
+        while task_list.run_once() is not None:
+            pass
+        if gains is not None:
+            Kp.write(gains[0])
+            Ki.write(gains[1])
+            Kd.write(gains[2])
+
+        steps = int(duration*1_000_000/PERIOD)
+        step = 0
+        sq_error = 0
+        last_us = vclock.now_us
+        while step < steps:
+            model.step((vclock.now_us - last_us)/1_000_000)
+            last_us = vclock.now_us
+            if not model.on_plate:
+                break
+            step += 1
+            sq_error += model.x*model.x + model.y*model.y
+            while task_list.run_once() is not None:
+                pass
+    finally:
+        clock.set_source(clock.HardwareClock())
+
+    rms_error = math.sqrt(sq_error/step) if step else 0
+    return SimResult(model.on_plate, step*PERIOD/1_000_000, rms_error, (model.x, model.y))
+
+
+if __name__ == '__main__':
+    # Run a batch of balancing runs from random starting positions and
+    # report how many balanced and how much faster than real time they ran.
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    fixed = 'fixed' in sys.argv[2:]
+    rng = random.Random(305)
+    balanced = 0
+    sim_time = 0
+    start = time.perf_counter()
+    for run in range(runs):
+        result = simulate(rng.uniform(-60, 60), rng.uniform(-30, 30), seed=run, fixed=fixed)
+        balanced += result.balanced
+        sim_time += result.duration
+    wall_time = time.perf_counter() - start
+    print(f'{balanced} of {runs} runs balanced for 10 s.')
+    print(f'Simulated {sim_time:.0f} s in {wall_time:.1f} s: {sim_time/wall_time:.0f}x '
+          f'real time, {runs/wall_time*60:.0f} runs per minute.')
@@ -0,0 +1,15 @@
+'''!
+    @file       __init__.py
+
+    @brief      Host stand-in for the ulab package.
+
+    @details    ulab.numpy is a subset of numpy, so on the host the real numpy
+                package is used for it.
+
+
+    @author     Jake Lesher
+    @author     Daniel Xu
+    @date       10/16/2026
+'''
+
+from hal.ulab import numpy
@@ -0,0 +1,13 @@
+'''!
+    @file       numpy.py
+
+    @brief      Host stand-in for ulab.numpy, backed by numpy.
+
+
+    @author     Jake Lesher
+    @author     Daniel Xu
+    @date       10/16/2026
+'''
+
+from numpy import *
+from numpy import linalg
@@ -0,0 +1,16 @@
+'''!
+    @file       utime.py
+
+    @brief      Host stand-in for the utime module.
+
+    @details    Provides the ticks and sleep functions from hal.clock under
+                the name the BNO055 driver imports.
+
+
+    @author     Jake Lesher
+    @author     Daniel Xu
+    @date       10/16/2026
+'''
+
+from time import time, sleep
+from hal.clock import ticks_us, ticks_ms, ticks_cpu, ticks_add, ticks_diff, sleep_ms, sleep_us
@@ -0,0 +1,130 @@
+'''!
+    @file       kalman.py
+
+    @brief      The gains of the steady-state Kalman filter for the ball
+                position and velocity.
+
+    @details    TouchPanel.Filter() tracks each axis of the ball with a
+                constant velocity model: the state is the position and the
+                velocity, the velocity is expected to stay the same from one
+                scan to the next except for a random acceleration, and only
+                the position is measured. With the scans coming at a fixed
+                period the gain of the Kalman filter for this model settles to
+                two constants, one for the position and one for the velocity,
+                so the filter only needs a prediction and a correction with
+                those constants each scan, and no covariance has to be kept on
+                the board.
+
+                steady_gains() works the two constants out by running the
+                Riccati equation of the filter until it stops changing. It is
+                run offline, on a PC, and the results are kept in GAIN_POS and
+                GAIN_VEL, and in GAIN_POS_2 and GAIN_VEL_2 for an axis that
+                is only read every other scan, as when the scans alternate
+                between the axes. gains() picks the pair for a period, and
+                only works out the gains on the board for any other period.
+                Run this file to work them out again after changing PERIOD,
+                ACCEL_NOISE or MEAS_NOISE:
+
+                    python kalman.py
+
+                The gains only depend on the ratio of the two noises, so the
+                filter works the same in ADC counts or in mm. This file does
+                not import micropython, so it runs on plain Python.
+
+
+    @author     Jake Lesher
+    @author     Daniel Xu
+    @date       10/16/2026
+'''
+
+## The period of the touch panel readings the gains are worked out for [us].
+PERIOD = 10_000
+
+## The standard deviation of the acceleration of the ball [counts/s^2]. About
+#  1 m/s^2, as much as the platform tilt gives the ball.
+ACCEL_NOISE = 25_000.0
+
+## The standard deviation of the noise of a touch panel reading [counts].
+MEAS_NOISE = 8.0
+
+## The steady-state gain of the position correction.
+GAIN_POS = 0.5441
+
+## The steady-state gain of the velocity correction [1/s].
+GAIN_VEL = 21.10
+
+## The steady-state gain of the position correction for readings every
+#  2*PERIOD.
+GAIN_POS_2 = 0.7862
+
+## The steady-state gain of the velocity correction for readings every
+#  2*PERIOD [1/s].
+GAIN_VEL_2 = 28.90
+
+
+def steady_gains(period=PERIOD, accel_noise=ACCEL_NOISE, meas_noise=MEAS_NOISE):
+    '''!@brief      Works out the steady-state gains of the constant velocity
+                    Kalman filter.
+        @details    The acceleration is taken as constant over each period,
+                    which gives the process noise covariance
+                    Q = accel_noise^2*G*G' with G = (dt^2/2, dt). The
+                    covariance is predicted and corrected until the gains
+                    change by less than one part in a million.
+        @param      period is the time between readings [us].
+        @param      accel_noise is the standard deviation of the acceleration.
+        @param      meas_noise is the standard deviation of the measurement
+                    noise, in the same length unit as accel_noise.
+        @return     A tuple of the position gain and the velocity gain [1/s].
+    '''
+    dt = period/1_000_000
+    q = accel_noise*accel_noise
+    q11 = q*dt**4/4
+    q12 = q*dt**3/2
+    q22 = q*dt**2
+    r = meas_noise*meas_noise
+    # The covariance of the corrected estimate.
+    p11 = r
+    p12 = 0.0
+    p22 = q22*100
+    gain_pos = gain_vel = 0.0
+    for _ in range(10_000):
+        # Prediction: P = F*P*F' + Q with F = ((1, dt), (0, 1)).
+        m11 = p11 + 2*dt*p12 + dt*dt*p22 + q11
+        m12 = p12 + dt*p22 + q12
+        m22 = p22 + q22
+        # Correction with the position reading.
+        s = m11 + r
+        k1 = m11/s
+        k2 = m12/s
+        p11 = (1 - k1)*m11
+        p12 = (1 - k1)*m12
+        p22 = m22 - k2*m12
+        done = abs(k1 - gain_pos) < 1e-6*k1 and abs(k2 - gain_vel) < 1e-6*k2
+        gain_pos = k1
+        gain_vel = k2
+        if done:
+            break
+    return (gain_pos, gain_vel)
+
+
+def gains(period):
+    '''!@brief      Finds the gains for readings of an axis every period.
+        @param      period is the time between readings of the axis [us].
+        @return     A tuple of the position gain and the velocity gain [1/s].
+    '''
+    if period == PERIOD:
+        return (GAIN_POS, GAIN_VEL)
+    if period == 2*PERIOD:
+        return (GAIN_POS_2, GAIN_VEL_2)
+    return steady_gains(period)
+
+
+if __name__ == '__main__':
+    for period, suffix, stored in ((PERIOD, '', (GAIN_POS, GAIN_VEL)),
+                                   (2*PERIOD, '_2', (GAIN_POS_2, GAIN_VEL_2))):
+        gain_pos, gain_vel = steady_gains(period)
+        print(f'For readings every {period} us:')
+        print(f'GAIN_POS{suffix} = {gain_pos:.4f}')
+        print(f'GAIN_VEL{suffix} = {gain_vel:.2f}')
+        if abs(gain_pos - stored[0]) > 1e-4 or abs(gain_vel - stored[1]) > 1e-2:
+            print('The gains in this file are out of date.')
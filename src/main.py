@@ -14,7 +14,7 @@
     @date       02/16/2022
 '''
 
-import taskUser, taskIMU, taskMotor, taskController, taskPanel, shares
+import taskUser, taskIMU, taskMotor, taskController, taskPanel, shares, scheduler, profiler
 
 ##  @brief      The variable, zFlag, is a shared variable
 #   @details    This shared variable is a boolean that is shared between 
@@ -27,7 +27,7 @@ zFlag = shares.Share(False)
 #   @details    This shared queue is the positional data of the encoder, in 
 #               radians. It is updated in taskEncoder and recorded in taskUser.
 #  
-Data = shares.Share()
+Data = shares.RecordShare(('x', 'y', 'z'))
 
 ##  @brief      The variable, Delta, is a queue of shared data.
 #   @details    This shared queue is the delta data of the encoder in radians.
@@ -39,7 +39,7 @@ Delta = shares.Share()
 #   @details    This shared queue is the current angular velocity in rad/s.
 #               It is updated in taskEncoder and recorded in taskUser.
 #
-Velocity = shares.Share()
+Velocity = shares.RecordShare(('x', 'y', 'z'))
 
 ##  @brief      The variable, Duty1, is a queue of shared data.
 #   @details    This shared queue is the duty cycle for motor 1 as requested
@@ -63,21 +63,22 @@ clFlag = shares.Share(False)
 
 ##  @brief      The variable, Kp, is a shared variable
 #   @details    This shared variable is the value of the proportional gain to 
-#               be used in the closed-loop.
+#               be used in the closed-loop. Kp, Ki and Kd are timestamped
+#               shares so taskController can tell when taskUser changes them.
 #  
-Kp = shares.Share()
+Kp = shares.StampedShare()
 
 ##  @brief      The variable, Ki, is a shared variable
 #   @details    This shared variable is the value of the integral gain to 
 #               be used in the closed-loop.
 #  
-Ki = shares.Share()
+Ki = shares.StampedShare()
 
 ##  @brief      The variable, Kd, is a shared variable
 #   @details    This shared variable is the value of the derivative gain to 
 #               be used in the closed-loop.
 #  
-Kd = shares.Share()
+Kd = shares.StampedShare()
 
 ##  @brief      The variable, AngVel, is a shared variable
 #   @details    This shared variable is the value of __________
@@ -86,10 +87,12 @@ Kd = shares.Share()
 AngVel = shares.Share()
 
 ##  @brief      The variable, Position, is a shared variable
-#   @details    This shared variable is the value position read by the touch
-#               panel [mm].
+#   @details    This shared variable is the position [mm] and velocity
+#               [mm/s] of the ball estimated from the touch panel, with the
+#               fields x, y, vx and vy. It is stamped with the time of each
+#               scan.
 #  
-Position = shares.Share()
+Position = shares.RecordShare(('x', 'y', 'vx', 'vy'))
 
 ##  @brief      The variable, Contact, is a shared variable
 #   @details    This shared variable is a boolean telling if there is z-contact
@@ -99,26 +102,48 @@ Contact = shares.Share()
 
 if __name__ == '__main__':
     
-    # taskList will be the list used to define the three tasks that will run
-    # sequentially in 10 ms intervals.
-    taskList = [taskIMU.taskIMUFcn('taskIMU', 10_000, Data, Velocity),
-                taskPanel.taskPanelFcn('taskPanel', 10_000, Position, Contact),
-                taskUser.taskUserFcn('taskUser', 10_000, Data, Velocity, Duty1, Duty2, clFlag, Kp, Ki,Kd, Position, Contact),
-                taskMotor.taskMotorFcn('taskMotor', 10_000, Duty1, Duty2),
-                taskController.taskControllerFcn('taskController', 10_000, clFlag, Velocity, Duty1, Kp, Ki, Kd, Data, Duty2, Position, Contact)]
+    # Each task is added to the scheduler with a priority and a period of
+    # 10 ms. When several tasks are due at once, the ones with the larger
+    # priority run first, so the control loop always beats the user interface.
+    # Within a priority, the tasks run in the order the shares they read and
+    # write pass data along: sensors, then the controller, then the motors.
+    # Every task is profiled so its timing can be printed from taskUser.
+    # The IMU is read inside its task, and the frames are not moved to
+    # follow its samples. Passing phase_lock=True lines the frames up with
+    # the samples, which stays off until it has been measured on the board.
+    scheduler.task_list.append(scheduler.Task(taskIMU.taskIMUFcn('taskIMU', 10_000, Data, Velocity,
+                                                                 task_list=scheduler.task_list),
+                                              'taskIMU', 3, 10_000, profile=True,
+                                              writes=(Data, Velocity)))
+    # The panel is scanned inside its task. Passing background=True scans it
+    # from a timer interrupt instead, which stays off until it has been
+    # measured on the board.
+    scheduler.task_list.append(scheduler.Task(taskPanel.taskPanelFcn('taskPanel', 10_000, Position, Contact),
+                                              'taskPanel', 3, 10_000, profile=True,
+                                              writes=(Position, Contact)))
+    scheduler.task_list.append(scheduler.Task(taskUser.taskUserFcn('taskUser', 10_000, Data, Velocity, Duty1, Duty2, clFlag, Kp, Ki,Kd, Position, Contact),
+                                              'taskUser', 1, 10_000, profile=True,
+                                              reads=(Data, Velocity, Position, Contact, clFlag),
+                                              writes=(Duty1, Duty2, clFlag, Kp, Ki, Kd)))
+    scheduler.task_list.append(scheduler.Task(taskMotor.taskMotorFcn('taskMotor', 10_000, Duty1, Duty2),
+                                              'taskMotor', 3, 10_000, profile=True,
+                                              reads=(Duty1, Duty2)))
+    scheduler.task_list.append(scheduler.Task(taskController.taskControllerFcn('taskController', 10_000, clFlag, Velocity, Duty1, Kp, Ki, Kd, Data, Duty2, Position, Contact),
+                                              'taskController', 3, 10_000, profile=True,
+                                              reads=(clFlag, Velocity, Data, Position, Contact, Kp, Ki, Kd),
+                                              writes=(Duty1, Duty2)))
     
-    # taskList = [taskPanel.taskPanelFcn('taskPanel', 10_000, Position, Contact)]
+    # The tasks set up their drivers on their first runs, side by side, and
+    # mark each phase of start up in profiler.startup for taskUser to print.
+    profiler.startup.mark('tasks created')
     
-    while True:
+    # With this loop we want to look for a keyboard interrupt (Ctrl+C).
+    # The scheduler runs each task when it is due and sleeps in between.
+    try:
+        scheduler.task_list.run()
         
-        # With this loop we want to look for a keyboard interrupt (Ctrl+C).
-        # It will try to run the code until Ctrl+C happens and then break.
-        try:
-            for task in taskList:
-                next(task)
-            
-        except KeyboardInterrupt:
-            # A KeyboardInterrupt is ctrl+C in the terminal.
-            break
+    except KeyboardInterrupt:
+        # A KeyboardInterrupt is ctrl+C in the terminal.
+        pass
         
     print("Program Terminating")
\ No newline at end of file
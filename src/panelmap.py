@@ -0,0 +1,341 @@
+'''!
+    @file       panelmap.py
+
+    @brief      The calibration of the touch panel, from ADC counts to mm.
+
+    @details    The calibration is a polynomial in the ADC readings, fitted by
+                least squares to any number of calibration taps. An AFFINE
+                model has the terms 1, u and v, and a QUADRATIC model adds u^2,
+                u*v and v^2, which follows a panel that bends its readings
+                near the edges. u and v are the x and y readings scaled to
+                -1..1, so the squares stay well inside the precision of the
+                32-bit floats of ulab.
+
+                An affine calibration is converted directly with the six
+                Beta numbers of the old calibration by an AffineMap, which is
+                the quickest way. Evaluating the quadratic polynomial every
+                reading would cost more, so for a quadratic calibration a
+                PanelMap works out the polynomial once at every node of a
+                GRID_N by GRID_N grid over the ADC range. Each reading is
+                then converted by looking up the four nodes around it and
+                interpolating between them, which with cells of 256 counts is
+                well under the panel noise. The slopes of the same cell turn
+                the velocity in ADC units/s into mm/s. make_map() picks the
+                map that suits a calibration.
+
+                The coefficients are kept as an array('f') of COEFFS numbers,
+                the six terms of the x polynomial followed by the six terms of
+                the y polynomial, with the terms an affine model does not use
+                left at zero. This is the form calstore.py saves.
+
+
+    @author     Jake Lesher
+    @author     Daniel Xu
+    @date       10/16/2026
+'''
+
+import array, micropython
+from ulab import numpy as np
+
+try:
+    import fastpath
+except (ImportError, SyntaxError, AttributeError, NameError):
+    # There is no native code emitter in this firmware, or this is CPython.
+    fastpath = None
+
+## Calibration model: x and y are linear in the readings.
+AFFINE = micropython.const(1)
+
+## Calibration model: x and y are quadratic in the readings.
+QUADRATIC = micropython.const(2)
+
+## The number of terms of each polynomial for each model.
+TERMS = {AFFINE: 3, QUADRATIC: 6}
+
+## The number of coefficients of a calibration: six for x and six for y.
+COEFFS = micropython.const(12)
+
+## The size of a grid cell is 2**GRID_SHIFT ADC counts.
+GRID_SHIFT = micropython.const(8)
+
+## The number of grid nodes along each axis, covering 0 to 4096 counts.
+GRID_N = micropython.const(17)
+
+# The ADC reading at the middle of the range, and its inverse, which scale a
+# reading to u or v.
+_MID = micropython.const(2048)
+_INV_MID = 1/2048
+_INV_STEP = 1/(1 << GRID_SHIFT)
+
+
+def fit(adc, mm, order=AFFINE):
+    '''!@brief      Fits a calibration to a set of calibration taps by least
+                    squares.
+        @param      adc is a sequence of the (x, y) readings of each tap [ADC
+                    units].
+        @param      mm is a sequence of the (x, y) positions of each tap [mm].
+        @param      order is AFFINE or QUADRATIC.
+        @return     An array('f') of the COEFFS coefficients.
+    '''
+    terms = TERMS[order]
+    if len(adc) < terms:
+        raise ValueError(f"A fit of order {order} needs at least {terms} points")
+    rows = []
+    for reading in adc:
+        u = (reading[0] - _MID)*_INV_MID
+        v = (reading[1] - _MID)*_INV_MID
+        rows.append((1, u, v, u*u, u*v, v*v)[:terms])
+    X = np.array(rows)
+    X_T = X.transpose()
+    B = np.dot(np.dot(np.linalg.inv(np.dot(X_T, X)), X_T), np.array(mm))
+    coef = array.array('f', COEFFS*[0])
+    for idx in range(terms):
+        coef[idx] = B[idx, 0]
+        coef[6 + idx] = B[idx, 1]
+    return coef
+
+
+def from_beta(beta, coef=None):
+    '''!@brief      Turns the six Beta coefficients of an old affine
+                    calibration into the coefficients used here.
+        @details    Beta maps the readings X and Y as x = B0*X + B1*Y + B4 and
+                    y = B2*X + B3*Y + B5.
+        @param      beta is the sequence of the six Beta coefficients.
+        @param      coef is the array('f') to fill, or None to make one.
+        @return     The array of the COEFFS coefficients.
+    '''
+    if coef is None:
+        coef = array.array('f', COEFFS*[0])
+    for idx in range(COEFFS):
+        coef[idx] = 0
+    coef[0] = _MID*(beta[0] + beta[1]) + beta[4]
+    coef[1] = _MID*beta[0]
+    coef[2] = _MID*beta[1]
+    coef[6] = _MID*(beta[2] + beta[3]) + beta[5]
+    coef[7] = _MID*beta[2]
+    coef[8] = _MID*beta[3]
+    return coef
+
+
+def to_beta(coef):
+    '''!@brief      Turns the coefficients of an affine calibration back into
+                    the six Beta coefficients of the old calibration.
+        @details    This is the inverse of from_beta(). Any quadratic terms
+                    are left out.
+        @param      coef is the array of the COEFFS coefficients.
+        @return     A tuple of the six Beta coefficients.
+    '''
+    return (coef[1]*_INV_MID, coef[2]*_INV_MID, coef[7]*_INV_MID, coef[8]*_INV_MID,
+            coef[0] - coef[1] - coef[2], coef[6] - coef[7] - coef[8])
+
+
+def is_affine(coef):
+    '''!@brief      Checks if a calibration has no quadratic terms.
+        @param      coef is the array of the COEFFS coefficients.
+        @return     True if every quadratic term is zero.
+    '''
+    for idx in (3, 4, 5, 9, 10, 11):
+        if coef[idx] != 0:
+            return False
+    return True
+
+
+def make_map(coef):
+    '''!@brief      Makes the map that converts readings through a calibration
+                    most quickly.
+        @param      coef is the array of the COEFFS coefficients.
+        @return     An AffineMap for an affine calibration, otherwise a
+                    PanelMap.
+    '''
+    if is_affine(coef):
+        return AffineMap(coef)
+    return PanelMap(coef)
+
+
+def evaluate(coef, X, Y):
+    '''!@brief      Works out a position straight from the polynomials.
+        @param      coef is the array of the COEFFS coefficients.
+        @param      X is the x reading [ADC units].
+        @param      Y is the y reading [ADC units].
+        @return     A tuple of the x and y positions [mm].
+    '''
+    u = (X - _MID)*_INV_MID
+    v = (Y - _MID)*_INV_MID
+    uu = u*u
+    uv = u*v
+    vv = v*v
+    return (coef[0] + coef[1]*u + coef[2]*v + coef[3]*uu + coef[4]*uv + coef[5]*vv,
+            coef[6] + coef[7]*u + coef[8]*v + coef[9]*uu + coef[10]*uv + coef[11]*vv)
+
+
+class AffineMap:
+    '''!@brief      Converts touch panel readings to mm through an affine
+                    calibration.
+        @details    This has the same convert(), x, y, vx and vy as a
+                    PanelMap, and works them out directly from the six Beta
+                    coefficients, as Read_Panel() did before the PanelMap.
+    '''
+    __slots__ = ('coef', 'beta', 'x', 'y', 'vx', 'vy')
+
+    def __init__(self, coef):
+        '''!@brief      Works out the Beta coefficients of a calibration.
+            @param      coef is the array of the COEFFS coefficients. Any
+                        quadratic terms are left out.
+        '''
+        self.coef = coef
+        self.beta = to_beta(coef)
+        self.x = 0.0
+        self.y = 0.0
+        self.vx = 0.0
+        self.vy = 0.0
+
+    def convert(self, X, Y, VX, VY):
+        '''!@brief      Converts a reading and a velocity to mm.
+            @param      X is the x reading [ADC units].
+            @param      Y is the y reading [ADC units].
+            @param      VX is the x velocity [ADC units/s].
+            @param      VY is the y velocity [ADC units/s].
+        '''
+        Beta = self.beta
+        self.x = Beta[0]*X + Beta[1]*Y + Beta[4]
+        self.y = Beta[3]*Y + Beta[2]*X + Beta[5]
+        self.vx = Beta[0]*VX + Beta[1]*VY
+        self.vy = Beta[3]*VY + Beta[2]*VX
+
+
+class PanelMap:
+    '''!@brief      Converts touch panel readings to mm through the grid of a
+                    calibration.
+        @details    convert() leaves its results in x, y, vx and vy rather
+                    than returning a tuple, so a conversion makes no new
+                    objects other than the floats themselves.
+    '''
+    __slots__ = ('coef', 'grid', 'x', 'y', 'vx', 'vy')
+
+    def __init__(self, coef):
+        '''!@brief      Works out the grid of a calibration.
+            @param      coef is the array of the COEFFS coefficients.
+        '''
+        self.coef = coef
+        ## The x and y positions at every node, row by row along y [mm].
+        self.grid = array.array('f', 2*GRID_N*GRID_N*[0])
+        idx = 0
+        for row in range(GRID_N):
+            for col in range(GRID_N):
+                pos = evaluate(coef, col << GRID_SHIFT, row << GRID_SHIFT)
+                self.grid[idx] = pos[0]
+                self.grid[idx + 1] = pos[1]
+                idx += 2
+        self.x = 0.0
+        self.y = 0.0
+        self.vx = 0.0
+        self.vy = 0.0
+
+    def convert(self, X, Y, VX, VY):
+        '''!@brief      Converts a reading and a velocity to mm.
+            @details    The cell is found from the integer part of the
+                        readings, and readings past the last cell are
+                        extrapolated from it.
+            @param      X is the x reading [ADC units].
+            @param      Y is the y reading [ADC units].
+            @param      VX is the x velocity [ADC units/s].
+            @param      VY is the y velocity [ADC units/s].
+        '''
+        col = int(X) >> GRID_SHIFT
+        if col < 0:
+            col = 0
+        elif col > GRID_N - 2:
+            col = GRID_N - 2
+        row = int(Y) >> GRID_SHIFT
+        if row < 0:
+            row = 0
+        elif row > GRID_N - 2:
+            row = GRID_N - 2
+        fx = (X - (col << GRID_SHIFT))*_INV_STEP
+        fy = (Y - (row << GRID_SHIFT))*_INV_STEP
+        grid = self.grid
+        k = 2*(row*GRID_N + col)
+
+        # The four nodes of the cell, how far the cell is from a
+        # parallelogram, and the slopes of the cell along x and y at the
+        # reading, per cell.
+        x00 = grid[k]
+        x10 = grid[k + 2]
+        x01 = grid[k + 2*GRID_N]
+        x11 = grid[k + 2*GRID_N + 2]
+        x_twist = x11 - x01 - x10 + x00
+        dx_col = x10 - x00 + fy*x_twist
+        dx_row = x01 - x00 + fx*x_twist
+        self.x = x00 + fx*dx_col + fy*(x01 - x00)
+        self.vx = (dx_col*VX + dx_row*VY)*_INV_STEP
+
+        y00 = grid[k + 1]
+        y10 = grid[k + 3]
+        y01 = grid[k + 2*GRID_N + 1]
+        y11 = grid[k + 2*GRID_N + 3]
+        y_twist = y11 - y01 - y10 + y00
+        dy_col = y10 - y00 + fy*y_twist
+        dy_row = y01 - y00 + fx*y_twist
+        self.y = y00 + fx*dy_col + fy*(y01 - y00)
+        self.vy = (dy_col*VX + dy_row*VY)*_INV_STEP
+
+
+## The plain Python versions of the methods that fastpath.py replaces, kept
+#  for comparison.
+AffineMap.convert_py = AffineMap.convert
+PanelMap.convert_py = PanelMap.convert
+if fastpath is not None:
+    # The native copies have the grid built in as constants.
+    assert (fastpath._GRID_SHIFT == GRID_SHIFT and fastpath._GRID_N == GRID_N
+            and fastpath._INV_STEP == _INV_STEP)
+    AffineMap.convert = fastpath.affinemap_convert
+    PanelMap.convert = fastpath.panelmap_convert
+
+
+if __name__ == '__main__':
+    # Fits both models to taps on a panel whose readings bend near the
+    # edges, and checks that the grid gives the same positions as the
+    # polynomial, that an affine grid is exact, and that the quadratic model
+    # follows the bend better than the affine one.
+    import math
+
+    def reading(x, y):
+        ux = x/88
+        uy = y/50
+        return (_MID + 2000*(ux + 0.03*ux*uy), _MID + 2000*(uy + 0.03*(ux*ux - 1)))
+
+    taps = [(x, y) for x in (-80, 0, 80) for y in (-40, 0, 40)]
+    adc = [reading(x, y) for x, y in taps]
+    errors = {}
+    for order in (AFFINE, QUADRATIC):
+        coef = fit(adc, taps, order)
+        Map = PanelMap(coef)
+        worst_grid = 0
+        worst = 0
+        for x in range(-80, 81, 8):
+            for y in range(-40, 41, 8):
+                X, Y = reading(x, y)
+                Map.convert(X, Y, 0, 0)
+                pos = evaluate(coef, X, Y)
+                worst_grid = max(worst_grid, abs(Map.x - pos[0]), abs(Map.y - pos[1]))
+                worst = max(worst, math.hypot(Map.x - x, Map.y - y))
+        errors[order] = worst
+        print(f'order {order}: largest error {worst:.2f} mm, grid against '
+              f'polynomial {worst_grid:.4f} mm')
+        assert worst_grid < (1e-3 if order == AFFINE else 0.05)
+    assert errors[QUADRATIC] < errors[AFFINE]/2
+
+    # The old Beta form gives the same positions, and comes back out of the
+    # coefficients, and an affine calibration is converted directly.
+    beta = (176/4095, 0.001, -0.002, 100/4095, -88, -50)
+    coef = from_beta(beta)
+    pos = evaluate(coef, 1000, 3000)
+    assert abs(pos[0] - (beta[0]*1000 + beta[1]*3000 + beta[4])) < 1e-3
+    assert abs(pos[1] - (beta[2]*1000 + beta[3]*3000 + beta[5])) < 1e-3
+    assert max(abs(a - b) for a, b in zip(to_beta(coef), beta)) < 1e-5
+    Map = make_map(coef)
+    assert type(Map) is AffineMap
+    Map.convert(1000, 3000, 50, -20)
+    assert abs(Map.x - pos[0]) < 1e-3 and abs(Map.y - pos[1]) < 1e-3
+    assert type(make_map(fit(adc, taps, QUADRATIC))) is PanelMap
+    print('The panel map checks passed.')
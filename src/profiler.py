@@ -0,0 +1,189 @@
+'''!
+    @file       profiler.py
+
+    @brief      Timing instrumentation for the scheduled tasks.
+
+    @details    The scheduler uses the classes in this file to record how long
+                each task runs for, how late it is released compared to its
+                period and how often it misses its deadline. All of the data
+                is kept in fixed-size arrays that are created once, so that
+                recording a run does not allocate anything on the heap. The
+                tasks also mark the phases of start up in startup, so the
+                time from reset until the sensors are giving data can be
+                printed along with the task timing.
+
+
+    @author     Jake Lesher
+    @author     Daniel Xu
+    @date       10/16/2026
+'''
+
+import array, micropython, clock
+
+## The width of one histogram bin [us].
+BIN_WIDTH = micropython.const(250)
+
+## The number of bins in each histogram. The last bin also counts every
+#  sample that is larger than the range of the histogram.
+NUM_BINS = micropython.const(48)
+
+## The largest number of start up phases that can be marked.
+MAX_PHASES = micropython.const(12)
+
+
+class Histogram:
+    '''!@brief      A histogram with a fixed number of equally sized bins.
+        @details    Samples are counted in an array that is allocated when the
+                    histogram is created. Samples below zero go in the first
+                    bin and samples past the end go in the last bin. The
+                    largest sample is kept separately so that it is exact.
+
+    '''
+    def __init__(self, bin_width=BIN_WIDTH, num_bins=NUM_BINS):
+        '''!@brief      Creates an empty histogram.
+            @param      bin_width is the width of each bin [us].
+            @param      num_bins is the number of bins.
+        '''
+        self.bin_width = bin_width
+        self.num_bins = num_bins
+        self.bins = array.array('L', num_bins*[0])
+        self.count = 0
+        self.max = 0
+
+    def add(self, value):
+        '''!@brief      Counts one sample in the histogram.
+            @param      value is the sample to count [us].
+        '''
+        idx = value//self.bin_width
+        if idx < 0:
+            idx = 0
+        elif idx >= self.num_bins:
+            idx = self.num_bins - 1
+        self.bins[idx] += 1
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, pct):
+        '''!@brief      Finds an upper bound of a percentile of the samples.
+            @param      pct is the percentile to find, from 0 to 100.
+            @return     The upper edge of the bin holding the percentile [us].
+        '''
+        if self.count == 0:
+            return 0
+        target = self.count*pct/100
+        total = 0
+        for idx in range(self.num_bins - 1):
+            total += self.bins[idx]
+            if total >= target:
+                return min((idx + 1)*self.bin_width, self.max)
+        return self.max
+
+    def mean(self):
+        '''!@brief      Estimates the mean of the samples from the bin centers.
+            @return     The estimated mean [us].
+        '''
+        if self.count == 0:
+            return 0
+        total = 0
+        for idx in range(self.num_bins):
+            total += self.bins[idx]*(idx + 0.5)
+        return min(total*self.bin_width/self.count, self.max)
+
+    def reset(self):
+        '''!@brief      Clears every bin of the histogram.
+        '''
+        for idx in range(self.num_bins):
+            self.bins[idx] = 0
+        self.count = 0
+        self.max = 0
+
+
+class TaskProfile:
+    '''!@brief      The timing statistics of one task.
+        @details    For every run of a task this records the execution time,
+                    the release jitter, which is how late the task started
+                    compared to its release time, and whether the run
+                    finished after the next release, which counts as a missed
+                    deadline.
+
+    '''
+    def __init__(self, period):
+        '''!@brief      Creates empty statistics for a task.
+            @param      period is the period of the task [us].
+        '''
+        self.period = period
+        self.run_time = Histogram()
+        self.jitter = Histogram()
+        self.missed = 0
+
+    def record(self, jitter, run_time):
+        '''!@brief      Records the timing of one run of the task.
+            @param      jitter is how late the run started [us].
+            @param      run_time is how long the run took [us].
+        '''
+        self.jitter.add(jitter)
+        self.run_time.add(run_time)
+        if jitter + run_time > self.period:
+            self.missed += 1
+
+    def reset(self):
+        '''!@brief      Clears the statistics.
+        '''
+        self.run_time.reset()
+        self.jitter.reset()
+        self.missed = 0
+
+    def __repr__(self):
+        '''!@brief      Creates a one-line summary of the statistics.
+            @return     A string with the run time and jitter statistics [us].
+        '''
+        return (f'run {self.run_time.mean():>7.0f} {self.run_time.percentile(99):>6} '
+                f'{self.run_time.max:>6}   jitter {self.jitter.mean():>7.0f} '
+                f'{self.jitter.percentile(99):>6} {self.jitter.max:>6}   '
+                f'missed {self.missed}')
+
+
+class Startup:
+    '''!@brief      The times at which the phases of start up finished.
+        @details    The times are measured from when the object was created,
+                    which for the module level startup object is when
+                    profiler.py is first imported, near the start of main.py.
+                    Tasks that start up side by side mark their phases in the
+                    order they finish, so the last mark is the time until
+                    everything was running.
+
+    '''
+    def __init__(self):
+        '''!@brief      Creates an empty record, starting now.
+        '''
+        self.start = clock.ticks_us()
+        self.names = []
+        self.times = array.array('l', MAX_PHASES*[0])
+
+    def mark(self, name):
+        '''!@brief      Records that a phase of start up has finished.
+            @details    Marks past MAX_PHASES are ignored.
+            @param      name is the name of the phase.
+        '''
+        count = len(self.names)
+        if count < MAX_PHASES:
+            self.times[count] = clock.ticks_diff(clock.ticks_us(), self.start)
+            self.names.append(name)
+
+    def __repr__(self):
+        '''!@brief      Creates a table with one line for every phase.
+            @return     A string with the time of each phase since start up
+                        and since the phase before [us].
+        '''
+        lines = []
+        last = 0
+        for idx in range(len(self.names)):
+            lines.append(f'{self.names[idx]:<24}at {self.times[idx]:>9}   '
+                         f'took {self.times[idx] - last:>9}')
+            last = self.times[idx]
+        return '\n'.join(lines)
+
+
+## The start up phases marked by the tasks.
+startup = Startup()
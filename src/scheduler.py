@@ -0,0 +1,325 @@
+'''!
+    @file       scheduler.py
+
+    @brief      A deadline-driven cooperative scheduler for the generator tasks.
+
+    @details    Each task is a generator that performs one period's worth of
+                work every time it is resumed and then yields. The scheduler
+                keeps the tasks in a heap ordered by their next release time,
+                so only the task that is actually due gets resumed. When
+                several tasks are due at once, the one with the highest
+                priority runs first. Tasks of the same priority run in the
+                order of the data flowing between them: every task declares
+                the shares it reads and writes, and a task that writes a share
+                runs before the tasks that read it. Between releases the core
+                is left idle through clock.idle() instead of spinning on
+                ticks_us(), which puts it to sleep with pyb.wfi() on the board.
+                Drivers can also hand the scheduler background jobs, such as
+                an I2C transfer, which it runs in that idle time just before
+                the next release instead of inside a task. A job that the
+                tasks leave no idle time for is run anyway once it is
+                overdue. A task or a job can ask for the releases of all the
+                tasks to be moved with request_shift(), which lets it lock
+                the frames on to a sensor with its own clock. The move is
+                made between frames, once no released task is still waiting
+                to run, so it never changes the release of a task that is
+                already waiting.
+
+
+    @author     Jake Lesher
+    @author     Daniel Xu
+    @date       10/16/2026
+'''
+
+import heapq, clock, profiler
+
+
+class Task:
+    '''!@brief      A periodic task that can be run by the Scheduler.
+        @details    Objects of this class wrap one of the generator task
+                    functions together with its name, priority and period.
+                    Task objects compare by their next release time, so they
+                    can be stored directly in a heap. The comparison uses
+                    ticks_diff() so that it survives the wrap-around of
+                    ticks_us().
+
+    '''
+    def __init__(self, run_fun, name, priority, period, profile=False,
+                 reads=(), writes=()):
+        '''!@brief      Creates a task for the scheduler.
+            @param      run_fun is the generator object that runs the task.
+            @param      name is the name of the task, used when printing.
+            @param      priority is the priority of the task. Tasks with a
+                        larger number run first when several are due.
+            @param      period is the time between releases of the task [us].
+            @param      profile is a boolean that turns on the recording of
+                        run time, jitter and missed deadlines for the task.
+            @param      reads is a tuple of the shares the task reads.
+            @param      writes is a tuple of the shares the task writes.
+        '''
+        self.run_fun = run_fun
+        self.name = name
+        self.priority = priority
+        self.period = period
+        self.reads = reads
+        self.writes = writes
+        self.rank = 0
+        self.next_release = clock.ticks_us()
+        self.runs = 0
+        self.skipped = 0
+        if profile:
+            self.profile = profiler.TaskProfile(period)
+        else:
+            self.profile = None
+
+    def feeds(self, other):
+        '''!@brief      Checks if this task writes a share the other task reads.
+            @param      other is the task that may consume the data.
+            @return     True if the other task reads a share this task writes.
+        '''
+        if other is self:
+            return False
+        for share in self.writes:
+            if share in other.reads:
+                return True
+        return False
+
+    def runs_before(self, other):
+        '''!@brief      Checks if this task runs first when both are ready.
+            @details    Tasks with a higher priority run first. Within the same
+                        priority the task with the lower data flow rank runs
+                        first.
+            @param      other is the task being compared with.
+            @return     True if this task should run before the other one.
+        '''
+        if self.priority != other.priority:
+            return self.priority > other.priority
+        return self.rank < other.rank
+
+    def __lt__(self, other):
+        '''!@brief      Orders tasks by release time for the scheduler heap.
+            @param      other is the task being compared with.
+            @return     True if this task is released before the other one.
+        '''
+        return clock.ticks_diff(self.next_release, other.next_release) < 0
+
+    def run(self, now):
+        '''!@brief      Runs the task once and sets its next release time.
+            @details    If the task ran so late that one or more releases have
+                        already passed, those releases are skipped rather than
+                        run back-to-back, and counted in skipped.
+            @param      now is the time the task was picked to run [us].
+        '''
+        if self.profile is None:
+            next(self.run_fun)
+        else:
+            start_time = clock.ticks_us()
+            next(self.run_fun)
+            self.profile.record(clock.ticks_diff(start_time, self.next_release),
+                                clock.ticks_diff(clock.ticks_us(), start_time))
+        self.runs += 1
+        self.next_release = clock.ticks_add(self.next_release, self.period)
+        while clock.ticks_diff(now, self.next_release) >= 0:
+            self.next_release = clock.ticks_add(self.next_release, self.period)
+            self.skipped += 1
+
+    def __repr__(self):
+        '''!@brief      Creates a one-line summary of the task.
+            @details    If the task is profiled, a second line is added with
+                        its timing statistics.
+            @return     A string with the name, priority, period and counters.
+        '''
+        text = (f'{self.name:<16}pri {self.priority:<3}rank {self.rank:<3}'
+                f'period {self.period:<8}runs {self.runs:<10}skipped {self.skipped}')
+        if self.profile is not None:
+            text += f'\n    {self.profile}'
+        return text
+
+
+class Scheduler:
+    '''!@brief      A priority and deadline based cooperative scheduler.
+        @details    Tasks that are waiting for their release time are kept in
+                    a heap keyed on their next release. Once released, a task
+                    moves to a ready list that is kept sorted by priority and
+                    data flow rank, and the first task in that order is run
+                    next. The ranks come from a topological sort of the
+                    producer and consumer relations between the tasks, so a
+                    frame carries data from the sensors through the controller
+                    to the actuators.
+
+    '''
+    def __init__(self):
+        '''!@brief      Creates an empty scheduler.
+        '''
+        self._heap = []
+        self._ready = []
+        self._epoch = None
+        self._background = []
+        # The move of the releases asked for by the tasks that has not been
+        # made yet [us].
+        self._shift = 0
+        self.tasks = []
+
+    def append(self, task):
+        '''!@brief      Adds a task to the scheduler.
+            @details    Every task is first released at the time the first
+                        task was added, so tasks with the same period are
+                        released together and run in order of priority.
+            @param      task is the Task object to add.
+        '''
+        if self._epoch is None:
+            self._epoch = clock.ticks_us()
+        task.next_release = self._epoch
+        self.tasks.append(task)
+        heapq.heappush(self._heap, task)
+        self._rank_tasks()
+
+    def add_background(self, job):
+        '''!@brief      Adds a background job to run while no task is due.
+            @details    A job is any object with a pending attribute, which is
+                        True while it has work to do, a lead attribute, which
+                        is how long before the next release it should start
+                        [us], a started attribute, the ticks_us() time its
+                        work became pending, an overdue attribute [us], and a
+                        service() method that does the work. A pending job is
+                        run once the next release is lead microseconds away,
+                        so its result is fresh when the tasks run, and it
+                        does not delay a task that is due. If the tasks are
+                        so busy that the job has been pending for overdue
+                        microseconds, it is run before the next task instead,
+                        so its data never goes stale for more than that.
+            @param      job is the background job to add.
+        '''
+        self._background.append(job)
+
+    def shift(self, us):
+        '''!@brief      Moves the next release of every task by the same time.
+            @details    Tasks keep their order in the heap, since they all move
+                        together, and tasks with the same period stay released
+                        together. Tasks that have already been released and
+                        are waiting to run are left alone, so it should only
+                        be called between frames. Tasks and jobs use
+                        request_shift() instead.
+            @param      us is the time to move the releases by [us]. A negative
+                        time moves them earlier.
+        '''
+        if us == 0:
+            return
+        for task in self.tasks:
+            if task in self._ready:
+                continue
+            task.next_release = clock.ticks_add(task.next_release, us)
+        if self._epoch is not None:
+            self._epoch = clock.ticks_add(self._epoch, us)
+
+    def request_shift(self, us):
+        '''!@brief      Asks for the next release of every task to be moved.
+            @details    The moves asked for are added up, and made with
+                        shift() by run_once() once no released task is
+                        waiting to run.
+            @param      us is the time to move the releases by [us].
+        '''
+        self._shift += us
+
+    def _rank_tasks(self):
+        '''!@brief      Ranks the tasks in the order that data flows through them.
+            @details    This is a topological sort of the graph in which each
+                        task points at the tasks that read the shares it
+                        writes. Whenever several tasks are free to go next,
+                        the one with the highest priority is taken, and then
+                        the one that was added first. If the shares form a
+                        cycle, the same rule picks a task to break it, and that
+                        task sees the data from the rest of the cycle one frame
+                        late.
+        '''
+        remaining = list(self.tasks)
+        rank = 0
+        while remaining:
+            best = None
+            for task in remaining:
+                waiting = False
+                for other in remaining:
+                    if other.feeds(task):
+                        waiting = True
+                        break
+                if not waiting and (best is None or task.priority > best.priority):
+                    best = task
+            if best is None:
+                best = remaining[0]
+                for task in remaining:
+                    if task.priority > best.priority:
+                        best = task
+            best.rank = rank
+            rank += 1
+            remaining.remove(best)
+
+    def _make_ready(self, task):
+        '''!@brief      Inserts a released task into the ready list.
+            @details    The ready list is kept sorted so that pop() returns the
+                        task that should run first.
+            @param      task is the Task object that has been released.
+        '''
+        ready = self._ready
+        idx = 0
+        while idx < len(ready) and task.runs_before(ready[idx]):
+            idx += 1
+        ready.insert(idx, task)
+
+    def run_once(self):
+        '''!@brief      Runs the highest priority task that is due, if any.
+            @details    The moves asked for with request_shift() are made
+                        first if no task is waiting. A background job that is
+                        overdue is run next. If no task is due, a pending
+                        background job is run if the next release is close
+                        enough, and otherwise the clock is told how long it is
+                        until the next release or background job so it can
+                        idle until then.
+            @return     The task that was run, or None if nothing was due.
+        '''
+        if self._shift and not self._ready:
+            self.shift(self._shift)
+            self._shift = 0
+        now = clock.ticks_us()
+        for job in self._background:
+            if job.pending and clock.ticks_diff(now, job.started) >= job.overdue:
+                job.service()
+                now = clock.ticks_us()
+        heap = self._heap
+        while heap and clock.ticks_diff(now, heap[0].next_release) >= 0:
+            self._make_ready(heapq.heappop(heap))
+
+        if self._ready:
+            task = self._ready.pop()
+            task.run(now)
+            heapq.heappush(heap, task)
+            return task
+
+        if heap:
+            wait = clock.ticks_diff(heap[0].next_release, now)
+            lead = 0
+            for job in self._background:
+                if job.pending:
+                    if wait <= job.lead:
+                        job.service()
+                        return None
+                    if job.lead > lead:
+                        lead = job.lead
+            clock.idle(wait - lead)
+        return None
+
+    def run(self):
+        '''!@brief      Runs the tasks forever.
+        '''
+        while True:
+            self.run_once()
+
+    def __repr__(self):
+        '''!@brief      Creates a table with one line for every task.
+            @return     A string containing the task table.
+        '''
+        return '\n'.join(repr(task) for task in self.tasks)
+
+
+## The scheduler that main.py adds the tasks to. It is a module level object
+#  so that other tasks, such as taskUser, are able to inspect it.
+task_list = Scheduler()
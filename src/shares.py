@@ -4,6 +4,17 @@
                 multiple tasks.
 '''
 
+import array, micropython, clock
+
+## Overflow policy: a full queue throws away its oldest item to make room.
+DROP_OLDEST = micropython.const(0)
+
+## Overflow policy: a full queue throws away the item being added.
+DROP_NEWEST = micropython.const(1)
+
+## Overflow policy: adding to a full queue raises an OverflowError.
+OVERFLOW_ERROR = micropython.const(2)
+
 class Share:
     '''!@brief      A standard shared variable.
         @details    Values can be accessed with read() or changed with write()
@@ -27,31 +38,293 @@ class Share:
         '''
         return self._buffer
 
+class StampedShare(Share):
+    '''!@brief      A shared variable that records when it was written.
+        @details    Every write() stores the value together with a sequence
+                    number, which goes up by one on each write, and a
+                    timestamp of when the value was acquired. A consumer can
+                    keep the sequence number of the last value it used and
+                    call read_if_newer() to skip work when nothing new has
+                    been written, and can use age() or the timestamp to
+                    account for how old the value is.
+    '''
+    def __init__(self, initial_value=None):
+        '''!@brief      Constructs a timestamped shared variable
+            @param      initial_value An optional initial value for the 
+                                      shared variable.
+        '''
+        super().__init__(initial_value)
+        ## The number of times the share has been written.
+        self.seq = 0
+        ## The ticks_us() time at which the value was acquired.
+        self.stamp = clock.ticks_us()
+    
+    def write(self, item, stamp=None):
+        '''!@brief      Updates the value of the shared variable
+            @param item The new value for the shared variable
+            @param stamp The ticks_us() time at which the value was acquired,
+                         or None to use the current time.
+        '''
+        self._buffer = item
+        self.stamp = clock.ticks_us() if stamp is None else stamp
+        self.seq += 1
+    
+    def read_if_newer(self, seq):
+        '''!@brief      Access the value only if it has been written since.
+            @param seq  The sequence number of the last value the caller used.
+            @return     The value of the shared variable, or None if it has
+                        not been written since seq.
+        '''
+        if self.seq == seq:
+            return None
+        return self._buffer
+    
+    def age(self):
+        '''!@brief      Find how long ago the value was acquired.
+            @return     The age of the value [us].
+        '''
+        return clock.ticks_diff(clock.ticks_us(), self.stamp)
+
+class RecordShare(StampedShare):
+    '''!@brief      A timestamped share of a record with several named fields.
+        @details    The fields are kept in an array.array of floats that is
+                    allocated when the share is created. Producers change the
+                    fields in place with set() or by index and then call
+                    commit(), or copy a whole record in with write(), so that
+                    publishing a new sample does not allocate a tuple.
+                    
+                    read() returns the array itself rather than a copy. Its
+                    values change the next time the producer runs, so a
+                    consumer that needs to keep a record should copy it with
+                    read_into().
+    '''
+    def __init__(self, fields):
+        '''!@brief          Constructs a record share with every field zero
+            @param fields   A tuple of the names of the fields, in order.
+        '''
+        super().__init__(array.array('f', len(fields)*[0]))
+        self.fields = fields
+        self._index = {}
+        for idx in range(len(fields)):
+            self._index[fields[idx]] = idx
+    
+    def index(self, name):
+        '''!@brief      Find the position of a field in the record.
+            @param name The name of the field.
+            @return     The index of the field, for use with [] access.
+        '''
+        return self._index[name]
+    
+    def set(self, name, value):
+        '''!@brief      Updates one field of the record in place.
+            @details    Call commit() once all of the fields of a new sample
+                        have been set.
+            @param name The name of the field.
+            @param value The new value of the field.
+        '''
+        self._buffer[self._index[name]] = value
+    
+    def get(self, name):
+        '''!@brief      Access one field of the record.
+            @param name The name of the field.
+            @return     The value of the field.
+        '''
+        return self._buffer[self._index[name]]
+    
+    def __setitem__(self, idx, value):
+        '''!@brief      Updates the field at an index in place.
+            @param idx  The index of the field.
+            @param value The new value of the field.
+        '''
+        self._buffer[idx] = value
+    
+    def __getitem__(self, idx):
+        '''!@brief      Access the field at an index.
+            @param idx  The index of the field.
+            @return     The value of the field.
+        '''
+        return self._buffer[idx]
+    
+    def commit(self, stamp=None):
+        '''!@brief      Publishes the fields that were set as a new sample.
+            @param stamp The ticks_us() time at which the sample was acquired,
+                         or None to use the current time.
+        '''
+        self.stamp = clock.ticks_us() if stamp is None else stamp
+        self.seq += 1
+    
+    def write(self, item, stamp=None):
+        '''!@brief      Copies a whole record into the share as a new sample.
+            @param item A tuple or array with a value for every field.
+            @param stamp The ticks_us() time at which the sample was acquired,
+                         or None to use the current time.
+        '''
+        buf = self._buffer
+        for idx in range(len(buf)):
+            buf[idx] = item[idx]
+        self.commit(stamp)
+    
+    def read_into(self, buf):
+        '''!@brief      Copies the record into a buffer owned by the caller.
+            @param buf  A preallocated array or list at least as long as the
+                        record.
+            @return     The buffer that was passed in.
+        '''
+        data = self._buffer
+        for idx in range(len(data)):
+            buf[idx] = data[idx]
+        return buf
+
 class Queue:
     '''!@brief      A queue of shared data.
         @details    Values can be accessed with placed into queue with put() or
                     removed from the queue with get(). Check if there are
                     items in the queue with num_in() before using get().
+                    
+                    The queue is a ring buffer that is allocated when the
+                    queue is created, so put() and get() take the same time
+                    however full the queue is and never allocate memory. By
+                    default the buffer is a list, which holds any objects, as
+                    the queue always has. Given a type code it is an
+                    array.array instead, which holds numbers without making
+                    an object for each one. What happens when put() is called
+                    on a full queue is set by the overflow policy:
+                    OVERFLOW_ERROR, the default, raises an OverflowError, so
+                    a queue that is too small for its use is found rather
+                    than losing items, DROP_NEWEST throws away the new item
+                    and DROP_OLDEST throws away the oldest item to make room.
+                    The items thrown away are counted in dropped.
+                    
+                    With DROP_NEWEST or OVERFLOW_ERROR, one producer and one
+                    consumer may use the queue at the same time without
+                    disabling interrupts, because put() only moves the write
+                    index and get() only moves the read index. DROP_OLDEST
+                    makes put() move the read index too, so it is only safe
+                    when the producer and the consumer cannot interrupt each
+                    other.
     '''
-    def __init__(self):
+    def __init__(self, type_code=None, size=64, overflow=OVERFLOW_ERROR):
         '''!@brief              Constructs an empty queue of shared values
+            @param type_code    The array.array type code of the items, such
+                                as 'f' for floats or 'h' for 16-bit integers,
+                                or None for a queue of any objects.
+            @param size         The number of items the queue can hold.
+            @param overflow     What put() does when the queue is full:
+                                OVERFLOW_ERROR, DROP_NEWEST or DROP_OLDEST.
         '''
-        self._buffer = []
+        # One slot is always left empty so that a full queue can be told
+        # apart from an empty one without a separate count.
+        self._slots = size + 1
+        if type_code is None:
+            self._buffer = self._slots*[None]
+        else:
+            self._buffer = array.array(type_code, self._slots*[0])
+        self._rd = 0
+        self._wr = 0
+        self._overflow = overflow
+        self.dropped = 0
     
     def put(self, item):
         '''!@brief      Adds an item to the end of the queue.
             @param item The new item to append to the queue.
+            @return     True if the item was added, or False if the queue was
+                        full and it was dropped.
         '''
-        self._buffer.append(item)
+        wr = self._wr + 1
+        if wr == self._slots:
+            wr = 0
+        if wr == self._rd:
+            if self._overflow == DROP_NEWEST:
+                self.dropped += 1
+                return False
+            elif self._overflow == OVERFLOW_ERROR:
+                raise OverflowError("Queue is full")
+            rd = self._rd + 1
+            self._rd = 0 if rd == self._slots else rd
+            self.dropped += 1
+        self._buffer[self._wr] = item
+        self._wr = wr
+        return True
+    
+    def put_many(self, items):
+        '''!@brief       Adds several items to the end of the queue in order.
+            @param items The items to add, such as an array or a list.
+            @return      The number of items that were added.
+        '''
+        count = 0
+        for item in items:
+            if self.put(item):
+                count += 1
+        return count
         
     def get(self):
         '''!@brief      Remove the first item from the front of the queue
             @return     The value of the item removed
         '''
-        return self._buffer.pop(0)
+        rd = self._rd
+        if rd == self._wr:
+            raise IndexError("Queue is empty")
+        item = self._buffer[rd]
+        rd += 1
+        self._rd = 0 if rd == self._slots else rd
+        return item
+    
+    def get_into(self, buf):
+        '''!@brief      Removes items from the front of the queue into a buffer.
+            @details    Items are copied into buf from its start until either
+                        buf is full or the queue is empty.
+            @param buf  A preallocated array or list to copy the items into.
+            @return     The number of items copied.
+        '''
+        count = 0
+        size = len(buf)
+        rd = self._rd
+        wr = self._wr
+        slots = self._slots
+        data = self._buffer
+        while count < size and rd != wr:
+            buf[count] = data[rd]
+            count += 1
+            rd += 1
+            if rd == slots:
+                rd = 0
+        self._rd = rd
+        return count
     
     def num_in(self):
         '''!@brief      Find the number of items in the queue. Call before get().
             @return     The number of items in the queue
         '''
-        return len(self._buffer)
\ No newline at end of file
+        count = self._wr - self._rd
+        if count < 0:
+            count += self._slots
+        return count
+    
+    def any(self):
+        '''!@brief      Check if there are any items in the queue.
+            @return     True if the queue is not empty
+        '''
+        return self._wr != self._rd
+    
+    def space(self):
+        '''!@brief      Find the number of items that can be added before the
+                        queue is full.
+            @details    A producer that adds several items at a time can check
+                        this first, so that it never adds only some of them.
+            @return     The number of free slots in the queue
+        '''
+        return self._slots - 1 - self.num_in()
+    
+    def full(self):
+        '''!@brief      Check if the queue is full.
+            @return     True if put() would have to drop or refuse an item
+        '''
+        wr = self._wr + 1
+        if wr == self._slots:
+            wr = 0
+        return wr == self._rd
+    
+    def clear(self):
+        '''!@brief      Empty the queue.
+        '''
+        self._rd = self._wr
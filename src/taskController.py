@@ -12,9 +12,8 @@
     @date       02/23/2022
 '''
 
-from time import ticks_us, ticks_add, ticks_diff
 import pyb  
-import micropython, motor, shares, ClosedLoop
+import micropython, motor, shares, ClosedLoop, fixedpoint, clock, array
 
 # Defining states
 
@@ -27,8 +26,13 @@ S2_ACTIVE = micropython.const(2)
 # State where platform balances without a ball.
 S3_NOBALL = micropython.const(3)
 
+# The gain version recorded once the fixed no-ball gains have been loaded,
+# so the user gains are loaded again when a ball lands.
+NOBALL_GAINS = micropython.const(-1)
 
-def taskControllerFcn(taskName, period, clFlag, Velocity, Duty1,Kp,Ki,Kd,Data,Duty2, Position, Contact):
+
+def taskControllerFcn(taskName, period, clFlag, Velocity, Duty1,Kp,Ki,Kd,Data,Duty2, Position, Contact,
+                      fixed=False):
     '''!@brief      This function interacts with the ClosedLoop driver, sending 
                     a duty cycle based on the calculated error.
         @details    This function calls upon the driver to set the duty cycle
@@ -45,145 +49,166 @@ def taskControllerFcn(taskName, period, clFlag, Velocity, Duty1,Kp,Ki,Kd,Data,Du
                     for motor 1.
         @param      Kp is the share of the user-requested proportional gain.
         @param      Ki is the share of the user-requested integral gain.
+        @param      fixed is True to run the integer fixedpoint.CascadeQ in
+                    place of ClosedLoop.Cascade. The shares stay in floats,
+                    so the readings are turned into fixed point each frame
+                    and the duty cycles back into floats.
     '''
     
     # State 0 is used only for initialization, so it will not exist within 
     # the while loop.
     state = S0_INIT
 
-    start_time = ticks_us()
-    next_time = ticks_add(start_time, period)
-    prev_time = start_time
-    ClosedLoopControl_1 = ClosedLoop.ClosedLoop()
-    ClosedLoopControl_2 = ClosedLoop.ClosedLoop()
+    prev_time = clock.ticks_us()
+    # Both axes of the cascaded controller are updated by one call, and the
+    # ball position and velocity are kept in arrays that are made only once.
+    if fixed:
+        Control = fixedpoint.CascadeQ()
+        code = 'l'
+    else:
+        Control = ClosedLoop.Cascade()
+        code = 'f'
     state = S1_SET
-    Position.write((0,0))
-    prev_x_pos = Position.read()[0]
-    prev_y_pos = Position.read()[1]
+    Position.write((0, 0, 0, 0))
+    ball_pos = array.array(code, [0, 0])
+    ball_vel = array.array(code, [0, 0])
+    # The platform angles and angular velocities in fixed point.
+    eul_ang_q = array.array('l', [0, 0])
+    ang_vel_q = array.array('l', [0, 0])
+    pos_seq = Position.seq
     Kp.write((0.16, 11))
     Ki.write((.01, 0))
     Kd.write((0.02, 0.2))
-    prev_theta_x_ref = 0
-    prev_theta_y_ref = 0
+    # The sum of the sequence numbers of the gain shares when the gains were
+    # last loaded into the controllers. It changes whenever taskUser writes
+    # new gains.
+    gains_seq = None
     true_count = 0
     false_count = 0
+    
+    def update(eul_ang, ang_vel, mode):
+        '''!@brief      Runs the controller for one frame and shares the duty
+                        cycles.
+            @param      eul_ang is the platform angles [deg].
+            @param      ang_vel is the platform angular velocities [deg/s].
+            @param      mode is ClosedLoop.RUN_OUTER, HOLD_OUTER or LEVEL.
+        '''
+        dt_us = clock.ticks_diff(current_time, prev_time)
+        if fixed:
+            eul_ang_q[0] = fixedpoint.to_fixed(eul_ang[0])
+            eul_ang_q[1] = fixedpoint.to_fixed(eul_ang[1])
+            ang_vel_q[0] = fixedpoint.to_fixed(ang_vel[0])
+            ang_vel_q[1] = fixedpoint.to_fixed(ang_vel[1])
+            duty = Control.update_us(ball_pos, ball_vel, eul_ang_q, ang_vel_q, dt_us, mode)
+            Duty1.write(fixedpoint.to_float(duty[0]))
+            Duty2.write(fixedpoint.to_float(duty[1]))
+        else:
+            duty = Control.update(ball_pos, ball_vel, eul_ang, ang_vel, dt_us/1000000, mode)
+            Duty1.write(duty[0])
+            Duty2.write(duty[1])
  
     while True:
-        current_time = ticks_us()
-        if ticks_diff(current_time,next_time)>=0:
-            next_time = ticks_add(next_time,period)
+        current_time = clock.ticks_us()
+        
+        # Snapshot of the inputs for this frame. Each share is read once, so
+        # every decision below sees the same values.
+        cl_flag = clFlag.read()
+        contact = Contact.read()
+        
+        # Disable 
+        if state == S1_SET:
+            Duty1.write(0)
+            Duty2.write(0)
+            if cl_flag == True:
+                state = S3_NOBALL
+            if cl_flag == True and contact == True:
+                state = S2_ACTIVE
+        # Enable
+        elif state == S2_ACTIVE:
+            if contact == False:
+                false_count += 1
+            else:
+                true_count +=1
+            #print("Controller State 2: Active")
+            ang_vel = Velocity.read() # In units of degrees/s.
+            eul_ang = Data.read() # In units of degrees.
             
-            # Disable 
-            if state == S1_SET:
-                Duty1.write(0)
-                Duty2.write(0)
-                if clFlag.read() == True:
-                    state = S3_NOBALL
-                if clFlag.read() == True and Contact.read() == True:
-                    state = S2_ACTIVE
-                
-                else: 
-                    yield None
-            # Enable
-            elif state == S2_ACTIVE:
-                if Contact.read() == False:
-                    false_count += 1
-                if Contact.read() == True:
-                    true_count +=1
-                #print("Controller State 2: Active")
-                ang_vel = Velocity.read() # In units of degrees/s.
-                eul_ang = Data.read() # In units of degrees.
-                
-                ClosedLoopControl_1.set_gain_outer(Kp.read()[0], Ki.read()[0], Kd.read()[0])
-                ClosedLoopControl_2.set_gain_outer(-1*Kp.read()[0], -1*Ki.read()[0], -1*Kd.read()[0])
-                
-                ClosedLoopControl_1.set_gain_inner(Kp.read()[1], Ki.read()[1], Kd.read()[1])
-                ClosedLoopControl_2.set_gain_inner(Kp.read()[1], Ki.read()[1], Kd.read()[1])
-                
-                dt = ticks_diff(current_time, prev_time)/1000000
-                
-                x_ref = 0
-                y_ref = 0
-                
-                x_pos = Position.read()[0]
-                y_pos = Position.read()[1]
-                
-                    
-                
-                v_x = (x_pos - prev_x_pos)/dt
-                v_y = (y_pos - prev_y_pos)/dt
+            # Only load the gains when taskUser has changed them.
+            seq = Kp.seq + Ki.seq + Kd.seq
+            if seq != gains_seq:
+                kp = Kp.read()
+                ki = Ki.read()
+                kd = Kd.read()
+                Control.set_gain_outer(kp[0], ki[0], kd[0])
+                Control.set_gain_inner(kp[1], ki[1], kd[1])
+                gains_seq = seq
+            
+            # The ball position and velocity are estimated together by the
+            # touch panel filter, so they are only copied when it has
+            # published a new estimate.
+            pos = Position.read_if_newer(pos_seq)
+            if pos is not None:
+                if fixed:
+                    ball_pos[0] = fixedpoint.to_fixed(pos[0])
+                    ball_pos[1] = fixedpoint.to_fixed(pos[1])
+                    ball_vel[0] = fixedpoint.to_fixed(pos[2])
+                    ball_vel[1] = fixedpoint.to_fixed(pos[3])
+                else:
+                    ball_pos[0] = pos[0]
+                    ball_pos[1] = pos[1]
+                    ball_vel[0] = pos[2]
+                    ball_vel[1] = pos[3]
+                pos_seq = Position.seq
+            
+            # The outer loop runs while the ball is on the platform. If it
+            # comes off for a moment the last platform angles are held, and
+            # if it has mostly been off the platform is held level.
+            if false_count > true_count:
+                mode = ClosedLoop.LEVEL
+            elif contact == False:
+                mode = ClosedLoop.HOLD_OUTER
+            else:
+                mode = ClosedLoop.RUN_OUTER
+            count_diff = abs(false_count - true_count)
+            if count_diff >= 10:
                 
-                if true_count >= false_count:
-                # Outer Loop
-
-                    if Contact.read() == False:
-                        theta_x_ref = prev_theta_x_ref
-                        theta_y_ref = prev_theta_y_ref
-                        
-                    else:
-                        theta_x_ref = ClosedLoopControl_2.update_outer(y_pos, dt, v_y, y_ref, Contact.read())
-                        theta_y_ref = ClosedLoopControl_1.update_outer(x_pos, dt, v_x, x_ref, Contact.read())
-                    prev_theta_x_ref = theta_x_ref
-                    prev_theta_y_ref = theta_y_ref
-
-                    
                 if false_count > true_count:
+                    false_count = 3
+                    true_count = 0
+                elif true_count > false_count:
+                    true_count = 3
+                    false_count = 0
                     
-                    theta_x_ref = 0
-                    theta_y_ref = 0
-                count_diff = abs(false_count - true_count)
-                if count_diff >= 10:
-                    
-                    if false_count > true_count:
-                        false_count = 3
-                        true_count = 0
-                    elif true_count > false_count:
-                        true_count = 3
-                        false_count = 0
-                        
 
-                        
-                
-                #Inner Loop
-                Duty2.write(ClosedLoopControl_2.update_inner(eul_ang[0], dt, ang_vel[0], theta_x_ref))
-                Duty1.write(ClosedLoopControl_1.update_inner(eul_ang[1], dt, ang_vel[1], theta_y_ref))
-                
-                #print(Duty1.read(), Duty2.read(), theta_x_ref, theta_y_ref, Contact.read())
-                
-                prev_x_pos = x_pos
-                prev_y_pos = y_pos
-                # if Contact.read() == False:
-                #     clFlag.write(False)
                     
-                if clFlag.read() == False:
-                    state = S1_SET
-                else:
-                    yield None
             
-            elif state == S3_NOBALL:
-               # print("Controller State 3: No Ball")
-                ang_vel = Velocity.read() # In units of degrees/s.
-                eul_ang = Data.read() # In units of degrees.
-                
-                ClosedLoopControl_1.set_gain_inner(4, 2, 0.2)
-                ClosedLoopControl_2.set_gain_inner(4, 2, 0.2)
-                
-                dt = ticks_diff(current_time, prev_time)/1000000
-                
-                theta_x_ref = 0
-                theta_y_ref = 0
-                
-                Duty2.write(ClosedLoopControl_2.update_inner(eul_ang[0], dt, ang_vel[0], theta_x_ref)) 
-                Duty1.write(ClosedLoopControl_1.update_inner(eul_ang[1], dt, ang_vel[1], theta_y_ref))
-                
-                if Contact.read() == True:
-                    state = S2_ACTIVE
-                if clFlag.read() == False:
-                    state = S1_SET
-                    
-            prev_time = current_time
-                
-
+            # Outer and inner loops of both axes
+            update(eul_ang, ang_vel, mode)
             
-        else:
-            yield None
\ No newline at end of file
+            #print(Duty1.read(), Duty2.read(), theta_x_ref, theta_y_ref, Contact.read())
+            
+            # if Contact.read() == False:
+            #     clFlag.write(False)
+                
+            if cl_flag == False:
+                state = S1_SET
+        
+        elif state == S3_NOBALL:
+           # print("Controller State 3: No Ball")
+            ang_vel = Velocity.read() # In units of degrees/s.
+            eul_ang = Data.read() # In units of degrees.
+            
+            if gains_seq != NOBALL_GAINS:
+                Control.set_gain_inner(4, 2, 0.2)
+                gains_seq = NOBALL_GAINS
+            
+            update(eul_ang, ang_vel, ClosedLoop.LEVEL)
+            
+            if contact == True:
+                state = S2_ACTIVE
+            if cl_flag == False:
+                state = S1_SET
+                
+        prev_time = current_time
+        
+        yield state
\ No newline at end of file
@@ -15,11 +15,11 @@
     @date       02/16/2022
 '''
 
-from time import ticks_us, ticks_add, ticks_diff
 from pyb import I2C
-import BNO055, shares, os
+import BNO055, shares, array, clock, scheduler, attitude, calstore, profiler
 
-def taskIMUFcn(taskName, period, Data, Velocity):
+def taskIMUFcn(taskName, period, Data, Velocity, background=False, phase_lock=False,
+               mode=BNO055.NDOF, fuse=False, addr=BNO055.ADDR, task_list=None):
     '''!@brief      This function interacts with the driver to update the 
                     position.
         @details    This function calls upon the driver the update the position 
@@ -37,6 +37,35 @@ def taskIMUFcn(taskName, period, Data, Velocity):
         @param      Data is the share of positional data in [rad].
         @param      Delta is the share of change in position data in [rad].
         @param      Velocity is the share of velocity data in [rad/s].
+        @param      background is True to read the IMU as a background job of
+                    task_list, in the idle time before each frame,
+                    or False to read it inside the task, which blocks the
+                    other tasks for the length of the transfer. The transfer
+                    blocks either way, and in the background it waits for
+                    idle time, up to one period, so the data can be older.
+                    It is off by default.
+        @param      phase_lock is True to move the frames of task_list so the
+                    IMU is read just after it puts out each new sample. The
+                    moves are handed to task_list.request_shift(), which
+                    makes them between frames. This moves every task, not
+                    only this one, so it changes the timing of the whole
+                    frame. It has only been measured on the host emulator
+                    (see benchmark.imu_cadence()), so it is off by default
+                    until it has been measured on the board. The shares are
+                    only written when the reading holds a new sample either
+                    way, so their seq tells the other tasks when the data is
+                    new.
+        @param      mode is the BNO055 operating mode: BNO055.NDOF,
+                    BNO055.IMU or BNO055.GYRO.
+        @param      fuse is True to share the angles estimated by an
+                    attitude.Complementary filter from the angular velocity
+                    and the fused Euler angles, instead of the fused Euler
+                    angles themselves. In gyroscope only mode the angles
+                    are always estimated, since the sensor gives none.
+        @param      addr is the I2C address of the IMU, or None to scan the
+                    bus for it.
+        @param      task_list is the scheduler.Scheduler that runs the task,
+                    or None for scheduler.task_list.
 
     '''
     
@@ -44,84 +73,127 @@ def taskIMUFcn(taskName, period, Data, Velocity):
     # the while loop.
     state = 0
     i2c = I2C(1, I2C.CONTROLLER)
-    IMU = BNO055.BNO055(i2c)
-
-    start_time = ticks_us()
-    next_time = ticks_add(start_time, period)
-    IMU.mode(1)
+    IMU = BNO055.BNO055(i2c, addr)
+    profiler.startup.mark('IMU found')
+    
+    # The calibration is loaded from the file once, here, rather than on
+    # every pass through state 0.
+    store = calstore.store
+    store.load()
     
-    isready = False
-    filename = "IMU_cal_coeffs.txt"
+    # The raw gyroscope and Euler angle registers, read in one transfer.
+    raw = array.array('h', [0, 0, 0, 0, 0, 0])
+    
+    # The filter for the angles about x and y, the reference angles and
+    # angular velocities passed to it, and the time of the last reading.
+    if mode == BNO055.GYRO:
+        fuse = True
+        Filter = attitude.Complementary(attitude.LEVEL_TAU)
+    else:
+        Filter = attitude.Complementary(attitude.FUSION_TAU)
+    ref = array.array('f', [0, 0])
+    rate = array.array('f', [0, 0])
+    last_stamp = None
+    
+    def publish(raw, stamp):
+        '''!@brief      Shares one reading of the IMU.
+            @details    The fields of the shares are updated in place, so no
+                        new tuples are made every reading. A reading of the
+                        same sample as last time is not shared, but is still
+                        used to line the frames up with the sensor. The
+                        angle about x pairs with the angular velocity about
+                        x, and the same for y, as the controller uses them.
+            @param      raw is the array of raw register values.
+            @param      stamp is the ticks_us() time of the reading.
+        '''
+        nonlocal last_stamp
+        if phase_lock:
+            task_list.request_shift(IMU.correction)
+        if not IMU.new:
+            return
+        
+        # Finding angular velocity and sharing.
+        rate[0] = raw[1]/16
+        rate[1] = raw[0]/-16
+        Velocity.set('x', rate[0])
+        Velocity.set('y', rate[1])
+        Velocity.set('z', raw[2]/16)
+        Velocity.commit(stamp)
+        
+        # Finding position and sharing.
+        if fuse:
+            if IMU.fusion:
+                ref[0] = raw[4]/-16
+                ref[1] = raw[5]/-16
+            if last_stamp is None:
+                dt = 0
+            else:
+                dt = clock.ticks_diff(stamp, last_stamp)/1_000_000
+            angle = Filter.update(ref, rate, dt)
+            Data.set('x', angle[0])
+            Data.set('y', angle[1])
+        else:
+            Data.set('x', raw[4]/-16)
+            Data.set('y', raw[5]/-16)
+        Data.set('z', raw[3]/-16)
+        Data.commit(stamp)
+        if last_stamp is None:
+            profiler.startup.mark('IMU first sample')
+        last_stamp = stamp
+    
+    if task_list is None:
+        task_list = scheduler.task_list
+    if background:
+        task_list.add_background(IMU)
     
     while True:
-        current_time = ticks_us()
-        if ticks_diff(current_time,next_time)>=0:
-            # State 0 will check calibration.
-            if state == 0:
-                if isready == True:
+        # State 0 will check calibration. Nothing is sent to the IMU while
+        # it is switching modes, and the other tasks start up meanwhile.
+        if state == 0:
+            if not IMU.ready():
+                pass
+            
+            elif store.has_imu():
+                if IMU.modenum != BNO055.CONFIG:
+                    # The profile can only be written in config mode.
+                    IMU.mode(BNO055.CONFIG)
+                else:
+                    IMU.write_coef(store.imu_profile)
+                    print("Writing IMU calibration coefficients from file to driver.")
+                    IMU.mode(mode)
                     print("IMU is calibrated.")
-                    IMU.mode(1)
+                    profiler.startup.mark('IMU calibrated')
                     state = 1
-                
-                else: # When NOT READY
-                    if filename in os.listdir():
-                        # File exists, read from it
-                        with open(filename, 'r') as f:
-                            # Read the first line of the file
-                            cal_data_string = f.readline()
-                            # Split the line into multiple strings
-                            # and then convert each one to a float
-                        cal_coeffs = cal_data_string.strip().split(',')
-                        coef_array = bytearray(22)
-                        for i in range(0, len(cal_coeffs)):
-                            cal_coeffs[i] = int(cal_coeffs[i], 16)
-                            #cal_coeffs[i] = hex(cal_coeffs[i])
-                            coef_array[i] = cal_coeffs[i]
-                        IMU.write_coef(coef_array)
-                        print("Writing IMU calibration coefficients from file to driver.")
-                        isready = True
+                    
+            else:
+                # No calibration is stored, calibrate manually in the
+                # operating mode and store the coefficients
+                if IMU.modenum == BNO055.CONFIG:
+                    IMU.mode(mode)
+                elif IMU.calibrated():
+                    store.set_imu(IMU.read_coef())
+                    print("Writing IMU calibration constants to file.")
+                else:
+                    print(f'{IMU.status()}')
                         
-                    else:
-                        # File doesnt exist, calibrate manually and 
-                        # write the coefficients to the file
-                        if IMU.status() == (3,3,3,0):
-                            cal_array = IMU.read_coef()
-                            str_list = []
-                            for cal_coef in cal_array:
-                                str_list.append(hex(cal_coef))
-                            with open(filename, 'w') as f:
-                                # Perform manual calibration
-                                # Then, write the calibration coefficients to the file
-                                # as a string. The example uses an f-string, but you can
-                                # use string.format() if you prefer
-                                f.write(','.join(str_list))
-                            print("Writing IMU calibration constants to file.")
-                            
-                        else:
-                            print(f'{IMU.status()}')
-                            
-                            
-            # Update 
-            if state == 1:
-                
-                # Finding position and sharing.
-                x, y, z = IMU.read_angle()
-                x /= -16
-                y /= -16
-                z /= -16
-                Data.write((x, y, z))
+                        
+        # Update 
+        if state == 1 and IMU.ready():
+            
+            # Reading the angular velocity and the Euler angles in one
+            # transfer. In the background the reading is shared just
+            # before the next frame, so this only starts the next one.
+            if background:
+                if not IMU.pending:
+                    IMU.start_read_all(raw, publish, period)
+            else:
+                stamp = clock.ticks_us()
+                IMU.read_all_into(raw)
+                IMU.track(raw)
+                publish(raw, stamp)
                 
-                # Finding angular velocity and sharing.
-                wx, wy, wz = IMU.read_omega()
-                wx /= 16
-                wy /= 16
-                wz /= 16
-                Velocity.write((wx, wy, wz))
-                    
 
-            next_time = ticks_add(next_time,period)
-        else:
-            yield None
+        yield None
             
                 
     
\ No newline at end of file
@@ -14,7 +14,6 @@
     @date       02/16/2022
 '''
 
-from time import ticks_us, ticks_add, ticks_diff
 import pyb  
 import micropython, motor, shares 
 
@@ -48,9 +47,6 @@ def taskMotorFcn(taskName, period, Duty1, Duty2):
     # State 0 is used only for initialization, so it will not exist within 
     # the while loop.
     state = S0_INIT
-
-    start_time = ticks_us()
-    next_time = ticks_add(start_time, period)
     
     #nFAULT = pyb.Pin(pyb.Pin.cpu.B2)
     #MotorInt = pyb.ExtInt(nFAULT, mode=pyb.ExtInt.IRQ_FALLING, 
@@ -73,20 +69,15 @@ def taskMotorFcn(taskName, period, Duty1, Duty2):
     state = S1_SET
  
     while True:
-        current_time = ticks_us()
-        if ticks_diff(current_time,next_time)>=0:
+        
+        # Set 
+        if state == S1_SET:
+            motor_1.set_duty(Duty1.read()*-1)
+            motor_2.set_duty(Duty2.read()*-1)
             
-            # Set 
-            if state == S1_SET:
-                motor_1.set_duty(Duty1.read()*-1)
-                motor_2.set_duty(Duty2.read()*-1)
-                
-            else: 
-                state = 1
-                yield state
-            next_time = ticks_add(next_time,period)
-        else:
-            yield None
+        else: 
+            state = 1
+        yield state
             
                 
     
\ No newline at end of file
@@ -13,10 +13,11 @@
     @date       02/16/2022
 '''
 
-from time import ticks_us, ticks_add, ticks_diff
-import touchpanel, os
+import touchpanel, panelmap, fixedpoint, clock, calstore, profiler
 
-def taskPanelFcn(taskName, period, Position, Contact):
+def taskPanelFcn(taskName, period, Position, Contact, contact_first=True, alternate=False,
+                 samples=1, reduce=touchpanel.MEDIAN, background=False,
+                 order=panelmap.AFFINE, fixed=False):
     '''!@brief      This function interacts with the driver to update the 
                     position.
         @details    This function calls upon the driver the update the position 
@@ -28,7 +29,37 @@ def taskPanelFcn(taskName, period, Position, Contact):
         @param      taskName is the name associated the with the taskEncoder in 
                     main. 
         @param      period is the frequency of which the taskUser is to be run.
-        @param      Position is the share of position from the touch panel [mm].
+        @param      Position is the timestamped share of the position [mm] and
+                    velocity [mm/s] of the ball, estimated from the touch
+                    panel readings, with the fields x, y, vx and vy.
+        @param      Contact is the share of whether the ball is on the panel.
+        @param      contact_first is True to check for contact before reading
+                    the position, and skip the position readings when the
+                    ball is off the panel.
+        @param      alternate is True to read only one of x and y each run,
+                    taking turns. It is meant for running the task at twice
+                    the rate, which keeps each axis read every 10 ms for about
+                    the same time per run.
+        @param      samples is the number of ADC samples in each position
+                    reading, taken in one burst.
+        @param      reduce is touchpanel.MEDIAN or touchpanel.TRIMMED_MEAN,
+                    the way a burst is made into one reading.
+        @param      background is True to scan the panel from a timer
+                    interrupt at touchpanel.SAMPLE_FREQ once it is calibrated,
+                    so the scans are evenly spaced however long the other
+                    tasks take. The task then only filters the scans queued
+                    since its last run, and shares the estimate with the time
+                    of the last one. It cannot be used with burst readings.
+        @param      order is panelmap.AFFINE or panelmap.QUADRATIC, the model
+                    fitted when the panel is calibrated here. A quadratic
+                    calibration asks for nine taps instead of five and follows
+                    a panel that bends its readings near the edges, but each
+                    reading costs more to convert. A stored calibration is
+                    used whatever its model.
+        @param      fixed is True to filter the scans with the integer
+                    fixedpoint.FilterQ in place of TouchPanel.Filter(). The
+                    estimate is turned back into floats for the calibration
+                    and the share. It cannot be used with background scans.
 
 
     '''
@@ -36,88 +67,95 @@ def taskPanelFcn(taskName, period, Position, Contact):
     # State 0 is used only for initialization, so it will not exist within 
     # the while loop.
     state = 0
-    TP = touchpanel.TouchPanel()
+    if fixed and background:
+        raise ValueError("The fixed-point filter cannot be used with background scans")
+    TP = touchpanel.TouchPanel(contact_first, alternate, samples, reduce, order,
+                               period=period)
+    if fixed:
+        FQ = fixedpoint.FilterQ(TP.axis_period)
     Calibrated = False
-
-    start_time = ticks_us()
-    next_time = ticks_add(start_time, period)
-    last_pos = (0,0)
-    Position.write((last_pos))
+    Position.write((0, 0, 0, 0))
 
     
-    isready = False
-    filename = "TP_cal_coeffs.txt"
+    first = True
+    # The calibration is loaded from the file once, here, rather than on
+    # every pass through state 0.
+    store = calstore.store
+    store.load()
     
     while True:
-        current_time = ticks_us()
-        if ticks_diff(current_time,next_time)>=0:
-            # State 0 will check calibration.
-            if state == 0:
-                if isready == True:
-                    print("Touchpanel is calibrated.")
-                    state = 1
+        # State 0 will check calibration.
+        if state == 0:
+            if store.has_panel():
+                # The panel is read in this same pass. The map of the
+                # calibration is worked out once, here.
+                Map = panelmap.make_map(store.panel_coef)
+                print("Writing touchpanel calibration coefficients from file to driver.")
+                print("Touchpanel is calibrated.")
+                profiler.startup.mark('panel calibrated')
+                # The timer only starts scanning once calibration, which
+                # scans the panel from this task, is done.
+                if background:
+                    TP.start_sampling()
+                state = 1
                 
-                else: # When NOT READY
-                    if filename in os.listdir():
-                        # File exists, read from it
-                        with open(filename, 'r') as f:
-                            # Read the first line of the file
-                            cal_data_string = f.readline()
-                            # Split the line into multiple strings
-                            # and then convert each one to a float
-                        cal_coeffs = cal_data_string.strip().split(',')
+            else:
+                # No calibration is stored, calibrate manually and 
+                # store the coefficients
+                Calibrated = TP.Calibrate()
+                if Calibrated == True:
+                    store.set_panel(TP.Fit())
+                    print("Writing touchpanel calibration constants to file.")
                         
-                        # coef_array = bytearray(22)
-                        for i in range(0, len(cal_coeffs)):
-                            cal_coeffs[i] = float(cal_coeffs[i])
-    
-                        #     coef_array[i] = cal_coeffs[i]
-                        # IMU.write_coef(coef_array)
-                        Beta = cal_coeffs
-                        print("Writing touchpanel calibration coefficients from file to driver.")
-                        isready = True
                         
-                    else:
-                        # File doesnt exist, calibrate manually and 
-                        # write the coefficients to the file
-                        Calibrated = TP.Calibrate()
-                        if Calibrated == True:
-                            Beta = TP.Beta()
-                            str_list = []
-                            for cal_coef in Beta:
-                                str_list.append(str(cal_coef))
-                            with open(filename, 'w') as f:
-                                # Perform manual calibration
-                                # Then, write the calibration coefficients to the file
-                                # as a string. The example uses an f-string, but you can
-                                # use string.format() if you prefer
-                                f.write(','.join(str_list))
-                            print("Writing touchpanel calibration constants to file.")
-                            
-                            
-                            
-            # Update 
-            if state == 1:
-                
-                # Finding position and sharing.
-                Data = TP.Read_Panel(Beta)
-                x_pos = Data[0]
-                y_pos = Data[1]
-                contact = Data[2]
-                time_span = Data[3] # For testing the speed of the touchpanel updates
-                Contact.write(contact)
-                
-                if contact == True:
-                    Position.write((x_pos, y_pos))
-                    last_pos = (x_pos, y_pos)
-                else:
-                    Position.write(last_pos)
-                
+                        
+        # Update 
+        if state == 1:
+            
+            # Finding position and velocity and sharing them together. They
+            # are stamped with the time the scan started so consumers know
+            # when they were measured. In the background the scans come from
+            # the timer, and nothing is shared until one has been queued.
+            if background:
+                Data = TP.Read_Samples(Map)
+                if Data is None:
+                    yield None
+                    continue
+                stamp = TP.sample_stamp
+            elif fixed:
+                stamp = clock.ticks_us()
+                scan = TP.Scan()
+                FQ.new_x = TP.new_x
+                FQ.new_y = TP.new_y
+                est = FQ.Filter(scan, stamp)
+                Map.convert(fixedpoint.to_float(est[0]), fixedpoint.to_float(est[1]),
+                            fixedpoint.to_float(FQ.vx_hat), fixedpoint.to_float(FQ.vy_hat))
+                Data = (round(Map.x, 1), round(Map.y, 1), scan[2], scan[3], Map.vx, Map.vy)
+            else:
+                stamp = clock.ticks_us()
+                Data = TP.Read_Panel(Map)
+            x_pos = Data[0]
+            y_pos = Data[1]
+            contact = Data[2]
+            time_span = Data[3] # For testing the speed of the touchpanel updates
+            Contact.write(contact)
+            
+            # Only readings in contact are shared, so without contact the
+            # share keeps the last estimate and the time it was made, and
+            # read_if_newer() and age() show that nothing new has come in.
+            if contact == True:
+                Position.set('x', x_pos)
+                Position.set('y', y_pos)
+                Position.set('vx', Data[4])
+                Position.set('vy', Data[5])
+                Position.commit(stamp)
+            if first:
+                profiler.startup.mark('panel first reading')
+                first = False
+            
 
 
-            next_time = ticks_add(next_time,period)
-        else:
-            yield None
+        yield None
             
 if __name__ == '__main__':
     # Adjust the following code to write a test program.
@@ -15,9 +15,8 @@
     @date       02/16/2022
 '''
 
-from time import ticks_us, ticks_diff, ticks_add, ticks_ms
 from pyb import USB_VCP
-import micropython, shares, array, gc
+import micropython, shares, array, gc, scheduler, clock, profiler
 
 # Defining the different states of taskUser.py
 # Initialization State 
@@ -60,6 +59,8 @@ S17_STEP = micropython.const(17)
 S18_DATA = micropython.const(18)
 
 S19_Inner_Outer_Gains = micropython.const(19)
+# Output Task Timing
+S20_TIMING = micropython.const(20)
 
 
 def printHelp():
@@ -79,6 +80,7 @@ def printHelp():
     print("Press S to stop data collection.")
     print("Press K to set closed-loop gain(s).")
     print("Press W to toggle closed-loop control.")
+    print("Press T to print task timing statistics.")
     print("---------------------------------------------")
 
 def InputDutyFCN(char_In, DUTY_str, dFlag):
@@ -169,646 +171,629 @@ def taskUserFcn (taskName, period, Data, Velocity, Duty1, Duty2, clFlag, Kp, Ki,
     '''
     # Pre-initialization State
     state = S0_INIT
-    start_time = ticks_us()
-    next_time = ticks_add(start_time, period)
+    start_time = clock.ticks_us()
     
     
     while True:
         
-        current_time = ticks_us()
+        current_time = clock.ticks_us()
         # position_data = Data.read()
         # delta_data = Delta.read()
         # velocity_data = Velocity.read()
         
-        if ticks_diff(current_time, next_time) >= 0:
+        # State 0  (Initialization) 
+        if state == S0_INIT :
+            ser = USB_VCP()    
+            DUTY1 = ""
+            DUTY2 = ""
+            #omega = ""
+            Ki_str = ""
+            Kp_str = ""
+            Kd_str = ""
             
-            # Resetting the next_time so that it can apply to the next 
-            # iteration of the while loop.
-            next_time = ticks_add(next_time, period)
+            ##  @brief      This list is the collection of velocity data
+            #   @details    The velocity list is initialized as an empty list. This 
+            #               list will be constantly updated in the motor testing state. 
+            #
+            #velocity_list = []
             
-            # State 0  (Initialization) 
-            if state == S0_INIT :
-                ser = USB_VCP()    
-                DUTY1 = ""
-                DUTY2 = ""
-                #omega = ""
-                Ki_str = ""
-                Kp_str = ""
-                Kd_str = ""
-                
-                ##  @brief      This list is the collection of velocity data
-                #   @details    The velocity list is initialized as an empty list. This 
-                #               list will be constantly updated in the motor testing state. 
-                #
-                #velocity_list = []
-                
-                ##  @brief      Internal boolean to determine if data collection should 
-                #               start.
-                #   @details    In state 5, data collection for time and position starts. 
-                #               This boolean lets the taskUser know that it is time to 
-                #               start collecting data.      
-                #
-                collect_data = False
-                
-                ##  @brief      Internal boolean to determine if the 'enter' key had been 
-                #               pressed in InputDutyFCN().
-                #   @details    In order to submit the duty cycle to the duty shares, the 
-                #               program must know if the enter key has been pressed. dFlag 
-                #               is the signal that it has been pressed. 
-                #
-                dFlag = False 
-                
-                ##  @brief      Internal boolean to determine if the 'enter' key had been 
-                #               pressed in InputNumberFCN().
-                #   @details    In order to submit the omega to the Vref share, the 
-                #               program must know if the enter key has been pressed. eFlag 
-                #               is the signal that it has been pressed. 
-                #
-                eFlag = False 
-                
-                # srFlag = False
-                # gain_step = False
-                # omega_step = False
-                
-                enterKp = True
-                enterKi = False
-                enterKd = False
-                outer = False
-                
-                gc.collect() # Garbage Collection
-                
-                ##  @brief      The array, timeArray, is the collection of time where
-                #               data is being collected.
-                #   @details    The timeArray is predefined to collected 3001 data points,
-                #               associated with 0-10s. This array is filled in updated time
-                #               values when the data collection state is called.
-                #  
-                timeArray = array.array('h',1001*[0])
-                
-                ##  @brief      The array, xpositionArray, is the collection of 
-                #               x-positions when data is being collected.
-                #   @details    The xpositionArray is predefined to collected 1001 data 
-                #               points, associated with 0-10s. This array is filled in 
-                #               updated position values when the data collection state is 
-                #               called.
-                #  
-                xpositionArray = array.array('f', 1001*[0])
-                
-                ##  @brief      The array, ypositionArray, is the collection of 
-                #               y-positions when data is being collected.
-                #   @details    The ypositionArray is predefined to collected 1001 data 
-                #               points, associated with 0-10s. This array is filled in 
-                #               updated position values when the data collection state is 
-                #               called.
-                #  
-                ypositionArray = array.array('f', 1001*[0])
-                
-                ##  @brief      The array, xangleArray, is the collection of 
-                #               x-Euler angles when data is being collected.
-                #   @details    The angleArray is predefined to collected 1001 data 
-                #               points, associated with 0-10s. This array is filled in 
-                #               updated angle values when the data collection state is 
-                #               called.
-                #  
-                xangleArray = array.array('f', 1001*[0])    
-                
-                ##  @brief      The array, yangleArray, is the collection of 
-                #               y-Euler angles when data is being collected.
-                #   @details    The yangleArray is predefined to collected 1001 data 
-                #               points, associated with 0-10s. This array is filled in 
-                #               updated angle values when the data collection state is 
-                #               called.
-                #  
-                yangleArray = array.array('f', 1001*[0])   
-                
-                ##  @brief      The array, timeArray, is the collection of time where
-                #               data is being collected.
-                #   @details    The timeArray is predefined to collected 3001 data points,
-                #               associated with 0-30s. This array is filled in updated time
-                #               values when the data collection state is called.
-                #  
-                #timeArray_step = array.array('h',301*[0])
-                
-                
-                ##  @brief      The array, velocityArray, is the collection of velocity 
-                #               when data is being collected.
-                #   @details    The velocityArray is predefined to collected 3001 data 
-                #               points, associated with 0-30s. This array is filled in 
-                #               updated velocity values when the data collection state is 
-                #               called.
-                #  
-                #velocityArray_step = array.array('f', 301*[0])
-                
-                ##  @brief      The array, velocityArray, is the collection of velocity 
-                #               when data is being collected.
-                #   @details    The velocityArray is predefined to collected 3001 data 
-                #               points, associated with 0-30s. This array is filled in 
-                #               updated velocity values when the data collection state is 
-                #               called.
-                #  
-                #dutyArray_step = array.array('f', 301*[0])
+            ##  @brief      Internal boolean to determine if data collection should 
+            #               start.
+            #   @details    In state 5, data collection for time and position starts. 
+            #               This boolean lets the taskUser know that it is time to 
+            #               start collecting data.      
+            #
+            collect_data = False
+            
+            ##  @brief      Internal boolean to determine if the 'enter' key had been 
+            #               pressed in InputDutyFCN().
+            #   @details    In order to submit the duty cycle to the duty shares, the 
+            #               program must know if the enter key has been pressed. dFlag 
+            #               is the signal that it has been pressed. 
+            #
+            dFlag = False 
+            
+            ##  @brief      Internal boolean to determine if the 'enter' key had been 
+            #               pressed in InputNumberFCN().
+            #   @details    In order to submit the omega to the Vref share, the 
+            #               program must know if the enter key has been pressed. eFlag 
+            #               is the signal that it has been pressed. 
+            #
+            eFlag = False 
+            
+            # srFlag = False
+            # gain_step = False
+            # omega_step = False
+            
+            enterKp = True
+            enterKi = False
+            enterKd = False
+            outer = False
+            
+            gc.collect() # Garbage Collection
+            
+            ##  @brief      The array, timeArray, is the collection of time where
+            #               data is being collected.
+            #   @details    The timeArray is predefined to collected 3001 data points,
+            #               associated with 0-10s. This array is filled in updated time
+            #               values when the data collection state is called.
+            #  
+            timeArray = array.array('h',1001*[0])
+            
+            ##  @brief      The array, xpositionArray, is the collection of 
+            #               x-positions when data is being collected.
+            #   @details    The xpositionArray is predefined to collected 1001 data 
+            #               points, associated with 0-10s. This array is filled in 
+            #               updated position values when the data collection state is 
+            #               called.
+            #  
+            xpositionArray = array.array('f', 1001*[0])
+            
+            ##  @brief      The array, ypositionArray, is the collection of 
+            #               y-positions when data is being collected.
+            #   @details    The ypositionArray is predefined to collected 1001 data 
+            #               points, associated with 0-10s. This array is filled in 
+            #               updated position values when the data collection state is 
+            #               called.
+            #  
+            ypositionArray = array.array('f', 1001*[0])
+            
+            ##  @brief      The array, xangleArray, is the collection of 
+            #               x-Euler angles when data is being collected.
+            #   @details    The angleArray is predefined to collected 1001 data 
+            #               points, associated with 0-10s. This array is filled in 
+            #               updated angle values when the data collection state is 
+            #               called.
+            #  
+            xangleArray = array.array('f', 1001*[0])    
+            
+            ##  @brief      The array, yangleArray, is the collection of 
+            #               y-Euler angles when data is being collected.
+            #   @details    The yangleArray is predefined to collected 1001 data 
+            #               points, associated with 0-10s. This array is filled in 
+            #               updated angle values when the data collection state is 
+            #               called.
+            #  
+            yangleArray = array.array('f', 1001*[0])   
+            
+            ##  @brief      The array, timeArray, is the collection of time where
+            #               data is being collected.
+            #   @details    The timeArray is predefined to collected 3001 data points,
+            #               associated with 0-30s. This array is filled in updated time
+            #               values when the data collection state is called.
+            #  
+            #timeArray_step = array.array('h',301*[0])
+            
+            
+            ##  @brief      The array, velocityArray, is the collection of velocity 
+            #               when data is being collected.
+            #   @details    The velocityArray is predefined to collected 3001 data 
+            #               points, associated with 0-30s. This array is filled in 
+            #               updated velocity values when the data collection state is 
+            #               called.
+            #  
+            #velocityArray_step = array.array('f', 301*[0])
+            
+            ##  @brief      The array, velocityArray, is the collection of velocity 
+            #               when data is being collected.
+            #   @details    The velocityArray is predefined to collected 3001 data 
+            #               points, associated with 0-30s. This array is filled in 
+            #               updated velocity values when the data collection state is 
+            #               called.
+            #  
+            #dutyArray_step = array.array('f', 301*[0])
+            
+            gc.collect() # Garbage Collection
+            
+            printHelp()
+            state = S1_CMD
+
+        # State 1 (Waiting and looking for character input)
+        elif state == S1_CMD:
+            
+            # Check VCP to see if there is a character waiting.
+            # This if statement will primarily handle state transitions.
+            if ser.any():
+                # Read one character and decode it into a string
+                charIn = ser.read(1).decode()
                 
-                gc.collect() # Garbage Collection
+                # if charIn in {'z', 'Z'}:
+                #     print("Zeroing encoder at current position.")
+                #     zFlag.write(True)
+                #     state = S2_ZERO # transition to state 2
+                    
+                if charIn in {'p', 'P'}:
+                    print("State 3: Print Position")
+                    state = S3_POSITION # transition to state 3
+                    
+                # elif charIn in {'d', 'D'}:
+                #     print("State 4: Print Delta")
+                #     state = S4_DELTA # transition to state 4
+                    
+                elif charIn in {'g', 'G'}:   
+                    print("State 5: Collecting Data...")
+                    state = S5_GET # transition to state 5
+                    
+                elif charIn in {'s', 'S'}:
+                    print("State 6: Stopping Data Collection")
+                    state = S6_STOP # transition to state 6
                 
-                printHelp()
-                state = S1_CMD
+                elif charIn in {'v', 'V'}:
+                    print("State 8: Outputting Velocity for Encoder 1:")
+                    state = S8_VEL # transition to state 8
+                    
+                elif charIn in {'m'}:
+                    print("State 9: Setting Duty Cycle for Motor 1.")
+                    state = S9_DUTY1 # transition to state 9
+                    
+                elif charIn in {'M'}:
+                    print("State 10: Setting Duty Cycle for Motor 2.")
+                    state = S10_DUTY2 # transition to state 10
 
-            # State 1 (Waiting and looking for character input)
-            elif state == S1_CMD:
+                # elif charIn in {'c', 'C'}:
+                #     print("State 11: Clearing Fault Condition")
+                #     state = S11_CLRF # transition to state 11
                 
-                # Check VCP to see if there is a character waiting.
-                # This if statement will primarily handle state transitions.
-                if ser.any():
-                    # Read one character and decode it into a string
-                    charIn = ser.read(1).decode()
+                # elif charIn in {'t', 'T'}:
+                #     print("State 12: Testing.")
+                #     state = S12_THELP # transition to state 12
                     
-                    # if charIn in {'z', 'Z'}:
-                    #     print("Zeroing encoder at current position.")
-                    #     zFlag.write(True)
-                    #     state = S2_ZERO # transition to state 2
-                        
-                    if charIn in {'p', 'P'}:
-                        print("State 3: Print Position")
-                        state = S3_POSITION # transition to state 3
-                        
-                    # elif charIn in {'d', 'D'}:
-                    #     print("State 4: Print Delta")
-                    #     state = S4_DELTA # transition to state 4
-                        
-                    elif charIn in {'g', 'G'}:   
-                        print("State 5: Collecting Data...")
-                        state = S5_GET # transition to state 5
-                        
-                    elif charIn in {'s', 'S'}:
-                        print("State 6: Stopping Data Collection")
-                        state = S6_STOP # transition to state 6
+                # elif charIn in {'y', 'Y'}:
+                #     print("State 14: Setting Euler Angles.")
+                #     set_prompt = True
+                #     state = S14_SETOMEGA
                     
-                    elif charIn in {'v', 'V'}:
-                        print("State 8: Outputting Velocity for Encoder 1:")
-                        state = S8_VEL # transition to state 8
-                        
-                    elif charIn in {'m'}:
-                        print("State 9: Setting Duty Cycle for Motor 1.")
-                        state = S9_DUTY1 # transition to state 9
-                        
-                    elif charIn in {'M'}:
-                        print("State 10: Setting Duty Cycle for Motor 2.")
-                        state = S10_DUTY2 # transition to state 10
-
-                    # elif charIn in {'c', 'C'}:
-                    #     print("State 11: Clearing Fault Condition")
-                    #     state = S11_CLRF # transition to state 11
+                elif charIn in {'k', 'K'}:
+                    print("State 19: Setting Gain.")
+                    Kp_prompt = True
+                    Ki_prompt = True
+                    Kd_prompt = True
+                    inner = True
+                    state = S19_Inner_Outer_Gains
                     
-                    # elif charIn in {'t', 'T'}:
-                    #     print("State 12: Testing.")
-                    #     state = S12_THELP # transition to state 12
-                        
-                    # elif charIn in {'y', 'Y'}:
-                    #     print("State 14: Setting Euler Angles.")
-                    #     set_prompt = True
-                    #     state = S14_SETOMEGA
-                        
-                    elif charIn in {'k', 'K'}:
-                        print("State 19: Setting Gain.")
-                        Kp_prompt = True
-                        Ki_prompt = True
-                        Kd_prompt = True
-                        inner = True
-                        state = S19_Inner_Outer_Gains
-                        
-                    elif charIn in {'w', 'W'}:
-                        print("State 16: Toggle Closed-Loop Control.")
-                        state = S16_TOGGLELOOP
-                        
-                    # elif charIn in {'r', 'R'}:
-                    #     print("State 17: Perform Step Response.")
-                    #     srFlag = True
-                    #     Num_data_collected_step = 0
-                    #     state = S17_STEP
-                        
-                    else:
-                        print(f"You typed {charIn} from state 1")
-                        print(f"at t={ticks_diff(current_time,start_time)/1e6}[s].")
+                elif charIn in {'w', 'W'}:
+                    print("State 16: Toggle Closed-Loop Control.")
+                    state = S16_TOGGLELOOP
+                    
+                elif charIn in {'t', 'T'}:
+                    print("State 20: Outputting Task Timing:")
+                    state = S20_TIMING
+                    
+                # elif charIn in {'r', 'R'}:
+                #     print("State 17: Perform Step Response.")
+                #     srFlag = True
+                #     Num_data_collected_step = 0
+                #     state = S17_STEP
+                    
+                else:
+                    print(f"You typed {charIn} from state 1")
+                    print(f"at t={clock.ticks_diff(current_time,start_time)/1e6}[s].")
+        
+        # elif state == S2_ZERO:
+        #     if zFlag.read() == False:
+        #         state = S1_CMD
+
+        elif state == S3_POSITION:
+            pos = Position.read()
+            print(f"The current position is {(pos[0], pos[1])} mm.")
+            print(f"The current ball velocity is {(pos[2], pos[3])} mm/s.")
+            print(f"The current Euler angles are {tuple(Data.read())} degrees.")
+            state = S1_CMD
+
+        # elif state == S4_DELTA:
+        #     print(f"Delta is currently {delta_data} radians.")
+        #     state = S1_CMD
             
-            # elif state == S2_ZERO:
-            #     if zFlag.read() == False:
-            #         state = S1_CMD
+        elif state == S5_GET:
+            Num_data_collected = 0
+            data_start_time = clock.ticks_ms()
+            collect_data = True
+            state = S1_CMD
 
-            elif state == S3_POSITION:
-                print(f"The current position is {Position.read()} mm.")
-                print(f"The current Euler angles are {Data.read()} degrees.")
+        elif state == S6_STOP:
+            collect_data = False
+            if Num_data_collected > 1:
+                state = S7_DATA
+            else:
                 state = S1_CMD
+            
+        elif state == S7_DATA:
+            print("State 7: Outputting Data: (time [s], (x-position, y-position) [mm], (x-angle, y-angle) [deg])")
+            for numItems in range(0,Num_data_collected):
+                print(f"{(timeArray[numItems]/1000):.2f}, {(xpositionArray[numItems]):.2f}, {(ypositionArray[numItems]):.2f}, {(xangleArray[numItems]):.2f}, {(yangleArray[numItems]):.2f}")
+            state = S1_CMD
+            
+        elif state == S8_VEL:
+            print(f"The current angular velocities for the motors are {tuple(Velocity.read())} deg/s.")
+            state = S1_CMD
+            
+        elif state == S9_DUTY1:
 
-            # elif state == S4_DELTA:
-            #     print(f"Delta is currently {delta_data} radians.")
-            #     state = S1_CMD
+            dFlag = False
+            if ser.any():
+            # Read one character and decode it into a string
+                numIn = ser.read(1).decode()
+                DUTY1, dFlag = InputDutyFCN(numIn,DUTY1,dFlag)
                 
-            elif state == S5_GET:
-                Num_data_collected = 0
-                data_start_time = ticks_ms()
-                collect_data = True
+            if dFlag == True:        
+                Duty1.write(float(DUTY1))
+                print(f"Motor 1 duty set to {DUTY1}%.")
+                dFlag = False
+                DUTY1 = ""
                 state = S1_CMD
-
-            elif state == S6_STOP:
-                collect_data = False
-                if Num_data_collected > 1:
-                    state = S7_DATA
-                else:
-                    state = S1_CMD
                 
-            elif state == S7_DATA:
-                print("State 7: Outputting Data: (time [s], (x-position, y-position) [mm], (x-angle, y-angle) [deg])")
-                for numItems in range(0,Num_data_collected):
-                    print(f"{(timeArray[numItems]/1000):.2f}, {(xpositionArray[numItems]):.2f}, {(ypositionArray[numItems]):.2f}, {(xangleArray[numItems]):.2f}, {(yangleArray[numItems]):.2f}")
-                state = S1_CMD
+        elif state == S10_DUTY2:
+            dFlag = False
+            if ser.any():
+            # Read one character and decode it into a string
+                numIn = ser.read(1).decode()
+                DUTY2, dFlag = InputDutyFCN(numIn,DUTY2,dFlag)
                 
-            elif state == S8_VEL:
-                print(f"The current angular velocities for the motors are {Velocity.read()} deg/s.")
+            if dFlag == True:
+                Duty2.write(float(DUTY2))
+                print(f"Motor 2 duty set to {DUTY2}%.")
+                dFlag = False
+                DUTY2 = ""
                 state = S1_CMD
+                        
+        # elif state == S11_CLRF:
+        #     cFlag.write(True)
+        #     DUTY1 = "0"
+        #     DUTY2 = "0"
+        #     Duty1.write(float(DUTY1))
+        #     Duty2.write(float(DUTY2))
+        #     DUTY1 = ""
+        #     DUTY2 = ""
+        #     state = S1_CMD
+                            
+        # elif state == S12_THELP:
+        #     print("Type a duty % for motor 1 and enter. Type S to exit.")
+        #     print("Units displayed as (%, rad/s).")
+        #     state = S13_TEST
+            
+        # elif state == S13_TEST:
+        #     if ser.any():
+        #     # Read one character and decode it into a string
+        #         numIn = ser.read(1).decode()
+        #         if numIn in {'s', 'S'}:
+        #             print("Leaving testing interface...")
+        #             state = S1_CMD
+        #         else:
+        #             DUTY1, dFlag = InputDutyFCN(numIn,DUTY1,dFlag)
+            
+        #     # When enter is pressed after entering duty:    
+        #     if dFlag == True:
+        #         Duty1.write(float(DUTY1))
                 
-            elif state == S9_DUTY1:
-
-                dFlag = False
-                if ser.any():
-                # Read one character and decode it into a string
-                    numIn = ser.read(1).decode()
-                    DUTY1, dFlag = InputDutyFCN(numIn,DUTY1,dFlag)
-                    
-                if dFlag == True:        
-                    Duty1.write(float(DUTY1))
-                    print(f"Motor 1 duty set to {DUTY1}%.")
-                    dFlag = False
-                    DUTY1 = ""
-                    state = S1_CMD
-                    
-            elif state == S10_DUTY2:
-                dFlag = False
-                if ser.any():
-                # Read one character and decode it into a string
-                    numIn = ser.read(1).decode()
-                    DUTY2, dFlag = InputDutyFCN(numIn,DUTY2,dFlag)
+        #         if len(velocity_list) < 100:
+        #             velocity_list.append(velocity_data)
                     
-                if dFlag == True:
-                    Duty2.write(float(DUTY2))
-                    print(f"Motor 2 duty set to {DUTY2}%.")
-                    dFlag = False
-                    DUTY2 = ""
-                    state = S1_CMD
-                            
-            # elif state == S11_CLRF:
-            #     cFlag.write(True)
-            #     DUTY1 = "0"
-            #     DUTY2 = "0"
-            #     Duty1.write(float(DUTY1))
-            #     Duty2.write(float(DUTY2))
-            #     DUTY1 = ""
-            #     DUTY2 = ""
-            #     state = S1_CMD
-                                
-            # elif state == S12_THELP:
-            #     print("Type a duty % for motor 1 and enter. Type S to exit.")
-            #     print("Units displayed as (%, rad/s).")
-            #     state = S13_TEST
+        #         if len(velocity_list) == 100:
+        #             # Average the list of 100 velocities
+        #             print(f"{DUTY1}, {sum(velocity_list)/len(velocity_list)}")
+        #             velocity_list = []
+        #             DUTY1 = ""
+        #             dFlag = False
+        #             state = S13_TEST
+        
+        # elif state == S14_SETOMEGA:
+        #     if set_prompt == True:
+        #         print("Enter values for the Euler angles.")
+        #         set_prompt = False
                 
-            # elif state == S13_TEST:
-            #     if ser.any():
-            #     # Read one character and decode it into a string
-            #         numIn = ser.read(1).decode()
-            #         if numIn in {'s', 'S'}:
-            #             print("Leaving testing interface...")
-            #             state = S1_CMD
-            #         else:
-            #             DUTY1, dFlag = InputDutyFCN(numIn,DUTY1,dFlag)
+        #     if ser.any():
+        #     # Read one character and decode it into a string
+        #         vNumIn = ser.read(1).decode()
+        #         omega, eFlag = InputNumberFCN(vNumIn,omega,eFlag)
+        #     if eFlag == True:
+        #         print(f"Setting V_ref to {omega} [rad/s].")
+        #         Vref.write(float(omega))
+        #         eFlag = False
+        #         if srFlag == True and gain_step == True:
+        #             state = S17_STEP
+        #             omega_step = True
+        #             omega_test = float(omega)
+        #             Vref.write(0)
+        #         else:
+        #             state = S1_CMD
+        #         omega = ''
                 
-            #     # When enter is pressed after entering duty:    
-            #     if dFlag == True:
-            #         Duty1.write(float(DUTY1))
-                    
-            #         if len(velocity_list) < 100:
-            #             velocity_list.append(velocity_data)
-                        
-            #         if len(velocity_list) == 100:
-            #             # Average the list of 100 velocities
-            #             print(f"{DUTY1}, {sum(velocity_list)/len(velocity_list)}")
-            #             velocity_list = []
-            #             DUTY1 = ""
-            #             dFlag = False
-            #             state = S13_TEST
-            
-            # elif state == S14_SETOMEGA:
-            #     if set_prompt == True:
-            #         print("Enter values for the Euler angles.")
-            #         set_prompt = False
-                    
-            #     if ser.any():
-            #     # Read one character and decode it into a string
-            #         vNumIn = ser.read(1).decode()
-            #         omega, eFlag = InputNumberFCN(vNumIn,omega,eFlag)
-            #     if eFlag == True:
-            #         print(f"Setting V_ref to {omega} [rad/s].")
-            #         Vref.write(float(omega))
-            #         eFlag = False
-            #         if srFlag == True and gain_step == True:
-            #             state = S17_STEP
-            #             omega_step = True
-            #             omega_test = float(omega)
-            #             Vref.write(0)
-            #         else:
-            #             state = S1_CMD
-            #         omega = ''
-                    
-            #     yield None
-            
-            # elif state == S15_SETGAIN:
-            #     if enterKp == True:
-            #         if Kp_prompt == True:
-            #             print("Enter a value for Kp.")
-            #             Kp_prompt = False
-                    
-            #         if ser.any():
-            #         # Read one character and decode it into a string
-            #             KpNumIn = ser.read(1).decode()
-            #             Kp_str, eFlag = InputNumberFCN(KpNumIn,Kp_str,eFlag)
-            #         if eFlag == True:
-            #             print(f"Setting Kp to {Kp_str}.")
-            #             Kp.write(float(Kp_str))
-            #             eFlag = False
-            #             enterKp = False
-            #             enterKi = True
-            #             Kp_str = ""
+        #     yield None
         
-            #     if enterKi == True:
-            #         if Ki_prompt == True:
-            #             print("Enter a value for Ki.")
-            #             Ki_prompt = False
-                    
-            #         if ser.any():
-            #         # Read one character and decode it into a string
-            #             KiNumIn = ser.read(1).decode()
-            #             Ki_str, eFlag = InputNumberFCN(KiNumIn,Ki_str,eFlag)
-            #         if eFlag == True:
-            #             Ki.write(float(Ki_str))
-            #             print(f"Setting Ki to {Ki_str}.")
-            #             eFlag = False
-            #             enterKi = False
-            #             enterKd = True
-            #             Ki_str = ""
+        # elif state == S15_SETGAIN:
+        #     if enterKp == True:
+        #         if Kp_prompt == True:
+        #             print("Enter a value for Kp.")
+        #             Kp_prompt = False
                 
-            #     if enterKd == True:
-            #         if Kd_prompt == True:
-            #             print("Enter a value for Kd.")
-            #             Kd_prompt = False
-                    
-            #         if ser.any():
-            #         # Read one character and decode it into a string
-            #             KdNumIn = ser.read(1).decode()
-            #             Kd_str, eFlag = InputNumberFCN(KdNumIn,Kd_str,eFlag)
-            #         if eFlag == True:
-            #             Kd.write(float(Kd_str))
-            #             print(f"Setting Kd to {Kd_str}.")
-            #             eFlag = False
-            #             enterKp = True
-            #             enterKd = False
-            #             Kd_str = ""
-            #             if srFlag == True:
-            #                 state = S17_STEP
-            #                 gain_step = True
-            #             else:
-            #                 state = S1_CMD
-                    
-            #     yield None
+        #         if ser.any():
+        #         # Read one character and decode it into a string
+        #             KpNumIn = ser.read(1).decode()
+        #             Kp_str, eFlag = InputNumberFCN(KpNumIn,Kp_str,eFlag)
+        #         if eFlag == True:
+        #             print(f"Setting Kp to {Kp_str}.")
+        #             Kp.write(float(Kp_str))
+        #             eFlag = False
+        #             enterKp = False
+        #             enterKi = True
+        #             Kp_str = ""
+    
+        #     if enterKi == True:
+        #         if Ki_prompt == True:
+        #             print("Enter a value for Ki.")
+        #             Ki_prompt = False
                 
-            elif state == S16_TOGGLELOOP:
-                if clFlag.read() == True:
-                    print("Closed-loop is now inactive.")
-                    clFlag.write(False)
-                    state = S1_CMD
-                elif clFlag.read() == False:
-                    print("Closed-loop is now active.")
-                    clFlag.write(True)
-                    state = S1_CMD
-                yield None
+        #         if ser.any():
+        #         # Read one character and decode it into a string
+        #             KiNumIn = ser.read(1).decode()
+        #             Ki_str, eFlag = InputNumberFCN(KiNumIn,Ki_str,eFlag)
+        #         if eFlag == True:
+        #             Ki.write(float(Ki_str))
+        #             print(f"Setting Ki to {Ki_str}.")
+        #             eFlag = False
+        #             enterKi = False
+        #             enterKd = True
+        #             Ki_str = ""
+            
+        #     if enterKd == True:
+        #         if Kd_prompt == True:
+        #             print("Enter a value for Kd.")
+        #             Kd_prompt = False
                 
-            # elif state == S17_STEP:
-            #     # Create srFlag, which, when active, will redirect from S1 back here to S17
-            #     if ser.any():
-            #     # Read one character and decode it into a string
-            #         numIn = ser.read(1).decode()
-            #         if numIn in {'s', 'S'}:
-            #             print("Leaving testing interface...")
-            #             state = S18_DATA
-            #             gain_step = False
-            #             omega_step = False
-            #             srFlag = False
-            #     else:
-            #         if gain_step == True:
-            #             if omega_step == True:
-            #                 if Num_data_collected_step == 0:
-            #                     step_start_time = ticks_ms()
-            #                     step_time = ticks_add(step_start_time, 1000)
-                                
-            #                 data_current_time_step = ticks_ms()
-                            
-            #                 if ticks_diff(data_current_time_step, step_time) >= 0:
-            #                     # Vref.write(omega_test)
-            #                     clFlag.write(True)
-            #                     step_time = 100000000000000
-                                
-
-            #                 # timeArray_step[Num_data_collected_step] = ticks_diff(data_current_time_step, step_start_time)
-            #                 # velocityArray_step[Num_data_collected_step] = velocity_data
-            #                 # dutyArray_step[Num_data_collected_step] = Duty1.read()
-            #                 Num_data_collected_step += 1
-            #                 gc.collect()
-
-            #                 if Num_data_collected_step > 300:
-            #                     state = S18_DATA
-            #                     gain_step = False
-            #                     omega_step = False
-            #                     srFlag = False
-            #             else:
-            #                 state = S14_SETOMEGA
-            #         else:
-            #             state = S15_SETGAIN
-                        
-            #         yield None
+        #         if ser.any():
+        #         # Read one character and decode it into a string
+        #             KdNumIn = ser.read(1).decode()
+        #             Kd_str, eFlag = InputNumberFCN(KdNumIn,Kd_str,eFlag)
+        #         if eFlag == True:
+        #             Kd.write(float(Kd_str))
+        #             print(f"Setting Kd to {Kd_str}.")
+        #             eFlag = False
+        #             enterKp = True
+        #             enterKd = False
+        #             Kd_str = ""
+        #             if srFlag == True:
+        #                 state = S17_STEP
+        #                 gain_step = True
+        #             else:
+        #                 state = S1_CMD
                 
-            # elif state == S18_DATA:
-            #     print("State 18: Outputting Data. (Time [s], Velocity [rad/s], Duty [%])")
-            #     # for numItems in range(0,Num_data_collected_step):
-            #     #     print(f"{(timeArray_step[numItems]/1000):.2f}, {(velocityArray_step[numItems]):.2f}, {(dutyArray_step[numItems]):.2f}")
-            #     state = S1_CMD
-            
-            elif state == S19_Inner_Outer_Gains:
-                if inner == True:
-                    if enterKp == True:
-                        if Kp_prompt == True:
-                            print("Enter a value for Kp outer.")
-                            Kp_prompt = False
-                        
-                        if ser.any():
-                        # Read one character and decode it into a string
-                            KpNumIn = ser.read(1).decode()
-                            Kp_str, eFlag = InputNumberFCN(KpNumIn,Kp_str,eFlag)
-                        if eFlag == True:
-                            print(f"Setting Kp outer to {Kp_str}.")
-                            Kp1 = float(Kp_str)
-                            eFlag = False
-                            enterKp = False
-                            enterKi = True
-                            Kp_str = ""
-            
-                    if enterKi == True:
-                        if Ki_prompt == True:
-                            print("Enter a value for Ki outer.")
-                            Ki_prompt = False
-                        
-                        if ser.any():
-                        # Read one character and decode it into a string
-                            KiNumIn = ser.read(1).decode()
-                            Ki_str, eFlag = InputNumberFCN(KiNumIn,Ki_str,eFlag)
-                        if eFlag == True:
-                            Ki1 = float(Ki_str)
-                            print(f"Setting Ki outer to {Ki_str}.")
-                            eFlag = False
-                            enterKi = False
-                            enterKd = True
-                            Ki_str = ""
-                    
-                    if enterKd == True:
-                        if Kd_prompt == True:
-                            print("Enter a value for Kd outer.")
-                            Kd_prompt = False
+        #     yield None
+            
+        elif state == S16_TOGGLELOOP:
+            if clFlag.read() == True:
+                print("Closed-loop is now inactive.")
+                clFlag.write(False)
+                state = S1_CMD
+            elif clFlag.read() == False:
+                print("Closed-loop is now active.")
+                clFlag.write(True)
+                state = S1_CMD
+            
+        # elif state == S17_STEP:
+        #     # Create srFlag, which, when active, will redirect from S1 back here to S17
+        #     if ser.any():
+        #     # Read one character and decode it into a string
+        #         numIn = ser.read(1).decode()
+        #         if numIn in {'s', 'S'}:
+        #             print("Leaving testing interface...")
+        #             state = S18_DATA
+        #             gain_step = False
+        #             omega_step = False
+        #             srFlag = False
+        #     else:
+        #         if gain_step == True:
+        #             if omega_step == True:
+        #                 if Num_data_collected_step == 0:
+        #                     step_start_time = clock.ticks_ms()
+        #                     step_time = clock.ticks_add(step_start_time, 1000)
+                            
+        #                 data_current_time_step = clock.ticks_ms()
                         
-                        if ser.any():
-                        # Read one character and decode it into a string
-                            KdNumIn = ser.read(1).decode()
-                            Kd_str, eFlag = InputNumberFCN(KdNumIn,Kd_str,eFlag)
-                        if eFlag == True:
-                            Kd1=float(Kd_str)
-                            print(f"Setting Kd outer to {Kd_str}.")
-                            eFlag = False
-                            enterKp = True
-                            enterKd = False
-                            inner = False
-                            outer = True
-                            Kd_str = ""
-                            Kp_prompt = True
-                            Kd_prompt = True
-                            Ki_prompt = True
-                            # if srFlag == True:
-                            #     state = S17_STEP
-                            #     gain_step = True
+        #                 if clock.ticks_diff(data_current_time_step, step_time) >= 0:
+        #                     # Vref.write(omega_test)
+        #                     clFlag.write(True)
+        #                     step_time = 100000000000000
+                            
 
-                if outer == True:
-                    if enterKp == True:
-                        if Kp_prompt == True:
-                            print("Enter a value for Kp inner.")
-                            Kp_prompt = False
-                        
-                        if ser.any():
-                        # Read one character and decode it into a string
-                            KpNumIn = ser.read(1).decode()
-                            Kp_str, eFlag = InputNumberFCN(KpNumIn,Kp_str,eFlag)
-                        if eFlag == True:
-                            print(f"Setting Kp inner to {Kp_str}.")
-                            Kp2 = float(Kp_str)
-                            eFlag = False
-                            enterKp = False
-                            enterKi = True
-                            Kp_str = ""
-            
-                    if enterKi == True:
-                        if Ki_prompt == True:
-                            print("Enter a value for Ki inner.")
-                            Ki_prompt = False
-                        
-                        if ser.any():
-                        # Read one character and decode it into a string
-                            KiNumIn = ser.read(1).decode()
-                            Ki_str, eFlag = InputNumberFCN(KiNumIn,Ki_str,eFlag)
-                        if eFlag == True:
-                            Ki2 = float(Ki_str)
-                            print(f"Setting Ki inner to {Ki_str}.")
-                            eFlag = False
-                            enterKi = False
-                            enterKd = True
-                            Ki_str = ""
+        #                 # timeArray_step[Num_data_collected_step] = clock.ticks_diff(data_current_time_step, step_start_time)
+        #                 # velocityArray_step[Num_data_collected_step] = velocity_data
+        #                 # dutyArray_step[Num_data_collected_step] = Duty1.read()
+        #                 Num_data_collected_step += 1
+        #                 gc.collect()
+
+        #                 if Num_data_collected_step > 300:
+        #                     state = S18_DATA
+        #                     gain_step = False
+        #                     omega_step = False
+        #                     srFlag = False
+        #             else:
+        #                 state = S14_SETOMEGA
+        #         else:
+        #             state = S15_SETGAIN
                     
-                    if enterKd == True:
-                        if Kd_prompt == True:
-                            print("Enter a value for Kd inner.")
-                            Kd_prompt = False
-                        
-                        if ser.any():
-                        # Read one character and decode it into a string
-                            KdNumIn = ser.read(1).decode()
-                            Kd_str, eFlag = InputNumberFCN(KdNumIn,Kd_str,eFlag)
-                        if eFlag == True:
-                            Kd2 =float(Kd_str)
-                            print(f"Setting Kd inner to {Kd_str}.")
-                            eFlag = False
-                            enterKp = True
-                            enterKd = False
-                            outer = False
-                            Kd_str = ""
-                            
-                            Kp.write((Kp1, Kp2))
-                            Kd.write((Kd1, Kd2))
-                            Ki.write((Ki1, Ki2))
-                            state = S1_CMD
-                            # if srFlag == True:
-                            #     state = S17_STEP
-                            #     gain_step = True
-                            # else:
-                            #     state = S1_CMD
-                        
-                    yield None
+        #         yield None
+            
+        # elif state == S18_DATA:
+        #     print("State 18: Outputting Data. (Time [s], Velocity [rad/s], Duty [%])")
+        #     # for numItems in range(0,Num_data_collected_step):
+        #     #     print(f"{(timeArray_step[numItems]/1000):.2f}, {(velocityArray_step[numItems]):.2f}, {(dutyArray_step[numItems]):.2f}")
+        #     state = S1_CMD
+        
+        elif state == S20_TIMING:
+            print("(mean, 99th percentile, max) of run time and release jitter [us]")
+            print(scheduler.task_list)
+            print("Start up phases [us]")
+            print(profiler.startup)
+            state = S1_CMD
+        
+        elif state == S19_Inner_Outer_Gains:
+            if inner == True:
+                if enterKp == True:
+                    if Kp_prompt == True:
+                        print("Enter a value for Kp outer.")
+                        Kp_prompt = False
                     
+                    if ser.any():
+                    # Read one character and decode it into a string
+                        KpNumIn = ser.read(1).decode()
+                        Kp_str, eFlag = InputNumberFCN(KpNumIn,Kp_str,eFlag)
+                    if eFlag == True:
+                        print(f"Setting Kp outer to {Kp_str}.")
+                        Kp1 = float(Kp_str)
+                        eFlag = False
+                        enterKp = False
+                        enterKi = True
+                        Kp_str = ""
+        
+                if enterKi == True:
+                    if Ki_prompt == True:
+                        print("Enter a value for Ki outer.")
+                        Ki_prompt = False
                     
-                yield None
+                    if ser.any():
+                    # Read one character and decode it into a string
+                        KiNumIn = ser.read(1).decode()
+                        Ki_str, eFlag = InputNumberFCN(KiNumIn,Ki_str,eFlag)
+                    if eFlag == True:
+                        Ki1 = float(Ki_str)
+                        print(f"Setting Ki outer to {Ki_str}.")
+                        eFlag = False
+                        enterKi = False
+                        enterKd = True
+                        Ki_str = ""
+                
+                if enterKd == True:
+                    if Kd_prompt == True:
+                        print("Enter a value for Kd outer.")
+                        Kd_prompt = False
                     
+                    if ser.any():
+                    # Read one character and decode it into a string
+                        KdNumIn = ser.read(1).decode()
+                        Kd_str, eFlag = InputNumberFCN(KdNumIn,Kd_str,eFlag)
+                    if eFlag == True:
+                        Kd1=float(Kd_str)
+                        print(f"Setting Kd outer to {Kd_str}.")
+                        eFlag = False
+                        enterKp = True
+                        enterKd = False
+                        inner = False
+                        outer = True
+                        Kd_str = ""
+                        Kp_prompt = True
+                        Kd_prompt = True
+                        Ki_prompt = True
+                        # if srFlag == True:
+                        #     state = S17_STEP
+                        #     gain_step = True
 
+            if outer == True:
+                if enterKp == True:
+                    if Kp_prompt == True:
+                        print("Enter a value for Kp inner.")
+                        Kp_prompt = False
                     
-                 
-            
-            ######################
-            # END OF STATE SPACE #
-            ######################
-            
-            else:
-                 raise ValueError(f"Invalid state value in {taskName}: State {state} does not exist")
-                 
-            yield state
-            
-
-            
-            # Data Collection for State 5
-            # (Performing this outside of state 5 allows the system to return to 
-            # state 1, where it listens for more commands.)
-            if collect_data == True:
-                data_current_time = ticks_ms()
-                timeArray[Num_data_collected] = ticks_diff(data_current_time, data_start_time)
-                xpositionArray[Num_data_collected] = float(Position.read()[0])
-                ypositionArray[Num_data_collected] = float(Position.read()[1])
-                xangleArray[Num_data_collected] = float(Data.read()[0])
-                yangleArray[Num_data_collected] = float(Data.read()[1])
-                Num_data_collected += 1
-                gc.collect()
-            
-                if Num_data_collected > 1000:
-                    state = S7_DATA
-                    collect_data = False
-                else: 
-                    yield None
-            
-            else:
-                yield None
-
-
+                    if ser.any():
+                    # Read one character and decode it into a string
+                        KpNumIn = ser.read(1).decode()
+                        Kp_str, eFlag = InputNumberFCN(KpNumIn,Kp_str,eFlag)
+                    if eFlag == True:
+                        print(f"Setting Kp inner to {Kp_str}.")
+                        Kp2 = float(Kp_str)
+                        eFlag = False
+                        enterKp = False
+                        enterKi = True
+                        Kp_str = ""
+        
+                if enterKi == True:
+                    if Ki_prompt == True:
+                        print("Enter a value for Ki inner.")
+                        Ki_prompt = False
+                    
+                    if ser.any():
+                    # Read one character and decode it into a string
+                        KiNumIn = ser.read(1).decode()
+                        Ki_str, eFlag = InputNumberFCN(KiNumIn,Ki_str,eFlag)
+                    if eFlag == True:
+                        Ki2 = float(Ki_str)
+                        print(f"Setting Ki inner to {Ki_str}.")
+                        eFlag = False
+                        enterKi = False
+                        enterKd = True
+                        Ki_str = ""
                 
-             
+                if enterKd == True:
+                    if Kd_prompt == True:
+                        print("Enter a value for Kd inner.")
+                        Kd_prompt = False
+                    
+                    if ser.any():
+                    # Read one character and decode it into a string
+                        KdNumIn = ser.read(1).decode()
+                        Kd_str, eFlag = InputNumberFCN(KdNumIn,Kd_str,eFlag)
+                    if eFlag == True:
+                        Kd2 =float(Kd_str)
+                        print(f"Setting Kd inner to {Kd_str}.")
+                        eFlag = False
+                        enterKp = True
+                        enterKd = False
+                        outer = False
+                        Kd_str = ""
+                        
+                        Kp.write((Kp1, Kp2))
+                        Kd.write((Kd1, Kd2))
+                        Ki.write((Ki1, Ki2))
+                        state = S1_CMD
+                        # if srFlag == True:
+                        #     state = S17_STEP
+                        #     gain_step = True
+                        # else:
+                        #     state = S1_CMD
+        
+        ######################
+        # END OF STATE SPACE #
+        ######################
+        
         else:
-            yield None
+             raise ValueError(f"Invalid state value in {taskName}: State {state} does not exist")
+        
+        # Data Collection for State 5
+        # (Performing this outside of state 5 allows the system to return to 
+        # state 1, where it listens for more commands.)
+        if collect_data == True:
+            data_current_time = clock.ticks_ms()
+            timeArray[Num_data_collected] = clock.ticks_diff(data_current_time, data_start_time)
+            xpositionArray[Num_data_collected] = float(Position.read()[0])
+            ypositionArray[Num_data_collected] = float(Position.read()[1])
+            xangleArray[Num_data_collected] = float(Data.read()[0])
+            yangleArray[Num_data_collected] = float(Data.read()[1])
+            Num_data_collected += 1
+            gc.collect()
+        
+            if Num_data_collected > 1000:
+                state = S7_DATA
+                collect_data = False
+        
+        yield state
                  
                  
\ No newline at end of file
@@ -6,8 +6,34 @@
     @details    This driver performs an Xscan, Yscan, and a Zscan on the 
                 touchpanel. This returns the x position, y position of the ball.
                 It also determines whether or not there is any contact with the
-                touch panel. To make the data more accurate, alpha beta 
-                filtering is utilized to reduce the noise in the data.
+                touch panel. To make the data more accurate, a steady-state
+                Kalman filter reduces the noise in the data and estimates the
+                velocity of the ball, with the gains from kalman.py.
+
+                The pins and ADC channels are created once, and each scan only
+                writes the pins whose state has to change. Every pin is either
+                driven low, driven high or left floating in analog mode, where
+                it can be read by its ADC channel.
+
+                Each position can also be read as a burst of several ADC
+                samples taken with ADC.read_timed(), sorted in place with
+                ulab and reduced to their median or trimmed mean, which
+                throws out the noise spikes that the Kalman filter would
+                otherwise have to smooth over.
+
+                The panel can also be scanned from a timer interrupt at a
+                fixed rate with start_sampling(). The scans are queued with
+                their times and filtered later by Read_Samples(), so when
+                each scan is taken does not depend on how long the tasks
+                take.
+
+                Calibrate() records a tap at each point of a list of
+                calibration points, and Fit() fits an affine or quadratic
+                calibration to them with panelmap.py. The readings are turned
+                into mm by the map panelmap.make_map() picks for the
+                calibration. Beta() still gives the six numbers of the old
+                affine calibration, which Read_Panel() and Read_Samples()
+                also take in place of a map.
 
                 
     @author     Jake Lesher
@@ -15,10 +41,85 @@
     @date       3/16/2022
     
 '''
-from pyb import Pin, ADC
-from time import ticks_us, ticks_diff, sleep_ms, ticks_ms
+from pyb import Pin, ADC, Timer
+import array, clock, micropython, kalman, panelmap, shares
 from ulab import numpy as np
 
+try:
+    import fastpath
+except (ImportError, SyntaxError, AttributeError, NameError):
+    # There is no native code emitter in this firmware, or this is CPython.
+    fastpath = None
+
+## A panel pin state: driven low.
+LOW = micropython.const(0)
+
+## A panel pin state: driven high.
+HIGH = micropython.const(1)
+
+## A panel pin state: floating in analog mode, ready to be read by its ADC.
+FLOAT = micropython.const(2)
+
+## Burst reduction: the median of the samples.
+MEDIAN = micropython.const(0)
+
+## Burst reduction: the mean of the middle half of the samples.
+TRIMMED_MEAN = micropython.const(1)
+
+## The ball or a finger is on the panel when the reading of the contact phase
+#  is below this [ADC units]. With nothing on the panel it reads full scale.
+CONTACT_THRESHOLD = micropython.const(4080)
+
+## The timer that paces the burst samples. Timer 6 has no output pins.
+BURST_TIMER = micropython.const(6)
+
+## The rate of the burst samples [Hz].
+BURST_FREQ = micropython.const(100_000)
+
+## The timer that runs the background scans of start_sampling(). Timer 7 has
+#  no output pins.
+SAMPLE_TIMER = micropython.const(7)
+
+## The rate of the background scans [Hz], one scan every kalman.PERIOD, which
+#  the Kalman filter gains are worked out for.
+SAMPLE_FREQ = micropython.const(100)
+
+## The number of background scans the queue can hold.
+SAMPLE_QUEUE = micropython.const(16)
+
+# A background scan is queued as its ticks_us() time followed by one int
+# holding xpos in bits 0 to 11, ypos in bits 12 to 23 and these flags.
+_CONTACT = micropython.const(1 << 24)
+_NEW_X = micropython.const(1 << 25)
+_NEW_Y = micropython.const(1 << 26)
+_ADC_MASK = micropython.const(0xFFF)
+
+## The five calibration taps of an affine calibration: the name of each point
+#  and its x and y positions [mm].
+CAL_POINTS = (('bottom left corner', -80, -40),
+              ('top left corner', -80, 40),
+              ('top right corner', 80, 40),
+              ('bottom right corner', 80, -40),
+              ('middle', 0, 0))
+
+## The nine calibration taps of a quadratic calibration, a 3 by 3 grid, which
+#  also pin down how the readings bend between the corners.
+CAL_POINTS_9 = (('bottom left corner', -80, -40),
+                ('middle of the left edge', -80, 0),
+                ('top left corner', -80, 40),
+                ('middle of the top edge', 0, 40),
+                ('middle', 0, 0),
+                ('middle of the bottom edge', 0, -40),
+                ('bottom right corner', 80, -40),
+                ('middle of the right edge', 80, 0),
+                ('top right corner', 80, 40))
+
+# The positions of the pins in TouchPanel.pins.
+_XM = micropython.const(0)
+_XP = micropython.const(1)
+_YM = micropython.const(2)
+_YP = micropython.const(3)
+
 
 class TouchPanel:
     '''!@brief      The class for initializing, reading, filtering, and 
@@ -27,32 +128,159 @@ class TouchPanel:
                     of the touch panel.
                     
     '''
-    def __init__(self):
+    def __init__(self, contact_first=False, alternate=False, samples=1,
+                 reduce=MEDIAN, order=panelmap.AFFINE, cal_points=None,
+                 period=kalman.PERIOD):
         '''!@brief      Initializes the touch panel, creating necessary objects
                         and variables.
             @details    This function initialzes the touch panel pins, creates 
-                        a few variables for future use, and creates the Y matrix
-                        containing the calibration points.
+                        a few variables for future use, and picks the
+                        calibration points.
+            @param      contact_first is True for Scan() to check for contact
+                        first and skip the position readings when there is
+                        none.
+            @param      alternate is True for Scan() to read only one of x and
+                        y each call, taking turns, when contact_first is True.
+                        This halves the time of a scan, so the panel can be
+                        scanned twice as often for the same time.
+            @param      samples is the number of ADC samples in each x and y
+                        reading. With 1 a single ADC.read() is used.
+            @param      reduce is MEDIAN or TRIMMED_MEAN, the way a burst of
+                        samples is made into one reading.
+            @param      order is panelmap.AFFINE or panelmap.QUADRATIC, the
+                        model Fit() fits.
+            @param      cal_points is a sequence of (name, x, y) calibration
+                        points, or None for CAL_POINTS with an affine model
+                        and CAL_POINTS_9 with a quadratic one.
+            @param      period is the time between calls to Scan() [us],
+                        which the gains of Filter() are picked for.
         '''
         self.Pinym = Pin.cpu.A0
         self.Pinxm = Pin.cpu.A1
         self.Pinyp = Pin.cpu.A6
         self.Pinxp = Pin.cpu.A7
+        # The ADC channels are set up once here. Creating an ADC object puts
+        # its pin in analog mode, so every pin starts out floating.
+        self.ymADC = ADC(self.Pinym)
+        self.xmADC = ADC(self.Pinxm)
+        self.Pinxp.init(Pin.ANALOG)
+        self.Pinyp.init(Pin.ANALOG)
+        self.pins = (self.Pinxm, self.Pinxp, self.Pinym, self.Pinyp)
+        # The burst buffer and its timer are only made when they are used.
+        self.samples = samples
+        self.reduce = reduce
+        if samples > 1:
+            self.burst = np.zeros(samples, dtype=np.uint16)
+            self.burst_timer = Timer(BURST_TIMER, freq=BURST_FREQ)
+        self.pin_state = bytearray((FLOAT, FLOAT, FLOAT, FLOAT))
+        # Scan() runs its phases in the reverse order every other call, or
+        # reads the other axis every other call when alternating.
+        self.forward = True
+        self.contact_first = contact_first
+        self.alternate = alternate
+        # Whether the last scan read each axis, for Filter().
+        self.new_x = True
+        self.new_y = True
+        self.xpos = 0
+        self.ypos = 0
         self.contact = False
-        self.initial_time = 0
+        # The state of Filter(): the estimates, whether each axis has been
+        # read since the ball last came down, and the time of the last call.
+        self.x_hat = 0
+        self.y_hat = 0
         self.vx_hat = 0
         self.vy_hat = 0
+        self.x_seen = False
+        self.y_seen = False
+        self.filter_time = clock.ticks_us()
+        self.set_period(period)
+        self.order = order
+        if cal_points is None:
+            cal_points = CAL_POINTS if order == panelmap.AFFINE else CAL_POINTS_9
+        self.cal_points = cal_points
+        # The readings of the taps recorded so far, and the reading of the
+        # tap being held down.
+        self.cal_adc = []
+        self.cal_tap = None
         self.Cal_step = 0
         self.Calibrated = False
-        self.y1_print = True
-        self.y2_print = False
-        self.y3_print = False
-        self.y4_print = False
-        self.y5_print = False
-        self.Y6_print = False
-        self.Y = np.array([[-80, -40], [-80, 40], [80, 40], [80, -40], [0,0]])
+        self.cal_print = True
+        # The last Beta tuple given in place of a map, and its map.
+        self.beta = None
+        self.beta_map = None
 
     
+    def _set(self, idx, state):
+        '''!@brief      Puts one panel pin in a state, if it is not already in it.
+            @details    Pins already in the state are left alone, so a phase
+                        only writes the registers of the pins that change.
+            @param      idx is the position of the pin in self.pins.
+            @param      state is LOW, HIGH or FLOAT.
+        '''
+        if self.pin_state[idx] != state:
+            if state == FLOAT:
+                self.pins[idx].init(Pin.ANALOG)
+            else:
+                self.pins[idx].init(Pin.OUT_PP, value=state)
+            self.pin_state[idx] = state
+
+    def _read_burst(self, adc):
+        '''!@brief      Reads a burst of samples and reduces it to one reading.
+            @details    The samples go straight into the preallocated ulab
+                        array, which is then sorted in place, so the median
+                        is its middle element and the trimmed mean is the
+                        mean of a view of its middle half.
+            @param      adc is the ADC object to read.
+            @return     The reading in ADC units, always as a float.
+        '''
+        burst = self.burst
+        adc.read_timed(burst, self.burst_timer)
+        burst.sort()
+        n = self.samples
+        if self.reduce == MEDIAN:
+            if n % 2:
+                return float(burst[n//2])
+            return (float(burst[n//2 - 1]) + float(burst[n//2]))/2
+        trim = n//4
+        return float(np.mean(burst[trim:n - trim]))
+
+    def _phase_x(self):
+        '''!@brief      Drives the x layer and reads it through the y layer.
+            @return     The x-position of the ball in ADC units.
+        '''
+        self._set(_XM, LOW)
+        self._set(_XP, HIGH)
+        self._set(_YP, FLOAT)
+        self._set(_YM, FLOAT)
+        if self.samples > 1:
+            return self._read_burst(self.ymADC)
+        return self.ymADC.read()
+
+    def _phase_z(self):
+        '''!@brief      Drives the x layer low and the y layer high, and reads
+                        the y layer.
+            @details    The reading is near full scale unless something
+                        presses the layers together.
+            @return     The contact reading in ADC units.
+        '''
+        self._set(_XM, LOW)
+        self._set(_XP, FLOAT)
+        self._set(_YP, HIGH)
+        self._set(_YM, FLOAT)
+        return self.ymADC.read()
+
+    def _phase_y(self):
+        '''!@brief      Drives the y layer and reads it through the x layer.
+            @return     The y-position of the ball in ADC units.
+        '''
+        self._set(_YM, LOW)
+        self._set(_YP, HIGH)
+        self._set(_XP, FLOAT)
+        self._set(_XM, FLOAT)
+        if self.samples > 1:
+            return self._read_burst(self.xmADC)
+        return self.xmADC.read()
+
     def xScan(self):
         '''!@brief      Scans the touch panel for the x-position of the ball.
             @details    This function sets up the touch panel pins to be able
@@ -60,13 +288,7 @@ class TouchPanel:
             @return     xpos is the x-position of the ball in ADC units.
             
         '''
-        Pin.init(self.Pinxm, mode=Pin.OUT_PP)
-        self.Pinxm.low()
-        Pin.init(self.Pinxp, mode=Pin.OUT_PP)
-        self.Pinxp.high()
-        Pin.init(self.Pinyp, mode=Pin.IN)
-        self.ymADC = ADC(self.Pinym)
-        self.xpos = self.ymADC.read()  #/4095*176-88
+        self.xpos = self._phase_x()  #/4095*176-88
 
         return self.xpos
     
@@ -77,13 +299,7 @@ class TouchPanel:
             @return     ypos is the y-position of the ball in ADC units.
             
         '''
-        Pin.init(self.Pinym, mode=Pin.OUT_PP)
-        self.Pinym.low()
-        Pin.init(self.Pinyp, mode=Pin.OUT_PP)
-        self.Pinyp.high()
-        Pin.init(self.Pinxp, mode=Pin.IN)
-        self.xmADC = ADC(self.Pinxm)
-        self.ypos = self.xmADC.read()  #/4095*100-50
+        self.ypos = self._phase_y()  #/4095*100-50
         return self.ypos
     
     def zScan(self):
@@ -93,15 +309,7 @@ class TouchPanel:
             @return     contact is a boolean telling if there is something on the panel.
             
         '''
-        Pin.init(self.Pinxm, mode=Pin.OUT_PP)
-        self.Pinxm.low()
-        Pin.init(self.Pinyp, mode=Pin.OUT_PP)
-        self.Pinyp.high()
-        
-        self.xpADC = ADC(self.Pinxp)
-        self.ymADC = ADC(self.Pinym)
-        
-        if round(self.ymADC.read(), 1) < 4000:          #/4095*3.3,1) != 3.3:
+        if self._phase_z() < CONTACT_THRESHOLD:
             self.contact = True
         else: 
             self.contact = False
@@ -109,218 +317,436 @@ class TouchPanel:
 
         return self.contact
 
+    def _scan(self):
+        '''!@brief      Runs the phases of one scan.
+            @details    The readings are left in xpos, ypos and contact, and
+                        which axes were read is returned rather than stored,
+                        so the timer callback of start_sampling() can call
+                        this without touching the state of Filter(). Nothing
+                        here allocates memory, so it can run in an interrupt.
+            @return     The flags of the scan, _CONTACT, _NEW_X and _NEW_Y.
+        '''
+        if self.contact_first:
+            contact = self._phase_z() < CONTACT_THRESHOLD
+            new_x = contact and (self.forward or not self.alternate)
+            new_y = contact and (not self.forward or not self.alternate)
+            if new_x:
+                self.xpos = self._phase_x()
+            if new_y:
+                self.ypos = self._phase_y()
+            
+        else:
+            new_x = new_y = True
+            if self.forward:
+                self.xpos = self._phase_x()
+                z = self._phase_z()
+                self.ypos = self._phase_y()
+            else:
+                self.ypos = self._phase_y()
+                z = self._phase_z()
+                self.xpos = self._phase_x()
+            contact = z < CONTACT_THRESHOLD
+        self.contact = contact
+        self.forward = not self.forward
+        
+        flags = 0
+        if contact:
+            flags |= _CONTACT
+        if new_x:
+            flags |= _NEW_X
+        if new_y:
+            flags |= _NEW_Y
+        return flags
+
     def Scan(self):
         '''!@brief      Scans the touch panel for the total position of the ball.
             @details    This function sets up the touch panel pins to be able
                         to read the position of the ball in the x-direction, 
-                        y-direction, and z-direction (contact). 
+                        y-direction, and z-direction (contact). The x and y
+                        phases each change two pins from the z phase, and
+                        the z phase sits between them. The order is reversed
+                        every call, X-Z-Y then Y-Z-X, so that each scan
+                        starts with the pins the last one ended with, and a
+                        whole scan takes four pin writes.
+                        
+                        With contact_first the z phase runs first, and when
+                        nothing touches the panel the scan stops there, keeping
+                        the last x and y readings. With alternate as well, a
+                        scan with contact reads only x or only y, in turns.
+                        new_x and new_y tell which axes were read.
             @return     This returns a tuple containing xpos, ypos, contact, 
                         and timespan. The positions are in ADC units and the
                         timespan is in microseconds (for testing).
         '''
         # Timestamp
-        start_time = ticks_us()
-        
-        # Scanning X
-        Pin(self.Pinxm, mode=Pin.OUT_PP, value=0)
-        Pin(self.Pinxp, mode=Pin.OUT_PP, value=1)
-        Pin(self.Pinyp, mode=Pin.IN)
-        self.ymADC = ADC(self.Pinym)
-        self.xpos = self.ymADC.read()
+        start_time = clock.ticks_us()
         
-        #Scanning Z
-        Pin(self.Pinyp, mode=Pin.OUT_PP, value=1)
-        self.xpADC = ADC(self.Pinxp)
-        if round(self.ymADC.read(), 1) < 4080:
-            self.contact = True
-        else: 
-            self.contact = False
-        
-        # Scanning Y
-        Pin(self.Pinxp, mode=Pin.IN)
-        Pin(self.Pinym, mode=Pin.OUT_PP, value=0)
-        self.xmADC = ADC(self.Pinxm)
-        self.ypos = self.xmADC.read()
+        flags = self._scan()
+        self.new_x = bool(flags & _NEW_X)
+        self.new_y = bool(flags & _NEW_Y)
         
         # Timespan Calculation
-        end_time = ticks_us()
-        time_span = ticks_diff(end_time, start_time)
+        end_time = clock.ticks_us()
+        time_span = clock.ticks_diff(end_time, start_time)
         
         return (self.xpos, self.ypos, self.contact, time_span)
 
-    def Filter(self, ADC_Data):
-        '''!@brief      An alpha-beta filter for removing "noise" from the ADC 
-                        position measurements.
-            @details    This function uses predictions to filter values from the 
-                        touchpanel, making the data more cohesive. 
+    def set_period(self, period):
+        '''!@brief      Picks the gains of Filter() for the time between scans.
+            @details    When the scans alternate between the axes, each axis
+                        is only read every other scan, so the gains are
+                        picked for twice the period. The time between the
+                        readings of each axis is kept in axis_period.
+            @param      period is the time between scans [us].
+        '''
+        if self.contact_first and self.alternate:
+            period *= 2
+        self.axis_period = period
+        self.gain_pos, self.gain_vel = kalman.gains(period)
+
+    def start_sampling(self, freq=SAMPLE_FREQ, size=SAMPLE_QUEUE):
+        '''!@brief      Starts scanning the panel from a timer interrupt.
+            @details    Every period of timer SAMPLE_TIMER the callback runs
+                        one scan and queues its time and readings, however
+                        busy the tasks are. Read_Samples() then filters the
+                        queued scans instead of Read_Panel() scanning. The
+                        queue is a shares.Queue that drops new scans while it
+                        is full, so the callback and Read_Samples() can use it
+                        without disabling interrupts. The scans that are
+                        dropped are counted in dropped. Nothing else may scan
+                        the panel once this has been called. The gains of
+                        Filter() are picked again for the rate of the timer.
+            @param      freq is the rate of the scans [Hz].
+            @param      size is the number of scans the queue can hold.
+        '''
+        if self.samples > 1:
+            raise ValueError("Burst readings cannot be taken in a timer interrupt")
+        micropython.alloc_emergency_exception_buf(100)
+        self.set_period(1_000_000//freq)
+        self.queue = shares.Queue('l', 2*size, shares.DROP_NEWEST)
+        self.drain = array.array('l', 2*size*[0])
+        self.dropped = 0
+        self.sample_stamp = clock.ticks_us()
+        self.sample_timer = Timer(SAMPLE_TIMER, freq=freq, callback=self._sample)
+
+    def _sample(self, timer):
+        '''!@brief      Scans the panel and queues the readings.
+            @details    This is the timer callback of start_sampling(). It
+                        runs in an interrupt, so it only works on integers
+                        and makes no new objects. A scan is only queued when
+                        both of its items fit.
+            @param      timer is the Timer that called it.
+        '''
+        stamp = clock.ticks_us()
+        queue = self.queue
+        if queue.space() < 2:
+            self.dropped += 1
+            return
+        flags = self._scan()
+        queue.put(stamp)
+        queue.put(flags | self.xpos | self.ypos << 12)
+
+    def Filter(self, ADC_Data, stamp=None):
+        '''!@brief      A steady-state Kalman filter for the ball position and
+                        velocity.
+            @details    Each axis is tracked with a constant velocity model,
+                        in ADC units. The estimate is moved on by its velocity
+                        over the time since the last call, measured in
+                        microseconds, and an axis that the last scan read (see
+                        new_x and new_y) is then corrected towards the
+                        reading with the gains gain_pos and gain_vel that
+                        set_period() picked. An axis that was not read is only
+                        moved on. Once contact is lost the estimate is held,
+                        and the first reading after the ball comes back down
+                        starts it again with no velocity, so nothing from
+                        before the ball left the panel is blended in. The
+                        velocities are kept in vx_hat
+                        and vy_hat [ADC units/s].
             @param      ADC_Data is an input to this fucntion: a tuple containing
                         xpos, ypos (ADC units), and contact (boolean).
+            @param      stamp is the ticks_us() time of the readings, or None
+                        to use the current time.
             @return     This function returns a tuple in the same format as the
                         input, only now it contains filtered xpos and ypos values.
             
         '''
-        if self.initial_time == 0:
-            self.initial_time = ticks_ms()
-            self.x_hat = 0.85*ADC_Data[0]
-            self.y_hat = 0.85*ADC_Data[1]
-            
+        now = clock.ticks_us() if stamp is None else stamp
+        dt = clock.ticks_diff(now, self.filter_time)/1_000_000
+        self.filter_time = now
+        contact = ADC_Data[2]
+        
+        if contact and self.new_x:
+            if self.x_seen:
+                x_pred = self.x_hat + dt*self.vx_hat
+                resid = ADC_Data[0] - x_pred
+                self.x_hat = x_pred + self.gain_pos*resid
+                self.vx_hat = self.vx_hat + self.gain_vel*resid
+            else:
+                self.x_hat = ADC_Data[0]
+                self.vx_hat = 0
+                self.x_seen = True
+        elif contact:
+            self.x_hat = self.x_hat + dt*self.vx_hat
         else:
-            self.current_time = ticks_ms()
-            self.ts = ticks_diff(self.current_time, self.initial_time) # In milliseconds
-            self.x_hat = self.x_hat+0.85*(ADC_Data[0]-self.x_hat)+self.ts*self.vx_hat
-            self.y_hat = self.y_hat+0.85*(ADC_Data[1]-self.y_hat)+self.ts*self.vy_hat
-            self.vx_hat = self.vx_hat + 0.005/self.ts*(ADC_Data[0]-self.x_hat)
-            self.vy_hat = self.vy_hat + 0.005/self.ts*(ADC_Data[1]-self.y_hat)
-            self.initial_time = self.current_time
+            self.x_seen = False
+        
+        if contact and self.new_y:
+            if self.y_seen:
+                y_pred = self.y_hat + dt*self.vy_hat
+                resid = ADC_Data[1] - y_pred
+                self.y_hat = y_pred + self.gain_pos*resid
+                self.vy_hat = self.vy_hat + self.gain_vel*resid
+            else:
+                self.y_hat = ADC_Data[1]
+                self.vy_hat = 0
+                self.y_seen = True
+        elif contact:
+            self.y_hat = self.y_hat + dt*self.vy_hat
+        else:
+            self.y_seen = False
             
-        return (self.x_hat, self.y_hat, ADC_Data[2])
+        return (self.x_hat, self.y_hat, contact)
     
     def Calibrate(self):
         '''!@brief      This function walks the user through the steps to calibrate
                         the touchpanel.
-            @details    As the user is instructed to tap 5 points on the touchpanel,
-                        this fucntion stores the ADC data points associated with
-                        points that were touched. These data points will be used 
-                        in Beta(), which will calculate the calibration coefficients
-                        based on the positions and ADC data.
-            
+            @details    As the user is instructed to tap each of the
+                        calibration points on the touchpanel, this fucntion
+                        stores the ADC data points associated with the points
+                        that were touched. A tap is recorded once the ball or
+                        finger is lifted again. These data points will be used
+                        in Fit(), which will calculate the calibration
+                        coefficients based on the positions and ADC data.
+            @return     True once every point has been tapped, otherwise None.
         '''
-        # Calibration recording will have 5 steps
-        
-        if self.Cal_step == 0:
-            if self.y1_print == True:
-                print("Touch the bottom left corner.")
-                self.y1_print = False 
-            if self.zScan() == True:
-                self.x1 = self.xScan()
-                self.y1 = self.yScan()
-                sleep_ms(100)
-                self.y2_print = True
-            if self.y2_print == True and self.zScan() == False:    
-                self.Cal_step += 1
-                
-        if self.Cal_step == 1:
-            if self.y2_print == True:
-                print("Touch the top left corner.")
-                self.y2_print = False 
-            if self.zScan() == True:
-                self.x2 = self.xScan()
-                self.y2 = self.yScan()
-                sleep_ms(100)
-                self.y3_print = True
-            if self.y3_print == True and self.zScan() == False:    
-                self.Cal_step += 1
-        
-        if self.Cal_step == 2:
-            if self.y3_print == True:
-                print("Touch the top right corner.")
-                self.y3_print = False 
-            if self.zScan() == True:
-                self.x3 = self.xScan()
-                self.y3 = self.yScan()
-                sleep_ms(100)
-                self.y4_print = True
-            if self.y4_print == True and self.zScan() == False:    
-                self.Cal_step += 1
-                
-        if self.Cal_step == 3:
-            if self.y4_print == True:
-                print("Touch the bottom right corner.")
-                self.y4_print = False 
-            if self.zScan() == True:
-                self.x4 = self.xScan()
-                self.y4 = self.yScan()
-                sleep_ms(100)
-                self.y5_print = True
-            if self.y5_print == True and self.zScan() == False:    
-                self.Cal_step += 1
-                
-        if self.Cal_step == 4:
-            if self.y5_print == True:
-                print("Touch the middle.")
-                self.y5_print = False 
-            if self.zScan() == True:
-                self.x5 = self.xScan()
-                self.y5 = self.yScan()
-                sleep_ms(100)
-                self.Y6_print = True
-            if self.Y6_print == True and self.zScan() == False:    
-                self.Cal_step += 1
-        
-        if self.Cal_step == 5:
-            if self.Y6_print == True:
-                print("Calibration complete.")
-                self.Y6_print = False
+        if self.Cal_step == 0 and self.cal_print == True:
+            self.cal_adc = []
+
+        name = self.cal_points[self.Cal_step][0]
+        if self.cal_print == True:
+            print(f"Touch the {name}.")
+            self.cal_print = False
+        if self.zScan() == True:
+            self.cal_tap = (self.xScan(), self.yScan())
+            clock.sleep_ms(100)
+        elif self.cal_tap is not None:
+            self.cal_adc.append(self.cal_tap)
+            self.cal_tap = None
+            self.cal_print = True
+            self.Cal_step += 1
+
+        if self.Cal_step == len(self.cal_points):
+            print("Calibration complete.")
             self.Calibrated = True
             self.Cal_step = 0
             return (self.Calibrated)
 
-    def Beta(self): 
-        '''!@brief      This function uses the 5 data points from the calibration
-                        procedure to calculate the matrix of calibration coefficients.
-            @details    Using the ADC data from the 5 points tapped on the touch
-                        panel, this function calculates the matrix Beta, which 
-                        contains the calibration coefficients for the panel.
-            @return     Beta is the matrix returned. It contains the 6 numbers 
-                        used to calibate the touch panel and convert the ADC units 
-                        to units of mm.
-            
+    def Fit(self):
+        '''!@brief      This function uses the data points from the calibration
+                        procedure to calculate the calibration coefficients.
+            @details    The model picked by the order given to the constructor
+                        is fitted to the taps by least squares with
+                        panelmap.fit(), so any number of points at least as
+                        many as the terms of the model can be used.
+            @return     An array('f') of the panelmap.COEFFS coefficients, from
+                        which panelmap.make_map() makes the map that converts
+                        the ADC units to units of mm.
+        '''
+        mm = [(point[1], point[2]) for point in self.cal_points]
+        return panelmap.fit(self.cal_adc, mm, self.order)
+
+    def Beta(self):
+        '''!@brief      This function uses the data points from the calibration
+                        procedure to calculate the matrix of calibration
+                        coefficients.
+            @details    An affine calibration is fitted to the taps whatever
+                        the order given to the constructor, as before Fit().
+            @return     Beta is the tuple returned. It contains the 6 numbers
+                        used to calibate the touch panel and convert the ADC
+                        units to units of mm, and can be given to
+                        Read_Panel() in place of a map.
+        '''
+        mm = [(point[1], point[2]) for point in self.cal_points]
+        return panelmap.to_beta(panelmap.fit(self.cal_adc, mm, panelmap.AFFINE))
+
+    def _beta_map(self, Beta):
+        '''!@brief      Finds the map of a Beta tuple.
+            @details    The map is only made again when a different tuple is
+                        given, so passing the same Beta every run costs no
+                        more than passing a map.
+            @param      Beta is the tuple of the six Beta coefficients.
+            @return     The panelmap.AffineMap of the calibration.
         '''
-        # Creating the Y matrix, containing the coordinates of the 5 test points
-        # in millimeters.
-        self.X = np.array([[self.x1, self.y1, 1], [self.x2, self.y2, 1], [self.x3, self.y3, 1], [self.x4, self.y4, 1], [self.x5, self.y5, 1]])
-        self.X_T = self.X.transpose()
-        self.Beta = np.dot(np.dot(np.linalg.inv(np.dot(self.X_T, self.X)), self.X_T), self.Y)
-        self.Beta = self.Beta[0,0], self.Beta[0,1], self.Beta[1,0], self.Beta[1,1], self.Beta[2,0], self.Beta[2,1]
-        return self.Beta
+        if Beta is not self.beta:
+            self.beta = Beta
+            self.beta_map = panelmap.AffineMap(panelmap.from_beta(Beta))
+        return self.beta_map
     
-    def Read_Panel(self, Beta):
+    def Read_Panel(self, Map):
         '''!@brief      This fucntion is a combination of the scan, filter, and
                         calibration fucntions defined earlier.
             @details    This will scan the x, y, and z components of the touch
                         panel, and filter the data. The filtered data will then 
-                        be scaled with the calibration coefficients from the Beta 
-                        matrix. 
-            @param      Beta is the matrix containing the 6 numbers used to 
-                        calibrate the touch panel and convert the ADC units 
-                        to units of mm.
+                        be converted to mm through the calibration.
+            @param      Map is the panelmap.AffineMap or panelmap.PanelMap of
+                        the calibration, which converts the ADC units to
+                        units of mm, or the tuple returned by Beta().
             @return     The output of this function is a tuple containing the 
-                        filtered and calibrated xpos, ypos (ADC units), contact 
-                        (boolean), and time_span (microseconds).
+                        filtered and calibrated xpos, ypos (mm), contact 
+                        (boolean), time_span (microseconds), and the
+                        estimated velocities vx and vy (mm/s). The velocities
+                        are scaled by the slopes of the calibration at the
+                        position.
             
         '''
         # Timestamp
-        start_time = ticks_us()
+        start_time = clock.ticks_us()
         
+        if isinstance(Map, tuple):
+            Map = self._beta_map(Map)
         ADC_Data = self.Filter(self.Scan())
-        self.x_cal = round(Beta[0]*ADC_Data[0] + Beta[1]*ADC_Data[1] + Beta[4], 1)
-        self.y_cal = round(Beta[3]*ADC_Data[1] + Beta[2]*ADC_Data[0] + Beta[5], 1)
+        Map.convert(ADC_Data[0], ADC_Data[1], self.vx_hat, self.vy_hat)
+        self.x_cal = round(Map.x, 1)
+        self.y_cal = round(Map.y, 1)
+        self.vx_cal = Map.vx
+        self.vy_cal = Map.vy
         
         # Timespan Calculation
-        end_time = ticks_us()
-        time_span = ticks_diff(end_time, start_time)
-        return (self.x_cal, self.y_cal, ADC_Data[2], time_span)
-         
-if __name__ == '__main__':
-    # Adjust the following code to write a test program.
+        end_time = clock.ticks_us()
+        time_span = clock.ticks_diff(end_time, start_time)
+        return (self.x_cal, self.y_cal, ADC_Data[2], time_span, self.vx_cal, self.vy_cal)
     
+    def Read_Samples(self, Map):
+        '''!@brief      Filters the scans queued by the timer interrupt and
+                        calibrates the result.
+            @details    This takes the place of Read_Panel() once
+                        start_sampling() has been called. Every queued scan
+                        goes through Filter() with the time it was taken, so
+                        the filter steps match the timer rather than the
+                        runs of the task. The time of the last scan is left
+                        in sample_stamp.
+            @param      Map is the map of the calibration, or the tuple
+                        returned by Beta(), as for Read_Panel().
+            @return     None if no scan has been queued since the last call,
+                        otherwise a tuple in the same format as the output of
+                        Read_Panel(), where time_span is the time taken to
+                        filter the queued scans.
+        '''
+        start_time = clock.ticks_us()
+        
+        # The callback only ever adds both items of a scan in one go, so the
+        # queue always holds whole scans.
+        count = self.queue.get_into(self.drain)
+        if count == 0:
+            return None
+        drain = self.drain
+        if isinstance(Map, tuple):
+            Map = self._beta_map(Map)
+        for idx in range(0, count, 2):
+            sample = drain[idx + 1]
+            self.new_x = bool(sample & _NEW_X)
+            self.new_y = bool(sample & _NEW_Y)
+            ADC_Data = self.Filter((sample & _ADC_MASK, (sample >> 12) & _ADC_MASK,
+                                    bool(sample & _CONTACT)), drain[idx])
+        self.sample_stamp = drain[count - 2]
+        Map.convert(ADC_Data[0], ADC_Data[1], self.vx_hat, self.vy_hat)
+        self.x_cal = round(Map.x, 1)
+        self.y_cal = round(Map.y, 1)
+        self.vx_cal = Map.vx
+        self.vy_cal = Map.vy
+        
+        end_time = clock.ticks_us()
+        time_span = clock.ticks_diff(end_time, start_time)
+        return (self.x_cal, self.y_cal, ADC_Data[2], time_span, self.vx_cal, self.vy_cal)
+
+## The plain Python versions of the methods that fastpath.py replaces, kept
+#  for comparison.
+TouchPanel.Filter_py = TouchPanel.Filter
+TouchPanel.Read_Panel_py = TouchPanel.Read_Panel
+if fastpath is not None:
+    TouchPanel.Filter = fastpath.touchpanel_filter
+    TouchPanel.Read_Panel = fastpath.touchpanel_read_panel
+
+if __name__ == '__main__':
+    import sys
+    if sys.platform != 'pyboard':
+        # On the host, check the background scans on the emulated panel,
+        # with the ball at (20, -10) mm. First the timer callback is fired by
+        # hand on a virtual clock, so the queue and the stamps can be checked
+        # exactly.
+        from hal import board
+        board.touch_panel.touch(20, -10)
+        Map = panelmap.make_map(panelmap.from_beta((176/4095, 0, 0, 100/4095, -88, -50)))
+        virtual = clock.VirtualClock(1_000)
+        clock.set_source(virtual)
+        try:
+            TP = TouchPanel(contact_first=True)
+            TP.start_sampling()
+            # Only the callbacks fired here run.
+            TP.sample_timer.deinit()
+            assert TP.Read_Samples(Map) is None
+            for _ in range(5):
+                virtual.advance(10_000)
+                TP._sample(TP.sample_timer)
+            Data = TP.Read_Samples(Map)
+            assert abs(Data[0] - 20) < 0.5 and abs(Data[1] + 10) < 0.5 and Data[2]
+            assert TP.sample_stamp == virtual.ticks_us()
+            assert TP.Read_Samples(Map) is None
+
+            # A full queue drops the newest scans whole.
+            for _ in range(SAMPLE_QUEUE + 3):
+                virtual.advance(10_000)
+                TP._sample(TP.sample_timer)
+            assert TP.dropped == 3
+            assert TP.queue.get_into(TP.drain) == 2*SAMPLE_QUEUE
+            assert TP.drain[2*SAMPLE_QUEUE - 2] == virtual.ticks_us() - 30_000
+
+            board.touch_panel.release()
+            virtual.advance(10_000)
+            TP._sample(TP.sample_timer)
+            assert TP.Read_Samples(Map)[2] == False
+        finally:
+            clock.set_source(clock.HardwareClock())
 
-    touchpanel = TouchPanel()
-    Cal_complete = False
+        # Then the emulated timer interrupt scans the panel on the host's
+        # own time for 100 ms.
+        board.touch_panel.touch(20, -10)
+        TP = TouchPanel(contact_first=True)
+        TP.start_sampling()
+        try:
+            clock.sleep_ms(100)
+        finally:
+            TP.sample_timer.deinit()
+        count = TP.queue.get_into(TP.drain)
+        stamps = [TP.drain[idx] for idx in range(0, count, 2)]
+        gaps = [clock.ticks_diff(stamps[idx], stamps[idx - 1]) for idx in range(1, len(stamps))]
+        print(f'The timer queued {len(stamps)} scans in 100 ms, '
+              f'{min(gaps)} to {max(gaps)} us apart.')
+        assert 8 <= len(stamps) <= 11 and TP.dropped == 0
+        # A single callback can run late when the host oversleeps, but the
+        # timer keeps its own schedule, so the scans are 10 ms apart on
+        # average.
+        span = clock.ticks_diff(stamps[-1], stamps[0])
+        assert abs(span/(len(stamps) - 1) - 10_000) < 1_000
+        print('The background scan checks passed.')
+    else:
+        # Adjust the following code to write a test program.
+        touchpanel = TouchPanel()
+        Cal_complete = False
     
-    while True:
-        if Cal_complete == False:
-            Cal = touchpanel.Calibrate()
-        if Cal == True:
-            Cal_complete = True
-            print(f'{Cal}')
-            Beta = touchpanel.Beta()
-            print(Beta)
-            Cal = False
+        while True:
+            if Cal_complete == False:
+                Cal = touchpanel.Calibrate()
+            if Cal == True:
+                Cal_complete = True
+                print(f'{Cal}')
+                Map = panelmap.make_map(touchpanel.Fit())
+                print(Map.coef)
+                Cal = False
             
-        if Cal_complete == True:
-            sleep_ms(100)
-            Data = touchpanel.Read_Panel(Beta)
-            print(f'{Data}')
+            if Cal_complete == True:
+                clock.sleep_ms(100)
+                Data = touchpanel.Read_Panel(Map)
+                print(f'{Data}')
 
     